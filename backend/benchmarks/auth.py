@@ -0,0 +1,143 @@
+# backend/benchmarks/auth.py
+"""
+Cost of authenticating a request, in-process over ASGI:
+
+    legacy   decode the JWT and SELECT the user on every request
+             (get_current_user before the auth cache)
+    user     get_current_user with the claims + user cache
+    claims   require_role(): claims-only, no users-table access
+
+Reports req/s, latency and SQL statements per request for each:
+
+    python -m backend.benchmarks.auth [--requests 5000] [--concurrency 50] [--output auth.json]
+"""
+
+import os
+import tempfile
+
+# Point the app at a scratch database before backend.database is imported
+_SCRATCH = tempfile.mkdtemp(prefix="csss-bench-")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_SCRATCH}/bench.db")
+
+import time
+import asyncio
+import argparse
+import json
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import Base, SessionLocal, async_engine, engine, get_async_db
+from backend.models.user import User
+from backend.security.jwt_handler import create_access_token, get_current_user, oauth2_scheme, verify_token
+from backend.security.role_guard import require_role
+
+_statements = 0
+
+
+def _count_statement(*_):
+    global _statements
+    _statements += 1
+
+
+def seed() -> str:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = User(name="Bench", email="bench@csss.com", password="-", role="doctor")
+        db.add(user)
+        db.commit()
+        return create_access_token({"user_id": user.id, "role": user.role, "email": user.email})
+
+
+def app() -> FastAPI:
+    app = FastAPI()
+
+    async def legacy_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+        payload = verify_token(token)
+        if payload is None:
+            raise HTTPException(401, "Invalid or expired token")
+        user = await db.get(User, int(payload["user_id"]))
+        if user is None:
+            raise HTTPException(401, "User no longer exists")
+        return user
+
+    @app.get("/legacy")
+    async def legacy(user=Depends(legacy_user)):
+        return {"id": user.id}
+
+    @app.get("/user")
+    async def cached(user=Depends(get_current_user)):
+        return {"id": user.id}
+
+    @app.get("/claims")
+    async def claims(payload=Depends(require_role("doctor"))):
+        return {"id": payload["user_id"]}
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> dict:
+    global _statements
+    await client.get(path)                    # warm-up (fills the caches)
+    _statements = 0
+
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            t = time.perf_counter()
+            r = await client.get(path)
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": total / elapsed,
+        "latency_ms_p50": latencies[total // 2] * 1000,
+        "latency_ms_p95": latencies[int(total * 0.95)] * 1000,
+        "sql_per_request": _statements / total,
+    }
+
+
+async def run_all(token: str, total: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app())
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        results = {path: await measure(client, f"/{path}", total, concurrency) for path in ("legacy", "user", "claims")}
+    await async_engine.dispose()
+    return results
+
+
+def run(requests: int = 5000, concurrency: int = 50) -> dict:
+    token = seed()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+    return asyncio.run(run_all(token, requests, concurrency))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS request authentication benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency)
+
+    print(f"{'variant':8s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'SQL/req':>8s}")
+    for name, r in results.items():
+        print(
+            f"{name:8s} {r['requests_per_second']:9.1f} {r['latency_ms_p50']:9.2f} "
+            f"{r['latency_ms_p95']:9.2f} {r['sql_per_request']:8.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
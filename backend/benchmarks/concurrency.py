@@ -0,0 +1,176 @@
+# backend/benchmarks/concurrency.py
+"""
+Concurrent-request capacity: sync routers (the previous implementation,
+reproduced here) against the async routers, in-process over ASGI.
+
+Two scenarios per variant:
+
+    reads   GET /doctor/pending at increasing concurrency → req/s, p95
+    mixed   the same reads while bcrypt logins run concurrently; sync
+            handlers share AnyIO's 40-thread pool with bcrypt, async ones
+            keep reading while logins wait in the blocking executor
+
+Runs against a throwaway SQLite database (BENCH_DATABASE_URL to override):
+
+    python -m backend.benchmarks.concurrency [--levels 1,10,50,100,200] [--requests 400]
+                                             [--logins 40] [--output conc.json]
+"""
+
+import os
+import tempfile
+
+# Point the app at a scratch database before backend.database is imported
+_SCRATCH = tempfile.mkdtemp(prefix="csss-bench-")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_SCRATCH}/bench.db")
+# every bench login uses one account from one client: lift the login limiter
+for _name in ("LOGIN_IP_BURST", "LOGIN_EMAIL_BURST"):
+    os.environ.setdefault(_name, "1000000")
+
+import time
+import asyncio
+import argparse
+import json
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy.orm import Session
+
+from backend.database import Base, SessionLocal, async_engine, engine, get_db
+from backend.models.schema import Scan
+from backend.models.user import User
+from backend.routers import auth_router, doctor
+from backend.schemas.user_schema import UserLogin
+from backend.security.jwt_handler import create_access_token
+from backend.security.password import hash_password, verify_password
+from backend.services import executors, workqueue
+
+PASSWORD = "Bench123"
+
+
+def seed(scans: int = 2000):
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(name="Bench", email="bench@csss.com", password=hash_password(PASSWORD), role="doctor"))
+        db.add_all(
+            Scan(patient_id=i % 50, file_path=f"uploads/patient_scans/{i}.png", status="PENDING_AI")
+            for i in range(scans)
+        )
+        db.commit()
+
+
+def sync_app() -> FastAPI:
+    """The routes as they were before the async port (sync def + get_db)."""
+
+    app = FastAPI()
+
+    @app.get("/doctor/pending")
+    def pending(db: Session = Depends(get_db)):
+        return workqueue.fetch_page(db, limit=50)
+
+    @app.post("/auth/login")
+    def login(user: UserLogin, db: Session = Depends(get_db)):
+        db_user = db.query(User).filter(User.email == user.email).first()
+        if not db_user or not verify_password(user.password, db_user.password):
+            raise HTTPException(401, "Invalid credentials")
+        return {"access_token": create_access_token({"user_id": db_user.id}), "token_type": "bearer"}
+
+    return app
+
+
+def async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(doctor.router)
+    app.include_router(auth_router.router)
+    return app
+
+
+async def _reads(client: httpx.AsyncClient, concurrency: int, total: int) -> dict:
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            t = time.perf_counter()
+            r = await client.get("/doctor/pending")
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms_p50": latencies[len(latencies) // 2] * 1000,
+        "latency_ms_p95": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+async def _logins(client: httpx.AsyncClient, count: int) -> float:
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/auth/login", json={"email": "bench@csss.com", "password": PASSWORD})
+        for _ in range(count)
+    ))
+    for r in responses:
+        r.raise_for_status()
+    return count / (time.perf_counter() - started)
+
+
+async def measure(app: FastAPI, levels: list[int], requests: int, logins: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        await client.get("/doctor/pending")           # warm-up
+
+        reads = [await _reads(client, level, requests) for level in levels]
+
+        login_task = asyncio.create_task(_logins(client, logins))
+        mixed = await _reads(client, min(50, max(levels)), requests)
+        logins_per_second = await login_task
+
+    # aiosqlite connections belong to this event loop (no-op for the sync app)
+    await async_engine.dispose()
+
+    return {"reads": reads, "mixed": {**mixed, "logins": logins, "logins_per_second": logins_per_second}}
+
+
+def run(levels: list[int], requests: int = 400, logins: int = 40) -> dict:
+    seed()
+    try:
+        return {
+            "sync": asyncio.run(measure(sync_app(), levels, requests, logins)),
+            "async": asyncio.run(measure(async_app(), levels, requests, logins)),
+        }
+    finally:
+        executors.shutdown()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS sync vs async router capacity")
+    parser.add_argument("--levels", default="1,10,50,100,200", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=400, help="reads per level")
+    parser.add_argument("--logins", type=int, default=40, help="concurrent logins in the mixed scenario")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run([int(x) for x in args.levels.split(",")], args.requests, args.logins)
+
+    print(f"{'variant':8s} {'conc':>5s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for variant, r in results.items():
+        for row in r["reads"]:
+            print(
+                f"{variant:8s} {row['concurrency']:5d} {row['requests_per_second']:9.1f} "
+                f"{row['latency_ms_p50']:9.1f} {row['latency_ms_p95']:9.1f}"
+            )
+        m = r["mixed"]
+        print(
+            f"{variant:8s} mixed {m['requests_per_second']:9.1f} {m['latency_ms_p50']:9.1f} "
+            f"{m['latency_ms_p95']:9.1f}  ({m['logins']} logins @ {m['logins_per_second']:.1f}/s)"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
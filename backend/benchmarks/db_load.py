@@ -0,0 +1,146 @@
+# backend/benchmarks/db_load.py
+"""
+Database write-throughput load test for the upload → analyze → verify
+workflow.
+
+Each of --threads workers loops over the same DB writes the API and the
+analysis workers make: insert the scan row, enqueue an analysis job, claim
+a job and write its prediction, then record the doctor's verification.
+Every database is measured with the tuned engine (WAL/busy_timeout/
+synchronous=NORMAL for SQLite, QueuePool settings for PostgreSQL) and,
+with --baseline, the old untuned engine:
+
+    python -m backend.benchmarks.db_load [--url postgresql+psycopg2://…] [--threads 16]
+                                         [--workflows 400] [--baseline] [--output db.json]
+
+Without --url a throwaway SQLite file is used. Rows written against a
+--url database are deleted afterwards.
+"""
+
+import os
+import time
+import argparse
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, create_db_engine
+from backend.models.job import AnalysisJob
+from backend.models.schema import Scan
+from backend.services import job_queue
+
+# Rows created by the load test are tagged with this patient id
+LOAD_TEST_PATIENT = 990_000_001
+
+
+def workflow(Session, worker_id: str) -> None:
+    with Session() as db:
+        # upload
+        scan = Scan(patient_id=LOAD_TEST_PATIENT, file_path="uploads/patient_scans/load-test.png", status="PENDING_AI")
+        db.add(scan)
+        db.commit()
+
+        # analyze: enqueue, then a worker claims a job and writes the result
+        job_queue.enqueue_analysis(db, scan.id)
+        for job in job_queue.claim_jobs(db, worker_id, limit=1):
+            claimed = db.query(Scan).filter(Scan.id == job.scan_id).first()
+            job_queue._apply_result(job, claimed, {"label": "Normal", "confidence": 0.97})
+        db.commit()
+
+        # verify (only once the prediction has landed, as in the API)
+        db.refresh(scan)
+        if scan.status == "AI_ANALYZED":
+            scan.doctor_notes = "Load test verification"
+            scan.status = "DOCTOR_VERIFIED"
+            db.commit()
+
+
+def run_one(url: str, tuned: bool, threads: int, workflows: int) -> dict:
+    engine = create_db_engine(url, tuned=tuned)
+    Base.metadata.create_all(bind=engine, tables=[Scan.__table__, AnalysisJob.__table__])
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    latencies, errors = [], {"locked": 0, "other": 0}
+    lock = threading.Lock()
+
+    def task(i: int):
+        t = time.perf_counter()
+        try:
+            workflow(Session, f"load-{i % threads}")
+        except OperationalError as e:
+            with lock:
+                errors["locked" if "locked" in str(e) else "other"] += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(task, range(workflows)))
+    elapsed = time.perf_counter() - started
+
+    # leave --url databases as we found them
+    with Session() as db:
+        ids = [row.id for row in db.query(Scan.id).filter(Scan.patient_id == LOAD_TEST_PATIENT)]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            db.query(AnalysisJob).filter(AnalysisJob.scan_id.in_(chunk)).delete(synchronize_session=False)
+            db.query(Scan).filter(Scan.id.in_(chunk)).delete(synchronize_session=False)
+        db.commit()
+    engine.dispose()
+
+    latencies.sort()
+    done = len(latencies)
+    return {
+        "backend": engine.url.get_backend_name(),
+        "tuned": tuned,
+        "threads": threads,
+        "workflows": workflows,
+        "completed": done,
+        "errors": errors,
+        "workflows_per_second": done / elapsed if elapsed else None,
+        "latency_ms_p50": latencies[done // 2] * 1000 if done else None,
+        "latency_ms_p95": latencies[int(done * 0.95)] * 1000 if done else None,
+    }
+
+
+def run(urls: list[str] | None = None, threads: int = 16, workflows: int = 400, baseline: bool = False) -> list[dict]:
+    results = []
+    modes = (False, True) if baseline else (True,)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for url in urls or [None]:
+            for tuned in modes:
+                target = url or f"sqlite:///{os.path.join(tmp, f'load_{tuned}.db')}"
+                results.append(run_one(target, tuned, threads, workflows))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS database write-throughput load test")
+    parser.add_argument("--url", action="append", help="database URL (repeatable); default: temp SQLite file")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--workflows", type=int, default=400)
+    parser.add_argument("--baseline", action="store_true", help="also run with the untuned engine")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.url, args.threads, args.workflows, args.baseline)
+
+    print(f"{'backend':10s} {'engine':8s} {'wf/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'locked':>7s} {'other':>6s}")
+    for r in results:
+        print(
+            f"{r['backend']:10s} {'tuned' if r['tuned'] else 'default':8s} "
+            f"{r['workflows_per_second'] or 0:8.1f} {r['latency_ms_p50'] or 0:8.1f} {r['latency_ms_p95'] or 0:8.1f} "
+            f"{r['errors']['locked']:7d} {r['errors']['other']:6d}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,263 @@
+# backend/benchmarks/end_to_end.py
+"""
+End-to-end workflow throughput through the real routers, in-process over
+ASGI. Each workflow is what a patient and a doctor do for one scan:
+
+    upload   POST /patient/upload (multipart, a synthetic grey PNG)
+    analyze  POST /doctor/analyze/{id}, then GET /doctor/analyze/jobs/{job}
+             until it is DONE; jobs are drained by --workers consumer
+             threads running the AI worker loop (claim → one batched
+             forward pass per claim → commit)
+    verify   POST /doctor/verify/{id}
+
+--concurrency workflows run at once. Runs against a throwaway SQLite
+database seeded with patients and a doctor (BENCH_DATABASE_URL to
+override) and a scratch blob store, both removed afterwards. Needs the
+model (AI_MODEL_PATH):
+
+    python -m backend.benchmarks.end_to_end [--workflows 200] [--concurrency 16] [--workers 2]
+                                            [--image-size 1024] [--output e2e.json]
+"""
+
+import os
+import tempfile
+
+# Point the app at a scratch database before backend.database is imported
+_SCRATCH = tempfile.mkdtemp(prefix="csss-bench-")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{_SCRATCH}/bench.db")
+# the workflow analyzes explicitly; uploads must not queue jobs of their own
+os.environ["AUTO_ANALYZE_ON_UPLOAD"] = "false"
+
+import time
+import shutil
+import asyncio
+import argparse
+import json
+import threading
+from pathlib import Path
+
+import cv2
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from backend.config import BASE_DIR
+from backend.database import Base, SessionLocal, async_engine, engine
+from backend.models.user import User
+from backend.routers import doctor, patient
+from backend.security.password import hash_password
+from backend.services import ai_service, blob_storage, derivatives, executors, job_queue, model_registry
+
+PATIENTS = 20
+JOB_POLL_SECONDS = 0.02
+STAGES = ("upload", "analyze", "verify", "total")
+
+
+def seed(patients: int = PATIENTS) -> list[int]:
+    Base.metadata.create_all(bind=engine)
+    password = hash_password("Bench123")
+    with SessionLocal() as db:
+        db.add(User(name="Bench Doctor", email="doctor@bench.csss.com", password=password, role="doctor"))
+        users = [
+            User(name=f"Bench Patient {i}", email=f"patient{i}@bench.csss.com", password=password, role="patient")
+            for i in range(patients)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [u.id for u in users]
+
+
+def synthetic_scans(count: int, size: int) -> list[bytes]:
+    """Distinct encoded PNGs, so neither storage dedup nor the prediction cache short-circuits a run."""
+
+    rng = np.random.default_rng(0)
+    base = cv2.resize(rng.integers(0, 256, (32, 32), dtype=np.uint8), (size, size), interpolation=cv2.INTER_CUBIC)
+    scans = []
+    for _ in range(count):
+        img = cv2.add(base, rng.integers(0, 16, (size, size), dtype=np.uint8))
+        scans.append(cv2.imencode(".png", img)[1].tobytes())
+    return scans
+
+
+def app() -> FastAPI:
+    application = FastAPI()
+    application.include_router(patient.router)
+    application.include_router(doctor.router)
+    return application
+
+
+# ──────────────────────────────────────────────────────
+# In-process AI workers
+# ──────────────────────────────────────────────────────
+
+def _worker(worker_id: str, stop: threading.Event):
+    """job_queue.run_worker's loop, minus the process and event-relay setup."""
+
+    while not stop.is_set():
+        with SessionLocal() as db:
+            jobs = job_queue.claim_jobs(db, worker_id, limit=job_queue.AI_JOB_CLAIM_SIZE)
+            if jobs:
+                job_queue.process_jobs(db, jobs, ai_service)
+                continue
+        stop.wait(job_queue.AI_JOB_POLL_SECONDS)
+
+
+def start_workers(count: int) -> tuple[threading.Event, list[threading.Thread]]:
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_worker, args=(f"bench-worker-{i}", stop), name=f"bench-worker-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for t in threads:
+        t.start()
+    return stop, threads
+
+
+# ──────────────────────────────────────────────────────
+# Workflow
+# ──────────────────────────────────────────────────────
+
+async def workflow(client: httpx.AsyncClient, patient_id: int, scan: bytes, timings: dict):
+    started = time.perf_counter()
+
+    r = await client.post(
+        "/patient/upload",
+        data={"patient_id": str(patient_id)},
+        files={"file": ("scan.png", scan, "image/png")},
+    )
+    r.raise_for_status()
+    scan_id = r.json()["scan_id"]
+    uploaded = time.perf_counter()
+
+    r = await client.post(f"/doctor/analyze/{scan_id}")
+    r.raise_for_status()
+    job_id = r.json().get("job_id")
+    while job_id is not None:
+        r = await client.get(f"/doctor/analyze/jobs/{job_id}")
+        r.raise_for_status()
+        status = r.json()["status"]
+        if status == job_queue.DONE:
+            break
+        if status == job_queue.FAILED:
+            raise RuntimeError(f"analysis of scan {scan_id} failed: {r.json().get('error')}")
+        await asyncio.sleep(JOB_POLL_SECONDS)
+    analyzed = time.perf_counter()
+
+    r = await client.post(f"/doctor/verify/{scan_id}", data={"notes": "Benchmark verification"})
+    r.raise_for_status()
+    verified = time.perf_counter()
+
+    timings["upload"].append(uploaded - started)
+    timings["analyze"].append(analyzed - uploaded)
+    timings["verify"].append(verified - analyzed)
+    timings["total"].append(verified - started)
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ms = np.array(values) * 1000
+    return {
+        "count": len(values),
+        "latency_ms_mean": float(ms.mean()),
+        "latency_ms_p50": float(np.percentile(ms, 50)),
+        "latency_ms_p95": float(np.percentile(ms, 95)),
+        "latency_ms_max": float(ms.max()),
+    }
+
+
+async def measure(workflows: int, concurrency: int, patient_ids: list[int], scans: list[bytes]) -> dict:
+    timings = {stage: [] for stage in STAGES}
+    errors = []
+    remaining = iter(range(workflows))
+
+    async def runner():
+        for i in remaining:
+            try:
+                await workflow(client, patient_ids[i % len(patient_ids)], scans[i], timings)
+            except Exception as e:
+                errors.append(str(e))
+
+    transport = httpx.ASGITransport(app=app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(runner() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        # thumbnails scheduled by the uploads finish before the store goes away
+        await asyncio.gather(*list(derivatives._background), return_exceptions=True)
+
+    await async_engine.dispose()
+
+    return {
+        "seconds": elapsed,
+        "completed": len(timings["total"]),
+        "failed": len(errors),
+        "errors": errors[:20],
+        "workflows_per_second": len(timings["total"]) / elapsed if elapsed else None,
+        "stages": {stage: _summary(values) for stage, values in timings.items()},
+    }
+
+
+def run(workflows: int = 200, concurrency: int = 16, workers: int = 2, image_size: int = 1024) -> dict:
+    # same filesystem as the upload temp dir: committing a scan is a rename
+    scratch_store = tempfile.mkdtemp(prefix=".bench-store-", dir=BASE_DIR / "uploads")
+    blob_storage.set_store(blob_storage.LocalBlobStore(Path(scratch_store)))
+
+    patient_ids = seed()
+    scans = synthetic_scans(workflows, image_size)
+
+    # load + trace once, as a deployed worker does before claiming jobs
+    warm = model_registry.warm_up()
+
+    stop, threads = start_workers(workers)
+    try:
+        results = asyncio.run(measure(workflows, concurrency, patient_ids, scans))
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        executors.shutdown()
+        shutil.rmtree(scratch_store, ignore_errors=True)
+        shutil.rmtree(_SCRATCH, ignore_errors=True)
+
+    return {
+        "workflows": workflows,
+        "concurrency": concurrency,
+        "workers": workers,
+        "claim_size": job_queue.AI_JOB_CLAIM_SIZE,
+        "image_size": image_size,
+        "model_version": model_registry.model_version(),
+        "model_load_seconds": warm["load_seconds"],
+        **results,
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS upload → analyze → verify throughput")
+    parser.add_argument("--workflows", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="workflows in flight at once")
+    parser.add_argument("--workers", type=int, default=2, help="in-process AI worker threads")
+    parser.add_argument("--image-size", type=int, default=1024, help="edge of the synthetic scans in pixels")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.workflows, args.concurrency, args.workers, args.image_size)
+
+    print(
+        f"{results['completed']}/{results['workflows']} workflows in {results['seconds']:.1f}s "
+        f"→ {results['workflows_per_second']:.1f}/s (concurrency {results['concurrency']}, "
+        f"{results['workers']} workers, {results['failed']} failed)"
+    )
+    print(f"{'stage':8s} {'mean ms':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'max ms':>9s}")
+    for stage, s in results["stages"].items():
+        if s["count"]:
+            print(
+                f"{stage:8s} {s['latency_ms_mean']:9.1f} {s['latency_ms_p50']:9.1f} "
+                f"{s['latency_ms_p95']:9.1f} {s['latency_ms_max']:9.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
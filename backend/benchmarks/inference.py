@@ -0,0 +1,204 @@
+# backend/benchmarks/inference.py
+"""
+Inference benchmark for the configured model (AI_MODEL_PATH / AI_RUNTIME):
+
+    cold        predict_scan() in a fresh interpreter: imports, model load,
+                first trace and one scan, as after a deploy or worker restart
+    warm        predict_scan() on distinct scans once the model is loaded
+                (prediction cache off, batching as configured)
+    throughput  predict_array() over preallocated batches of 1–64 scans
+    stages      per-scan cost of each step: read, decode, resize,
+                normalise, predict, postprocess
+
+Synthetic X-ray-sized PNGs (grey, 8-bit) are written to a temp directory;
+nothing touches the database or blob storage:
+
+    python -m backend.benchmarks.inference [--batch-sizes 1,2,4,8,16,32,64] [--runs 20]
+                                           [--cold-runs 3] [--image-size 2048] [--output inf.json]
+"""
+
+import os
+
+# every warm run must reach the model, and must not write cache rows
+os.environ["PREDICTION_CACHE_ENABLED"] = "false"
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import cv2
+import numpy as np
+
+from backend.services import ai_service, model_registry, preprocessing
+
+COLD_SNIPPET = """
+import os, json, time
+os.environ["PREDICTION_CACHE_ENABLED"] = "false"
+t = time.perf_counter()
+from backend.services import ai_service
+imported = time.perf_counter()
+ai_service.predict_scan({path!r})
+done = time.perf_counter()
+print(json.dumps({{"import_seconds": imported - t, "first_predict_seconds": done - imported, "total_seconds": done - t}}))
+"""
+
+
+def synthetic_scans(directory: str, count: int, size: int) -> list[str]:
+    """Grey PNGs with some low-frequency structure, so they compress like scans rather than noise."""
+
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        base = cv2.resize(rng.integers(0, 256, (32, 32), dtype=np.uint8), (size, size), interpolation=cv2.INTER_CUBIC)
+        noise = rng.integers(0, 16, (size, size), dtype=np.uint8)
+        path = os.path.join(directory, f"scan_{i}.png")
+        cv2.imwrite(path, cv2.add(base, noise))
+        paths.append(path)
+    return paths
+
+
+def _summary(timings: list[float]) -> dict:
+    ms = np.array(timings) * 1000
+    return {
+        "runs": len(timings),
+        "latency_ms_mean": float(ms.mean()),
+        "latency_ms_p50": float(np.percentile(ms, 50)),
+        "latency_ms_p95": float(np.percentile(ms, 95)),
+    }
+
+
+def cold(path: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", COLD_SNIPPET.format(path=path)], capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "samples": samples,
+        "total_seconds_mean": float(np.mean([s["total_seconds"] for s in samples])),
+        "first_predict_seconds_mean": float(np.mean([s["first_predict_seconds"] for s in samples])),
+    }
+
+
+def warm(paths: list[str], runs: int) -> dict:
+    ai_service.predict_scan(paths[0])               # load + trace outside the timed runs
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        ai_service.predict_scan(paths[1 + i % (len(paths) - 1)])
+        timings.append(time.perf_counter() - started)
+    return {"batching": ai_service.AI_BATCHING_ENABLED, **_summary(timings)}
+
+
+def throughput(paths: list[str], batch_sizes: list[int], runs: int) -> list[dict]:
+    loaded = model_registry.get_model()
+    buf = preprocessing.BatchBuffer(max(batch_sizes), loaded.height, loaded.width, loaded.channels)
+    for i in range(buf.capacity):
+        ai_service.decode_into(preprocessing.read_bytes(paths[i % len(paths)]), buf.slot(i))
+
+    rows = []
+    for size in batch_sizes:
+        batch = buf.view(size)
+        ai_service.predict_array(batch)             # a new batch shape may retrace
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            ai_service.predict_array(batch)
+            timings.append(time.perf_counter() - started)
+        summary = _summary(timings)
+        rows.append({
+            "batch_size": size,
+            "scans_per_second": size / (summary["latency_ms_mean"] / 1000),
+            **summary,
+        })
+    return rows
+
+
+def stages(paths: list[str], runs: int) -> dict:
+    loaded = model_registry.get_model()
+    buf = preprocessing.BatchBuffer(1, loaded.height, loaded.width, loaded.channels)
+    totals = {name: [] for name in ("read", "decode", "resize", "normalise", "predict", "postprocess")}
+
+    for i in range(runs + 1):
+        path = paths[i % len(paths)]
+        marks = [time.perf_counter()]
+        data = preprocessing.read_bytes(path)
+        marks.append(time.perf_counter())
+        img = preprocessing.decode(data)
+        marks.append(time.perf_counter())
+        img = cv2.resize(img, (loaded.width, loaded.height))
+        marks.append(time.perf_counter())
+        preprocessing.preprocess_into(img, buf.slot(0))
+        marks.append(time.perf_counter())
+        probabilities = loaded.predict(buf.view(1))
+        marks.append(time.perf_counter())
+        ai_service.build_result(probabilities[0])
+        marks.append(time.perf_counter())
+
+        if i == 0:
+            continue                                # warm-up pass
+        for name, start, end in zip(totals, marks, marks[1:]):
+            totals[name].append(end - start)
+
+    result = {name: _summary(timings) for name, timings in totals.items()}
+    total = sum(r["latency_ms_mean"] for r in result.values())
+    for r in result.values():
+        r["share"] = r["latency_ms_mean"] / total if total else None
+    return result
+
+
+def run(batch_sizes: list[int], runs: int = 20, cold_runs: int = 3, image_size: int = 2048) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = synthetic_scans(tmp, max(8, min(max(batch_sizes), 64)), image_size)
+        results = {
+            "model": model_registry.MODEL_PATHS[model_registry.DEFAULT_MODEL],
+            "runtime": model_registry.AI_RUNTIME,
+            "model_version": model_registry.model_version(),
+            "image_size": image_size,
+        }
+        if cold_runs:
+            results["cold"] = cold(paths[0], cold_runs)
+        results["warm"] = warm(paths, runs)
+        results["throughput"] = throughput(paths, batch_sizes, runs)
+        results["stages"] = stages(paths, runs)
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS inference benchmark")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32,64", help="comma-separated batch sizes")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per measurement")
+    parser.add_argument("--cold-runs", type=int, default=3, help="fresh interpreters for the cold start (0 to skip)")
+    parser.add_argument("--image-size", type=int, default=2048, help="edge of the synthetic scans in pixels")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run([int(x) for x in args.batch_sizes.split(",")], args.runs, args.cold_runs, args.image_size)
+
+    if "cold" in results:
+        c = results["cold"]
+        if "error" in c:
+            print(f"cold start     ERROR {c['error']}")
+        else:
+            print(f"cold start     {c['total_seconds_mean'] * 1000:9.1f} ms  (first predict {c['first_predict_seconds_mean'] * 1000:.1f} ms)")
+    w = results["warm"]
+    print(f"warm           {w['latency_ms_mean']:9.1f} ms  p95 {w['latency_ms_p95']:.1f} ms  batching={w['batching']}")
+
+    print(f"\n{'batch':>5s} {'scans/s':>9s} {'ms/batch':>9s} {'p95 ms':>9s}")
+    for row in results["throughput"]:
+        print(f"{row['batch_size']:5d} {row['scans_per_second']:9.1f} {row['latency_ms_mean']:9.2f} {row['latency_ms_p95']:9.2f}")
+
+    print(f"\n{'stage':12s} {'mean ms':>9s} {'share':>7s}")
+    for name, r in results["stages"].items():
+        print(f"{name:12s} {r['latency_ms_mean']:9.2f} {r['share'] * 100:6.1f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
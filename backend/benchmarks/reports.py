@@ -0,0 +1,139 @@
+# backend/benchmarks/reports.py
+"""
+Report PDF throughput (reports/minute) for synthetic scans:
+
+    inline   what approve_report used to do per request: load the template
+             and render — one report at a time in-process
+    pool     services.reports.ensure_report() for all scans at once on the
+             REPORT_WORKERS process pool (workers started beforehand)
+    cached   the same requests again, answered from the rendered files
+
+Needs WeasyPrint and its system libraries (pango). Scans and PDFs are
+written under bench-only prefixes of the local store and removed after:
+
+    python -m backend.benchmarks.reports [--reports 40] [--workers 4] [--output reports.json]
+"""
+
+import os
+import io
+import sys
+import shutil
+import time
+import asyncio
+import argparse
+import json
+
+# Render workers are spawned with this environment
+os.environ["REPORT_CACHE_PREFIX"] = "reports/bench-cache"
+if "--workers" in sys.argv:
+    os.environ["REPORT_WORKERS"] = sys.argv[sys.argv.index("--workers") + 1]
+
+import numpy as np
+from PIL import Image
+
+from backend.services import cas, derivatives, reports
+from backend.services.blob_storage import get_store
+
+SCAN_PREFIX = "uploads/bench-reports"
+
+
+def seed(count: int, size: int = 1024) -> list[dict]:
+    rng = np.random.default_rng(0)
+    store = get_store()
+    snapshots = []
+
+    for i in range(count):
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (size, size), dtype=np.uint8)).save(buf, format="PNG")
+        key = f"{SCAN_PREFIX}/{i}.png"
+        store.put_bytes(key, buf.getvalue(), content_type="image/png")
+        snapshots.append({
+            "scan_id": 900_000 + i,
+            "patient_id": 1 + i % 10,
+            "file_path": key,
+            "prediction": ["Normal", "Pneumonia", "Tuberculosis"][i % 3],
+            "confidence": 0.6 + (i % 40) / 100,
+            "doctor_notes": "Findings reviewed; consistent with the AI result.",
+            "pharmacist_notes": "Paracetamol 500 mg as required.",
+            "created_at": "2024-01-01T10:00:00",
+            "patient_name": f"Bench Patient {i}",
+            "patient_email": f"bench{i}@csss.com",
+        })
+    return snapshots
+
+
+def inline(snapshots: list[dict]) -> float:
+    from jinja2 import Environment, FileSystemLoader
+    from weasyprint import HTML
+
+    started = time.perf_counter()
+    for snapshot in snapshots:
+        template = Environment(loader=FileSystemLoader(str(reports.TEMPLATES_DIR))).get_template(reports.TEMPLATE_NAME)
+        pdf = HTML(string=template.render(**reports.build_context(snapshot))).write_pdf()
+        get_store().put_bytes(f"{reports.REPORT_CACHE_PREFIX}/inline/{snapshot['scan_id']}.pdf", pdf)
+    return time.perf_counter() - started
+
+
+async def pooled(snapshots: list[dict]) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(reports.ensure_report(s) for s in snapshots))
+    return time.perf_counter() - started
+
+
+def cleanup():
+    store = get_store()
+    # the scans' report-size derivatives live in the real scan shards
+    for blob in list(store.list(SCAN_PREFIX)):
+        for key in derivatives.keys_for(cas.digest_of(blob.key)):
+            store.delete(key)
+    for prefix in (SCAN_PREFIX, reports.REPORT_CACHE_PREFIX):
+        for blob in list(store.list(prefix)):
+            store.delete(blob.key)
+        path = store.local_path(prefix)
+        if path is not None:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def run(count: int = 40) -> dict:
+    snapshots = seed(count)
+    try:
+        reports.warm_pool()
+
+        inline_seconds = inline(snapshots)
+        pool_seconds = asyncio.run(pooled(snapshots))
+        cached_seconds = asyncio.run(pooled(snapshots))
+
+        render = reports.stats()["report_render_seconds"]
+        return {
+            "reports": count,
+            "workers": reports.REPORT_WORKERS,
+            "inline_per_minute": count / inline_seconds * 60,
+            "pool_per_minute": count / pool_seconds * 60,
+            "cached_per_minute": count / cached_seconds * 60,
+            "render_seconds_mean": render["sum"] / render["count"] if render["count"] else None,
+        }
+    finally:
+        reports.shutdown()
+        cleanup()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS report rendering throughput")
+    parser.add_argument("--reports", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=reports.REPORT_WORKERS, help="render processes (REPORT_WORKERS)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.reports)
+
+    print(f"{results['reports']} reports, {results['workers']} render workers")
+    print(f"{'inline':8s} {results['inline_per_minute']:10.1f} reports/min")
+    print(f"{'pool':8s} {results['pool_per_minute']:10.1f} reports/min")
+    print(f"{'cached':8s} {results['cached_per_minute']:10.1f} reports/min")
+    if results["render_seconds_mean"] is not None:
+        print(f"mean render {results['render_seconds_mean'] * 1000:.0f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
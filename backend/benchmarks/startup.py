@@ -0,0 +1,104 @@
+# backend/benchmarks/startup.py
+"""
+Startup benchmark: how long it takes to import the app modules, whether
+that import pulls in TensorFlow, and the model load / first-inference cost.
+
+Each measurement runs in a fresh interpreter so module caches do not hide
+import time. Run from the project root:
+
+    python -m backend.benchmarks.startup [--output startup.json] [--skip-inference]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "import_seconds": time.perf_counter() - t,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}}))
+"""
+
+INFERENCE_SNIPPET = """
+import json, time
+import numpy as np
+t = time.perf_counter()
+from backend.services import model_registry
+import_seconds = time.perf_counter() - t
+warm = model_registry.warm_up()
+loaded = model_registry.get_model()
+dummy = np.zeros((1, loaded.height, loaded.width, loaded.channels), dtype="float32")
+t = time.perf_counter()
+loaded.predict(dummy)
+warm["warm_inference_seconds"] = time.perf_counter() - t
+warm["import_seconds"] = import_seconds
+print(json.dumps(warm))
+"""
+
+MODULES = [
+    "backend.routers.doctor",
+    "backend.routers.patient",
+    "backend.services.ai_service",
+    "backend.seed_db",
+    "backend.init_db",
+]
+
+
+def _run(snippet: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", snippet],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(skip_inference: bool = False) -> dict:
+    results = {"imports": {}}
+
+    for module in MODULES:
+        results["imports"][module] = _run(IMPORT_SNIPPET.format(module=module))
+
+    if not skip_inference:
+        results["inference"] = _run(INFERENCE_SNIPPET)
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS startup benchmark")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--skip-inference", action="store_true")
+    args = parser.parse_args()
+
+    results = run(skip_inference=args.skip_inference)
+
+    for module, r in results["imports"].items():
+        if "error" in r:
+            print(f"{module:32s} ERROR {r['error']}")
+        else:
+            print(
+                f"{module:32s} {r['import_seconds'] * 1000:8.1f} ms"
+                f"  tensorflow={'yes' if r['tensorflow_imported'] else 'no'}"
+            )
+
+    if "inference" in results:
+        r = results["inference"]
+        if "error" in r:
+            print(f"model warm-up                    ERROR {r['error']}")
+        else:
+            print(f"model load                       {r['load_seconds'] * 1000:8.1f} ms")
+            print(f"first inference                  {r['first_inference_seconds'] * 1000:8.1f} ms")
+            print(f"warm inference                   {r['warm_inference_seconds'] * 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
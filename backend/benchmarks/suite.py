@@ -0,0 +1,195 @@
+# backend/benchmarks/suite.py
+"""
+Runs a set of benchmarks and writes one JSON document per run, so results
+can be kept next to the commit they measured and compared later:
+
+    python -m backend.benchmarks.suite [--only inference,end_to_end] [--quick]
+                                       [--output bench/<commit>.json] [--compare bench/<older>.json]
+
+Each benchmark runs in its own interpreter (several point the app at a
+scratch database before importing it) with its usual --output flag. The
+document records the commit, the interpreter, the platform and the
+environment knobs that change results. --compare prints every metric that
+moved by more than --threshold (latencies up or throughputs down are
+regressions); it exits non-zero when any did, for CI.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+# name → (module, full arguments, --quick arguments)
+BENCHMARKS = {
+    "inference":     ("backend.benchmarks.inference", [], ["--runs", "5", "--cold-runs", "1", "--batch-sizes", "1,8,32"]),
+    "preprocessing": ("backend.benchmarks.preprocessing", [], ["--runs", "10"]),
+    "end_to_end":    ("backend.benchmarks.end_to_end", [], ["--workflows", "40", "--concurrency", "8"]),
+    "startup":       ("backend.benchmarks.startup", [], []),
+    "concurrency":   ("backend.benchmarks.concurrency", [], ["--levels", "1,10,50", "--requests", "100", "--logins", "10"]),
+    "workqueue":     ("backend.benchmarks.workqueue", [], ["--rows", "50000", "--runs", "2"]),
+    "db_load":       ("backend.benchmarks.db_load", [], ["--workflows", "100"]),
+    "auth":          ("backend.benchmarks.auth", [], ["--requests", "500"]),
+    "reports":       ("backend.benchmarks.reports", [], ["--reports", "8"]),
+}
+
+DEFAULT = ("inference", "preprocessing", "end_to_end")
+
+# settings that change what the numbers mean
+ENV_KNOBS = (
+    "AI_MODEL_PATH", "AI_RUNTIME", "AI_XLA", "AI_TFLITE_PATH", "AI_TFLITE_THREADS",
+    "AI_BATCHING_ENABLED", "AI_BATCH_MAX_SIZE", "AI_BATCH_MAX_WAIT_MS", "AI_JOB_CLAIM_SIZE",
+    "AI_TTA_ENABLED", "DATABASE_URL", "STORAGE_BACKEND", "OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS",
+)
+
+# a metric name ending like this is better when lower / higher
+LOWER_IS_BETTER = ("_ms", "_ms_mean", "_ms_p50", "_ms_p95", "_ms_p99", "_ms_max", "_seconds", "_seconds_mean", "_bytes")
+HIGHER_IS_BETTER = ("_per_second", "_per_minute")
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "env": {name: os.environ[name] for name in ENV_KNOBS if name in os.environ},
+    }
+
+
+def run_one(name: str, quick: bool) -> dict:
+    module, full, short = BENCHMARKS[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, f"{name}.json")
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-m", module, *(short if quick else full), "--output", output],
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0 or not os.path.exists(output):
+            lines = (proc.stderr or "failed").strip().splitlines()
+            return {"error": lines[-1] if lines else "failed", "wall_seconds": elapsed}
+        with open(output) as f:
+            return {"results": json.load(f), "wall_seconds": elapsed}
+
+
+def run(names: list[str], quick: bool = False) -> dict:
+    document = {"environment": environment(), "quick": quick, "benchmarks": {}}
+    for name in names:
+        print(f"[bench] {name} ...", flush=True)
+        document["benchmarks"][name] = result = run_one(name, quick)
+        status = f"ERROR {result['error']}" if "error" in result else "ok"
+        print(f"[bench] {name} {status} ({result['wall_seconds']:.1f}s)", flush=True)
+    return document
+
+
+# ──────────────────────────────────────────────────────
+# Comparison
+# ──────────────────────────────────────────────────────
+
+def _flatten(value, path: str = "") -> dict[str, float]:
+    """Numeric leaves by dotted path; list items keyed by batch_size / concurrency when they have one."""
+
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {path: float(value)}
+    out = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            out.update(_flatten(item, f"{path}.{key}" if path else str(key)))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = i
+            if isinstance(item, dict):
+                label = next((f"{k}={item[k]}" for k in ("batch_size", "concurrency") if k in item), i)
+            out.update(_flatten(item, f"{path}[{label}]"))
+    return out
+
+
+def _direction(path: str) -> int:
+    """+1 when a higher value is better, -1 when lower is, 0 when it is not a performance metric."""
+
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER) and leaf != "wall_seconds":
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float = 0.10) -> list[dict]:
+    """Metrics present in both documents that moved by more than threshold (relative)."""
+
+    before = _flatten(old.get("benchmarks", {}))
+    after = _flatten(new.get("benchmarks", {}))
+    changes = []
+    for path in sorted(before.keys() & after.keys()):
+        direction = _direction(path)
+        if direction == 0 or before[path] == 0:
+            continue
+        change = (after[path] - before[path]) / abs(before[path])
+        if abs(change) <= threshold:
+            continue
+        changes.append({
+            "metric": path,
+            "before": before[path],
+            "after": after[path],
+            "change": change,
+            "regression": change * direction < 0,
+        })
+    return changes
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS benchmark suite")
+    parser.add_argument("--only", default=",".join(DEFAULT), help=f"comma-separated, from: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, for a fast signal")
+    parser.add_argument("--output", help="write the results document here (default: bench-<commit>.json)")
+    parser.add_argument("--compare", help="an earlier results document to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported by --compare")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    document = run(names, args.quick)
+
+    output = args.output or f"bench-{document['environment']['commit'] or 'unknown'}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"[bench] results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        changes = compare(baseline, document, args.threshold)
+        print(f"\nvs {args.compare} (commit {baseline.get('environment', {}).get('commit')}):")
+        for c in changes:
+            flag = "REGRESSION" if c["regression"] else "improved"
+            print(f"  {flag:10s} {c['metric']}: {c['before']:.4g} → {c['after']:.4g} ({c['change'] * 100:+.1f}%)")
+        if not changes:
+            print(f"  no metric moved by more than {args.threshold * 100:.0f}%")
+        sys.exit(1 if any(c["regression"] for c in changes) else 0)
+
+    sys.exit(1 if any("error" in r for r in document["benchmarks"].values()) else 0)
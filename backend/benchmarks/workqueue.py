@@ -0,0 +1,152 @@
+# backend/benchmarks/workqueue.py
+"""
+Doctor workqueue benchmark on a seeded SQLite database.
+
+Seeds a throwaway database with --rows scans (1M by default; note fields
+filled so full-row loads pay for them), then times the legacy
+`db.query(Scan).all()` against workqueue.fetch_page() for the first page,
+a deep page reached by following cursors, and the filtered views — once
+without and once with the composite indexes:
+
+    python -m backend.benchmarks.workqueue [--rows 1000000] [--runs 5] [--skip-legacy] [--output wq.json]
+"""
+
+import os
+import time
+import random
+import argparse
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.schema import Scan
+from backend.services import workqueue
+
+STATUSES = ["PENDING_AI", "AI_ANALYZED", "DOCTOR_VERIFIED", "PHARMACIST_COMPLETED", "REPORT_READY"]
+LABELS = ["Normal", "Pneumonia", "Tuberculosis", "Lung_Opacity", "Uncertain"]
+NOTE = "Findings consistent with the AI result; follow-up imaging advised. " * 8
+
+
+def seed(engine, rows: int, chunk: int = 50_000):
+    Scan.__table__.create(bind=engine)
+    for index in Scan.__table__.indexes:
+        index.drop(bind=engine)
+
+    rng = random.Random(0)
+    start = datetime(2023, 1, 1)
+
+    with engine.begin() as conn:
+        for offset in range(0, rows, chunk):
+            batch = []
+            for i in range(offset, min(offset + chunk, rows)):
+                status = rng.choices(STATUSES, weights=[2, 3, 3, 2, 90])[0]
+                analysed = status != "PENDING_AI"
+                batch.append({
+                    "patient_id": rng.randrange(1, 20_000),
+                    "file_path": f"uploads/patient_scans/{i:064x}.png",
+                    "prediction": rng.choice(LABELS) if analysed else None,
+                    "confidence": rng.random() if analysed else None,
+                    "doctor_notes": NOTE if status not in ("PENDING_AI", "AI_ANALYZED") else None,
+                    "pharmacist_notes": NOTE if status in ("PHARMACIST_COMPLETED", "REPORT_READY") else None,
+                    "status": status,
+                    "created_at": start + timedelta(seconds=i * 30),
+                })
+            conn.execute(insert(Scan), batch)
+
+
+def timed(fn, runs: int) -> dict:
+    fn()                                   # warm the page cache
+    timings = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    return {"ms_median": timings[len(timings) // 2], "ms_max": timings[-1]}
+
+
+def scenarios(Session) -> dict:
+
+    def page(**kwargs):
+        def run():
+            with Session() as db:
+                return workqueue.fetch_page(db, limit=50, **kwargs)
+        return run
+
+    def deep_page(pages: int = 20):
+        def run():
+            with Session() as db:
+                cursor = None
+                for _ in range(pages):
+                    cursor = workqueue.fetch_page(db, limit=50, cursor=cursor)["next_cursor"]
+        return run
+
+    recent = datetime(2023, 1, 1) + timedelta(days=30)
+
+    return {
+        "page1_newest":        page(),
+        "page20_by_cursor":    deep_page(),
+        "pending_ai":          page(status=["PENDING_AI"]),
+        "analyzed_low_conf":   page(status=["AI_ANALYZED"], max_confidence=0.6),
+        "patient_history":     page(patient_id=4242),
+        "status_date_range":   page(status=["DOCTOR_VERIFIED"], date_from=recent, date_to=recent + timedelta(days=7)),
+    }
+
+
+def run(rows: int = 1_000_000, runs: int = 5, skip_legacy: bool = False) -> dict:
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(bind=engine)
+
+        t = time.perf_counter()
+        seed(engine, rows)
+        results = {"rows": rows, "seed_seconds": time.perf_counter() - t}
+
+        if not skip_legacy:
+            def legacy():
+                with Session() as db:
+                    return db.query(Scan).all()
+            results["legacy_all"] = timed(legacy, max(1, runs // 2))
+
+        results["without_indexes"] = {name: timed(fn, runs) for name, fn in scenarios(Session).items()}
+
+        t = time.perf_counter()
+        for index in Scan.__table__.indexes:
+            index.create(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        results["index_build_seconds"] = time.perf_counter() - t
+
+        results["with_indexes"] = {name: timed(fn, runs) for name, fn in scenarios(Session).items()}
+
+        engine.dispose()
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS doctor workqueue benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true", help="skip the full-table query.all() baseline")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.runs, args.skip_legacy)
+
+    print(f"seeded {results['rows']:,} rows in {results['seed_seconds']:.1f}s")
+    if "legacy_all" in results:
+        print(f"{'legacy query.all()':24s} {results['legacy_all']['ms_median']:10.1f} ms")
+    print(f"{'scenario':24s} {'no index ms':>12s} {'indexed ms':>12s}")
+    for name, indexed in results["with_indexes"].items():
+        plain = results["without_indexes"][name]
+        print(f"{name:24s} {plain['ms_median']:12.2f} {indexed['ms_median']:12.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -8,4 +8,16 @@ from pathlib import Path
 BASE_DIR   = Path(__file__).resolve().parent.parent
 UPLOAD_DIR = BASE_DIR / "uploads" / "patient_scans"
 
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def resolve_scan_path(relative_path: str) -> Path:
+    """
+    Convert DB stored relative path
+    (e.g. uploads/patient_scans/abc.jpg)
+    into an absolute path from project root.
+    """
+    p = Path(relative_path)
+    if p.is_absolute():
+        return p
+    return BASE_DIR / p
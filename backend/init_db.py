@@ -1,14 +1,61 @@
 # backend/init_db.py
 
+from sqlalchemy import inspect, text
+
 from backend.database import Base, engine
 
 from backend.models.user import User
 from backend.models.schema import Scan
+from backend.models.otp import OTPRecord
+from backend.models.job import AnalysisJob
+from backend.models.prediction_cache import PredictionCacheEntry
+from backend.models.outbox import OutboxEmail
+
+
+def ensure_indexes():
+
+    # create_all skips tables that already exist, so indexes added to an
+    # existing model are created here (no-op once present)
+    for index in Scan.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    # A database that already holds two active jobs for one scan cannot take
+    # the unique index: keep the oldest and fail the rest first
+    existing = {index["name"] for index in inspect(engine).get_indexes(AnalysisJob.__tablename__)}
+    if "uq_analysis_jobs_active_scan" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE analysis_jobs SET status = 'FAILED', error = 'Duplicate of an earlier active job' "
+                "WHERE status IN ('QUEUED', 'RUNNING') AND id NOT IN ("
+                "SELECT MIN(id) FROM analysis_jobs WHERE status IN ('QUEUED', 'RUNNING') GROUP BY scan_id)"
+            ))
+    for index in AnalysisJob.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def ensure_columns():
+
+    # create_all never alters existing tables either: add nullable columns
+    # that were added to a model after its table was created
+    inspector = inspect(engine)
+    for table in (Scan.__table__, AnalysisJob.__table__, OutboxEmail.__table__):
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                    ))
 
 
 def init():
 
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
 
     print("Database created")
 
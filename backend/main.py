@@ -2,8 +2,9 @@
 
 import os
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from backend.routers import patient
 from backend.routers import doctor
@@ -13,7 +14,27 @@ from backend.routers import auth_router
 from backend.routers import otp
 from backend.routers import chatbot
 from backend.routers import auth
-from backend.routers import reports
+from backend.routers import reports_router
+from backend.routers import events as events_router
+from backend.routers import email_outbox
+from backend.routers import metrics_router
+from backend.database import async_engine
+from backend.init_db import ensure_columns, ensure_indexes
+from backend.services import email_service
+from backend.services import events
+from backend.services import executors
+from backend.services import gradcam
+from backend.services import http_metrics
+from backend.services import job_queue
+from backend.services import model_registry
+from backend.services import prediction_cache
+from backend.services import reports as report_service
+from backend.services import tracing
+from backend.services import tta
+
+# Analysis runs in the AI worker processes, which always warm up; the API
+# process only loads the model for lazy Grad-CAM overlays.
+AI_WARMUP_ON_STARTUP = os.getenv("AI_WARMUP_ON_STARTUP", "false").lower() == "true"
 
 # Ensure upload directory exists before any request hits
 os.makedirs("uploads/patient_scans", exist_ok=True)
@@ -31,6 +52,26 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Added after CORS so it runs outside it: CORS preflights are counted too
+if http_metrics.METRICS_ENABLED:
+    app.add_middleware(http_metrics.MetricsMiddleware)
+
+# Outermost of all: the request span covers every other middleware
+if tracing.TRACING_ENABLED:
+    app.add_middleware(tracing.TracingMiddleware)
+
+
+@app.exception_handler(executors.ExecutorSaturated)
+async def executor_saturated(request: Request, exc: executors.ExecutorSaturated):
+
+    # A full CPU pool (bcrypt for register/login, …) is back-pressure, not a
+    # server error: tell the client to retry instead of returning a 500
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 
 @app.get("/")
 def home():
@@ -40,6 +81,102 @@ def home():
     }
 
 
+@app.on_event("startup")
+def warm_up_model():
+
+    if AI_WARMUP_ON_STARTUP:
+        model_registry.warm_up()
+        tta.warm_up()
+
+
+@app.on_event("startup")
+def warm_up_gradcam():
+
+    # Lazy overlays are computed in this process: build + trace before the
+    # first request asks for one (in the background, startup does not wait)
+    if gradcam.GRADCAM_MODE == "lazy" and gradcam.GRADCAM_WARMUP_ON_STARTUP:
+        gradcam.start_warm_up()
+
+
+@app.on_event("startup")
+def upgrade_schema():
+
+    ensure_columns()
+    ensure_indexes()
+
+
+@app.on_event("startup")
+def purge_prediction_cache():
+
+    # Drop results cached under a previous model / threshold
+    prediction_cache.purge_stale()
+
+
+@app.on_event("startup")
+def start_password_pool():
+
+    # spawn the bcrypt processes now rather than on the first login
+    executors.warm_cpu_pool()
+
+
+@app.on_event("startup")
+def start_report_pool():
+
+    report_service.warm_pool()
+
+
+@app.on_event("startup")
+def start_event_broker():
+
+    # before the AI workers, which forward over the broker when there is one
+    events.start_broker()
+
+
+@app.on_event("startup")
+def start_ai_workers():
+
+    job_queue.start_worker_pool()
+
+
+@app.on_event("startup")
+def start_email_sender():
+
+    email_service.start_sender()
+
+
+@app.on_event("shutdown")
+def stop_email_sender():
+
+    email_service.stop_sender()
+
+
+@app.on_event("shutdown")
+def stop_ai_workers():
+
+    job_queue.stop_worker_pool()
+
+
+@app.on_event("shutdown")
+def stop_event_broker():
+
+    events.set_broker(None)
+
+
+@app.on_event("shutdown")
+async def close_database():
+
+    executors.shutdown()
+    report_service.shutdown()
+    await async_engine.dispose()
+
+
+@app.on_event("shutdown")
+def flush_traces():
+
+    # spans of the email sender and background tasks stopped above
+    tracing.shutdown()
+
+
 app.include_router(auth_router.router)
 app.include_router(patient.router)
 app.include_router(doctor.router)
@@ -48,4 +185,7 @@ app.include_router(admin.router)
 app.include_router(otp.router)
 app.include_router(chatbot.router)
 app.include_router(auth.router)
-app.include_router(reports.router)
+app.include_router(reports_router.router)
+app.include_router(events_router.router)
+app.include_router(email_outbox.router)
+app.include_router(metrics_router.router)
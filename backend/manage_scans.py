@@ -0,0 +1,76 @@
+# backend/manage_scans.py
+"""
+Scan storage maintenance.
+
+    python -m backend.manage_scans migrate [--dry-run]   # legacy flat files → content-addressed shards
+    python -m backend.manage_scans gc [--dry-run] [--grace-minutes 60]
+    python -m backend.manage_scans derivatives [--force]  # thumbnails + report-size copies
+    python -m backend.manage_scans rescore [--dry-run --limit 2000] [--restart]  # after a model upgrade
+"""
+
+import json
+import logging
+import argparse
+
+from backend.database import SessionLocal
+from backend.services import cas, derivatives, rescoring
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="CSSS scan storage maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="rewrite legacy scan files and rows into the content-addressed layout")
+    migrate.add_argument("--dry-run", action="store_true")
+    migrate.add_argument("--chunk-size", type=int, default=500)
+
+    gc = sub.add_parser("gc", help="delete stored scans no longer referenced by any scan row")
+    gc.add_argument("--dry-run", action="store_true")
+    gc.add_argument("--grace-minutes", type=int, default=cas.GC_GRACE_SECONDS // 60)
+
+    derive = sub.add_parser("derivatives", help="generate missing thumbnail and report-size scan images")
+    derive.add_argument("--force", action="store_true", help="regenerate existing ones (e.g. after a quality change)")
+    derive.add_argument("--chunk-size", type=int, default=500)
+
+    rescore = sub.add_parser("rescore", help="re-run AI on scans predicted by another model version")
+    rescore.add_argument("--chunk-size", type=int, default=rescoring.RESCORE_CHUNK_SIZE, help="rows per DB read + bulk write")
+    rescore.add_argument("--batch-size", type=int, default=rescoring.RESCORE_BATCH_SIZE, help="scans per forward pass")
+    rescore.add_argument("--decode-workers", type=int, default=rescoring.RESCORE_DECODE_WORKERS)
+    rescore.add_argument("--checkpoint", default=rescoring.RESCORE_CHECKPOINT)
+    rescore.add_argument("--status", action="append", help="only scans in this status (repeatable)")
+    rescore.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    rescore.add_argument("--limit", type=int, help="stop after this many scans")
+    rescore.add_argument("--dry-run", action="store_true", help="score without writing (throughput sample)")
+
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "migrate":
+            result = cas.migrate(db, chunk_size=args.chunk_size, dry_run=args.dry_run)
+        elif args.command == "derivatives":
+            result = derivatives.backfill(db, chunk_size=args.chunk_size, force=args.force)
+        elif args.command == "rescore":
+            logging.basicConfig(level=logging.INFO)
+            result = rescoring.rescore(
+                db,
+                chunk_size=args.chunk_size,
+                batch_size=args.batch_size,
+                decode_workers=args.decode_workers,
+                checkpoint_path=args.checkpoint,
+                statuses=args.status,
+                restart=args.restart,
+                limit=args.limit,
+                dry_run=args.dry_run,
+            )
+        else:
+            result = cas.collect_garbage(db, dry_run=args.dry_run, grace_seconds=args.grace_minutes * 60)
+    finally:
+        db.close()
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
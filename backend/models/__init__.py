@@ -3,9 +3,15 @@
 from .user import User
 from .schema import Scan
 from .otp import OTPRecord
+from .job import AnalysisJob
+from .prediction_cache import PredictionCacheEntry
+from .outbox import OutboxEmail
 
 __all__ = [
     "User",
     "Scan",
-    "OTPRecord"
+    "OTPRecord",
+    "AnalysisJob",
+    "PredictionCacheEntry",
+    "OutboxEmail"
 ]
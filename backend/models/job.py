@@ -0,0 +1,44 @@
+# backend\models\job.py
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, text
+from datetime import datetime
+from backend.database import Base
+
+
+class AnalysisJob(Base):
+
+    __tablename__ = "analysis_jobs"
+
+    # At most one queued/running job per scan, whoever enqueues it
+    __table_args__ = (
+        Index(
+            "uq_analysis_jobs_active_scan", "scan_id",
+            unique=True,
+            sqlite_where=text("status IN ('QUEUED', 'RUNNING')"),
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    scan_id = Column(Integer, ForeignKey("scans.id"), nullable=False, index=True)
+
+    status = Column(String, default="QUEUED", index=True)
+
+    attempts = Column(Integer, default=0)
+
+    worker = Column(String, nullable=True)
+
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    started_at = Column(DateTime, nullable=True)
+
+    finished_at = Column(DateTime, nullable=True)
+
+    # the claiming worker renews this while it runs; past it the job is stale
+    claimed_until = Column(DateTime, nullable=True)
+
+    # W3C trace context of the request that queued the job (tracing)
+    traceparent = Column(String, nullable=True)
@@ -0,0 +1,48 @@
+# backend\models\outbox.py
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from backend.database import Base
+
+
+class OutboxEmail(Base):
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    kind = Column(String, nullable=False)
+
+    to_email = Column(String, nullable=False)
+
+    subject = Column(String, nullable=False)
+
+    body = Column(Text, nullable=False)
+
+    attachment_key = Column(String, nullable=True)
+
+    attachment_name = Column(String, nullable=True)
+
+    status = Column(String, default="QUEUED")
+
+    attempts = Column(Integer, default=0)
+
+    sender = Column(String, nullable=True)
+
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+
+    claimed_at = Column(DateTime, nullable=True)
+
+    sent_at = Column(DateTime, nullable=True)
+
+    # W3C trace context of the request that queued the message (tracing)
+    traceparent = Column(String, nullable=True)
+
+    __table_args__ = (
+        # the sender's claim query: due messages in a given state
+        Index("ix_email_outbox_status_due", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,18 @@
+# backend\models\prediction_cache.py
+
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime
+from backend.database import Base
+
+
+class PredictionCacheEntry(Base):
+
+    __tablename__ = "prediction_cache"
+
+    content_hash = Column(String, primary_key=True)
+
+    cache_version = Column(String, primary_key=True, index=True)
+
+    result = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,6 +1,6 @@
 ﻿# backend\models\schema.py
 
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Index
 from datetime import datetime
 from backend.database import Base
 
@@ -9,6 +9,13 @@ class Scan(Base):
 
     __tablename__ = "scans"
 
+    # Workqueue filters + keyset pagination (id breaks created_at ties)
+    __table_args__ = (
+        Index("ix_scans_status_created_at", "status", "created_at", "id"),
+        Index("ix_scans_patient_created_at", "patient_id", "created_at", "id"),
+        Index("ix_scans_created_at", "created_at", "id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
 
     patient_id = Column(Integer, nullable=False)
@@ -19,6 +26,9 @@ class Scan(Base):
 
     confidence = Column(Float, nullable=True)
 
+    # model_registry.model_version() of the model that produced prediction
+    model_version = Column(String, nullable=True)
+
     doctor_notes = Column(Text, nullable=True)
 
     pharmacist_notes = Column(Text, nullable=True)
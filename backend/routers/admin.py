@@ -0,0 +1,32 @@
+# backend/routers/admin.py
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import get_async_db
+from backend.models.schema import Scan
+from backend.routers.admin_router import approve_report
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"]
+)
+
+
+@router.get("/pending")
+async def admin_pending(
+    db: AsyncSession = Depends(get_async_db)
+):
+
+    result = await db.execute(select(Scan).where(
+
+        Scan.status == "PHARMACIST_COMPLETED"
+
+    ))
+
+    return result.scalars().all()
+
+
+# approve_report lives in admin_router with its background delivery task
+router.add_api_route("/approve/{scan_id}", approve_report, methods=["POST"])
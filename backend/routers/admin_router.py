@@ -1,66 +1,49 @@
 # backend\routers\admin_router.py
 
-import smtplib
-from email.message import EmailMessage
-from pathlib import Path
-from weasyprint import HTML
-from fastapi import HTTPException
+import logging
+from fastapi import Depends, HTTPException
 from backend.models.user import User
 from backend.models.schema import Scan
-from backend.database import get_db
-from sqlalchemy.orm import Session
-from backend.routers.admin import router
-
-REPORTS_DIR = Path(__file__).parent.parent / "reports" / "temp"
-REPORTS_DIR.mkdir(parents=True, exist_ok=True)
-
-def send_email_with_pdf(to_email: str, subject: str, body: str, pdf_path: Path):
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = "your_email@example.com"  # Replace with your email
-    msg['To'] = to_email
-    msg.set_content(body)
-
-    with open(pdf_path, 'rb') as f:
-        pdf_data = f.read()
-    msg.add_attachment(pdf_data, maintype='application', subtype='pdf', filename=pdf_path.name)
-
-    # Use SMTP server
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:  # Gmail example
-        smtp.login("your_email@example.com", "your_app_password")  # app password if Gmail
-        smtp.send_message(msg)
-
-def approve_report(scan_id: int, db: Session):
-    scan: Scan = db.query(Scan).filter(Scan.id == scan_id).first()
+from backend.database import AsyncSessionLocal, get_async_db
+from backend.services import email_service, reports, tracing
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+async def _deliver_report(snapshot: dict):
+    # Runs after the response: render in the report pool (or reuse the cached
+    # PDF), then hand it to the email outbox; the sender attaches it from storage.
+    # The task was created in the request's context, so this joins its trace.
+    try:
+        with tracing.span("report.deliver", scan_id=snapshot["scan_id"]):
+            pdf_key = await reports.ensure_report(snapshot)
+            with tracing.span("email.enqueue", kind="producer"):
+                async with AsyncSessionLocal() as db:
+                    email_service.queue_report_email(db, snapshot, pdf_key, reports.attachment_name(snapshot))
+                    await db.commit()
+    except Exception:
+        logger.exception(f"[REPORT] delivery of scan {snapshot['scan_id']} to {snapshot['patient_email']} failed")
+
+async def approve_report(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    scan: Scan = await db.get(Scan, scan_id)
     if not scan:
         raise HTTPException(404, "Scan not found")
 
-    # Mark report as approved
-    scan.status = "REPORT_READY"
-    db.commit()
-
     # Fetch patient
-    patient: User = db.query(User).filter(User.id == scan.patient_id).first()
+    patient: User = await db.get(User, scan.patient_id)
     if not patient or not patient.email:
         raise HTTPException(404, "Patient not found or has no email")
 
-    # Build PDF (same as your /reports/pdf endpoint)
-    from backend.routers.reports_router import _load_template, _build_template_context
-
-    template = _load_template()
-    context = _build_template_context(scan, patient)
-    html_str = template.render(**context)
-
-    # Save PDF to disk
-    pdf_path = REPORTS_DIR / f"Report_Scan_{scan.id}_P{str(patient.id).zfill(6)}.pdf"
-    HTML(string=html_str).write_pdf(pdf_path)
+    # Mark report as approved
+    tracing.annotate(scan_id=scan_id)
+    scan.status = "REPORT_READY"
+    with tracing.span("db.commit"):
+        await db.commit()
 
-    # Send PDF via email
-    send_email_with_pdf(
-        to_email=patient.email,
-        subject=f"Your Scan Report #{scan.id}",
-        body="Dear patient,\n\nYour scan report is ready. Please find it attached.\n\nRegards,\nClinical Scan Support System",
-        pdf_path=pdf_path
-    )
+    # WeasyPrint rendering and the email happen in the background, not in this request
+    reports.submit(_deliver_report(reports.report_snapshot(scan, patient)))
 
-    return {"message": f"Report approved and sent to {patient.email}"}
\ No newline at end of file
+    return {
+        "message": f"Report approved; it will be emailed to {patient.email}",
+        "report_url": f"/reports/pdf/{scan.id}",
+    }
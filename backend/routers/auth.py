@@ -1,11 +1,13 @@
 # backend/routers/auth.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models import User
-from backend.security import hash_password, verify_password, create_access_token
+from backend.security import hash_password_async, verify_and_rehash_async, create_access_token
+from backend.security import rate_limit
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -23,30 +25,38 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/register")
-def register(req: RegisterRequest, db: Session = Depends(get_db)):
+async def register(req: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     allowed = {"patient", "doctor", "pharmacist", "admin"}
     if req.role not in allowed:
         raise HTTPException(400, "Invalid role")
-    existing = db.query(User).filter(User.email == req.email).first()
+    existing = (await db.execute(select(User).where(User.email == req.email))).scalars().first()
     if existing:
         raise HTTPException(400, "Email already registered")
     user = User(
         name=req.name,
         email=req.email,
-        password=hash_password(req.password),
+        password=await hash_password_async(req.password),
         role=req.role,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return {"message": "Registered successfully", "user_id": user.id, "role": user.role}
 
 
 @router.post("/login")
-def login(req: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == req.email, User.is_active == True).first()
-    if not user or not verify_password(req.password, user.password):
-        raise HTTPException(401, "Invalid email or password")
+async def login(req: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    with rate_limit.login_attempt(request, req.email):
+        user = (await db.execute(
+            select(User).where(User.email == req.email, User.is_active == True)
+        )).scalars().first()
+        valid, new_hash = await verify_and_rehash_async(req.password, user.password) if user else (False, None)
+        if not valid:
+            raise HTTPException(401, "Invalid email or password")
+        if new_hash:
+            user.password = new_hash
+            await db.commit()
+            rate_limit.login_rehashed.inc()
 
     # Admin requires OTP — return a pre-token flag
     if user.role == "admin":
@@ -1,25 +1,28 @@
 # backend/routers/auth_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models.user import User
 
 from backend.schemas.user_schema import UserCreate, UserLogin, TokenResponse
 
-from backend.security.password import hash_password, verify_password
+from backend.security.password import hash_password_async, verify_and_rehash_async
 from backend.security.jwt_handler import create_access_token
+from backend.security import rate_limit, token_cache
+from backend.services import executors
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
 
-    existing = db.query(User).filter(
+    existing = (await db.execute(select(User).where(
         User.email == user.email
-    ).first()
+    ))).scalars().first()
 
     if existing:
 
@@ -29,33 +32,44 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
         name=user.name,
         email=user.email,
-        password=hash_password(user.password),
+        password=await hash_password_async(user.password),
         role=user.role
     )
 
     db.add(new_user)
-    db.commit()
+    await db.commit()
 
     return {"message": "User created"}
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
 
-    db_user = db.query(User).filter(
-        User.email == user.email
-    ).first()
+    with rate_limit.login_attempt(request, user.email):
+
+        db_user = (await db.execute(select(User).where(
+            User.email == user.email
+        ))).scalars().first()
+
+        if not db_user:
+
+            raise HTTPException(401, "Invalid email")
+
+        valid, new_hash = await verify_and_rehash_async(
+            user.password,
+            db_user.password
+        )
 
-    if not db_user:
+        if not valid:
 
-        raise HTTPException(401, "Invalid email")
+            raise HTTPException(401, "Invalid password")
 
-    if not verify_password(
-        user.password,
-        db_user.password
-    ):
+        if new_hash:
 
-        raise HTTPException(401, "Invalid password")
+            # BCRYPT_ROUNDS changed since this hash was made
+            db_user.password = new_hash
+            await db.commit()
+            rate_limit.login_rehashed.inc()
 
     token = create_access_token({
 
@@ -68,3 +82,13 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         "access_token": token,
         "token_type": "bearer"
     }
+
+
+@router.get("/stats")
+async def login_stats():
+
+    return {
+        "login": rate_limit.login_stats(),
+        "password_pool": executors.cpu_pool_stats(),
+        "auth_cache": token_cache.stats()
+    }
@@ -1,15 +1,21 @@
 ﻿# backend/routers/doctor.py
 
 import logging
-from pathlib import Path
+import mimetypes
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from backend.database import get_db
+from backend.database import get_async_db
+from backend.models.job import AnalysisJob
 from backend.models.schema import Scan
-from backend.services.ai_service import predict_scan
-from backend.config import BASE_DIR
+from backend.schemas.scan_schema import ScanPage
+from backend.services.ai_service import batching_stats
+from backend.services import blob_storage, cas, derivatives, executors, gradcam, job_queue, model_registry, prediction_cache, tracing, tta, workqueue
 
 logger = logging.getLogger(__name__)
 
@@ -20,93 +26,388 @@ router = APIRouter(
 
 
 # ─────────────────────────────────────────────────────────────
-# Helper: Resolve stored relative path → absolute filesystem path
+# Get Workqueue (filtered, cursor-paginated, notes omitted)
 # ─────────────────────────────────────────────────────────────
 
-def resolve_scan_path(relative_path: str) -> Path:
-    """
-    Convert DB stored relative path
-    (e.g. uploads/patient_scans/abc.jpg)
-    into an absolute path from project root.
-    """
-    p = Path(relative_path)
-    if p.is_absolute():
-        return p
-    return BASE_DIR / p
+@router.get("/pending", response_model=ScanPage)
+async def get_pending_scans(
+    status: Optional[List[str]] = Query(None, description="repeat for several statuses"),
+    patient_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    prediction: Optional[str] = None,
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    max_confidence: Optional[float] = Query(None, ge=0, le=1),
+    sort: str = Query("newest", description="newest | oldest | confidence_asc | confidence_desc"),
+    limit: int = Query(workqueue.DEFAULT_LIMIT, ge=1, le=workqueue.MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        return await db.run_sync(
+            workqueue.fetch_page,
+            status=status,
+            patient_id=patient_id,
+            date_from=date_from,
+            date_to=date_to,
+            prediction=prediction,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence,
+            sort=sort,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/pending/counts")
+async def get_queue_counts(
+    patient_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Scans per status over the whole queue, for the dashboard tabs."""
+    return await db.run_sync(workqueue.count_by_status, patient_id=patient_id)
 
 
 # ─────────────────────────────────────────────────────────────
-# Get Workqueue (all scans)
+# Helper: Serialize an analysis job for polling clients
 # ─────────────────────────────────────────────────────────────
 
-@router.get("/pending")
-def get_pending_scans(db: Session = Depends(get_db)):
-    return db.query(Scan).all()
+def job_to_dict(job: AnalysisJob, scan: Scan | None = None) -> dict:
+    data = {
+        "job_id": job.id,
+        "scan_id": job.scan_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if scan is not None and job.status == job_queue.DONE:
+        data["scan_status"] = scan.status
+        data["prediction"] = scan.prediction
+        data["confidence"] = scan.confidence
+    return data
 
 
 # ─────────────────────────────────────────────────────────────
-# Run AI Analysis
+# Queue AI Analysis for every PENDING_AI scan
+# (declared before /analyze/{scan_id} so "pending" is not parsed as an id)
 # ─────────────────────────────────────────────────────────────
 
-@router.post("/analyze/{scan_id}")
-def analyze_scan(scan_id: int, db: Session = Depends(get_db)):
+@router.post("/analyze/pending", status_code=202)
+async def analyze_all_pending(db: AsyncSession = Depends(get_async_db)):
+
+    jobs = await db.run_sync(job_queue.enqueue_pending)
+
+    return {
+        "message": f"{len(jobs)} scans queued for AI analysis",
+        "job_ids": [job.id for job in jobs],
+        "queue_depth": await db.run_sync(job_queue.queue_depth),
+    }
 
-    scan = db.query(Scan).filter(Scan.id == scan_id).first()
+
+# ─────────────────────────────────────────────────────────────
+# Queue AI Analysis (workers update the scan when done)
+# ─────────────────────────────────────────────────────────────
+
+@router.post("/analyze/{scan_id}", status_code=202)
+async def analyze_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+
+    scan = await db.get(Scan, scan_id)
 
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
 
-    abs_path = resolve_scan_path(scan.file_path)
+    if scan.status not in job_queue.ANALYZABLE_SCAN_STATES:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Scan is already {scan.status}; it can no longer be re-analysed"
+        )
+
+    tracing.annotate(scan_id=scan_id)
+
+    store = blob_storage.get_store()
+    with tracing.span("storage.exists", backend=store.name):
+        exists = await run_in_threadpool(store.exists, scan.file_path)
 
     logger.info(
         f"[AI] scan_id={scan_id} | "
         f"stored='{scan.file_path}' | "
-        f"resolved='{abs_path}' | "
-        f"exists={abs_path.exists()}"
+        f"backend={store.name} | "
+        f"exists={exists}"
     )
 
-    if not abs_path.exists():
+    if not exists:
         raise HTTPException(
             status_code=400,
             detail=(
-                "Scan file not found on disk. "
+                "Scan file not found in storage. "
                 f"Stored path: {scan.file_path}"
             )
         )
 
-    # Run AI safely
-    try:
-        result = predict_scan(str(abs_path))
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.exception("AI prediction failed")
-        raise HTTPException(
-            status_code=500,
-            detail=f"AI prediction failed: {type(e).__name__}"
-        )
+    # ── Same bytes analysed before by this model → answer now ─
+    with tracing.span("cache.lookup") as span:
+        digest = await run_in_threadpool(cas.digest_of, scan.file_path)
+        cached = await run_in_threadpool(prediction_cache.get, digest)
+        span.set_attribute("hit", cached is not None)
+
+    if cached is not None:
+        scan.prediction = cached["label"]
+        scan.confidence = cached["confidence"]
+        scan.model_version = cached.get("model_version")
+        scan.status = "AI_ANALYZED"
+
+        with tracing.span("db.commit"):
+            await db.commit()
+
+        return {
+            "message": "AI analysis complete",
+            "status": scan.status,
+            "prediction": scan.prediction,
+            "confidence": scan.confidence,
+            "all_predictions": cached["all_predictions"],
+            "cached": True,
+        }
+
+    # the job row carries this trace to the worker that claims it
+    with tracing.span("queue.enqueue", kind="producer") as span:
+        job = await db.run_sync(job_queue.enqueue_analysis, scan_id)
+        span.set_attribute("job_id", job.id)
 
-    if not result or "label" not in result or "confidence" not in result:
-        raise HTTPException(
-            status_code=500,
-            detail="AI returned unexpected result format"
-        )
+    return {
+        "message": "AI analysis queued",
+        "job_id": job.id,
+        "status": job.status,
+        "scan_id": scan_id,
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Poll AI Analysis Job
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/analyze/jobs/{job_id}")
+async def analyze_job_status(job_id: int, db: AsyncSession = Depends(get_async_db)):
+
+    job = await db.get(AnalysisJob, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    scan = await db.get(Scan, job.scan_id)
 
-    scan.prediction = result["label"]
-    scan.confidence = result["confidence"]
-    scan.status = "AI_ANALYZED"
+    return job_to_dict(job, scan)
 
-    db.commit()
-    db.refresh(scan)
 
+# ─────────────────────────────────────────────────────────────
+# Inference stats (batching histograms + job throughput/latency)
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/analyze/stats")
+async def analyze_stats(window_minutes: int = Query(5, ge=1, le=1440), db: AsyncSession = Depends(get_async_db)):
     return {
-        "message": "AI analysis complete",
-        "status": scan.status,
-        "prediction": scan.prediction,
-        "confidence": scan.confidence,
+        "models": model_registry.stats(),
+        "batching": batching_stats(),
+        "tta": tta.stats(),
+        "prediction_cache": await run_in_threadpool(prediction_cache.stats),
+        "jobs": await db.run_sync(job_queue.pipeline_stats, window_minutes=window_minutes),
+        "gradcam": gradcam.stats(),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Scan image (streamed from blob storage, HTTP Range aware;
+# S3 backends redirect to a short-lived presigned URL instead)
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/scan/{scan_id}/image")
+async def scan_image(scan_id: int, request: Request, redirect: bool = True, db: AsyncSession = Depends(get_async_db)):
+
+    scan = await db.get(Scan, scan_id)
+
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    store = blob_storage.get_store()
+
+    if redirect:
+        url = store.presigned_url(scan.file_path)
+        if url is not None:
+            return RedirectResponse(url, status_code=307)
+
+    try:
+        info = await run_in_threadpool(store.stat, scan.file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Scan file not found in storage")
+
+    media_type = mimetypes.guess_type(scan.file_path)[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Last-Modified": blob_storage.http_date(info.modified),
+    }
+    if cas.is_addressed(scan.file_path):
+        # Content-addressed objects never change under the same key
+        headers["ETag"] = f'"{cas.digest_from_path(scan.file_path)}"'
+        headers["Cache-Control"] = "private, max-age=31536000, immutable"
+
+    try:
+        byte_range = blob_storage.parse_range(request.headers.get("range"), info.size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{info.size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(info.size)
+        return StreamingResponse(store.stream(scan.file_path), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        store.stream(scan.file_path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+# ─────────────────────────────────────────────────────────────
+# Scan image derivatives: thumb (dashboards) / report size,
+# WebP when the client accepts it, JPEG otherwise
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/scan/{scan_id}/image/{variant}")
+async def scan_image_variant(
+    scan_id: int,
+    variant: str,
+    request: Request,
+    format: Optional[str] = Query(None, description="jpeg or webp; negotiated from Accept when omitted"),
+    redirect: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+
+    if variant not in derivatives.VARIANTS:
+        raise HTTPException(status_code=404, detail=f"Unknown image variant '{variant}'")
+
+    fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+    if fmt not in derivatives.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format '{fmt}'")
+
+    scan = await db.get(Scan, scan_id)
+
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    try:
+        digest = cas.digest_from_path(scan.file_path) or await run_in_threadpool(cas.digest_of, scan.file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Scan file not found in storage")
+
+    key = derivatives.key_for(digest, variant, fmt)
+
+    # The key is derived from the content and the variant size, so it is a
+    # strong validator and the bytes behind it never change.
+    headers = {
+        "ETag": f'"{key.rsplit("/", 1)[-1]}"',
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if format is None:
+        headers["Vary"] = "Accept"
+
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    store = blob_storage.get_store()
+
+    if not await run_in_threadpool(store.exists, key):
+        try:
+            await executors.run_blocking(derivatives.generate, scan.file_path, digest, force=True)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Scan file not found in storage")
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Scan image cannot be converted: {e}")
+        derivatives.on_demand.inc()
+
+    if redirect:
+        url = store.presigned_url(key)
+        if url is not None:
+            return RedirectResponse(url, status_code=307)
+
+    info = await run_in_threadpool(store.stat, key)
+    headers["Content-Length"] = str(info.size)
+    headers["Last-Modified"] = blob_storage.http_date(info.modified)
+
+    return StreamingResponse(store.stream(key), media_type=derivatives.media_type(fmt), headers=headers)
+
+
+# ─────────────────────────────────────────────────────────────
+# Grad-CAM overlay: the regions behind the AI prediction,
+# computed once per scan and model, then served like a derivative
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/scan/{scan_id}/gradcam")
+async def scan_gradcam(
+    scan_id: int,
+    request: Request,
+    format: Optional[str] = Query(None, description="jpeg or webp; negotiated from Accept when omitted"),
+    redirect: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+
+    if not gradcam.enabled():
+        raise HTTPException(status_code=404, detail="Grad-CAM overlays are disabled")
+
+    fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+    if fmt not in derivatives.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format '{fmt}'")
+
+    scan = await db.get(Scan, scan_id)
+
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    try:
+        digest = cas.digest_from_path(scan.file_path) or await run_in_threadpool(cas.digest_of, scan.file_path)
+        key = await run_in_threadpool(gradcam.key_for, digest, fmt)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Scan file not found in storage")
+
+    # The key carries the content hash and the model version
+    headers = {
+        "ETag": f'"{key.rsplit("/", 1)[-1]}"',
+        "Cache-Control": "private, max-age=31536000, immutable",
     }
+    if format is None:
+        headers["Vary"] = "Accept"
+
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    store = blob_storage.get_store()
+
+    try:
+        key = await executors.run_blocking(gradcam.ensure, scan.file_path, digest, fmt)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Scan file not found in storage")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Grad-CAM overlay cannot be computed: {e}")
+    except Exception as e:
+        logger.exception(f"[AI] Grad-CAM for scan {scan_id} failed")
+        raise HTTPException(status_code=503, detail=f"Grad-CAM unavailable: {e}")
+
+    if redirect:
+        url = store.presigned_url(key)
+        if url is not None:
+            return RedirectResponse(url, status_code=307)
+
+    info = await run_in_threadpool(store.stat, key)
+    headers["Content-Length"] = str(info.size)
+    headers["Last-Modified"] = blob_storage.http_date(info.modified)
+
+    return StreamingResponse(store.stream(key), media_type=derivatives.media_type(fmt), headers=headers)
 
 
 # ─────────────────────────────────────────────────────────────
@@ -117,7 +418,7 @@ def analyze_scan(scan_id: int, db: Session = Depends(get_db)):
 async def doctor_verify(
     scan_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Receives FormData from frontend:
@@ -133,7 +434,7 @@ async def doctor_verify(
             detail="Clinical notes are required"
         )
 
-    scan = db.query(Scan).filter(Scan.id == scan_id).first()
+    scan = await db.get(Scan, scan_id)
 
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
@@ -147,8 +448,7 @@ async def doctor_verify(
     scan.doctor_notes = notes.strip()
     scan.status = "DOCTOR_VERIFIED"
 
-    db.commit()
-    db.refresh(scan)
+    await db.commit()
 
     return {
         "message": "Doctor verification complete",
@@ -162,19 +462,20 @@ async def doctor_verify(
 # ─────────────────────────────────────────────────────────────
 
 @router.get("/debug/scan/{scan_id}/path")
-def debug_scan_path(scan_id: int, db: Session = Depends(get_db)):
+async def debug_scan_path(scan_id: int, db: AsyncSession = Depends(get_async_db)):
 
-    scan = db.query(Scan).filter(Scan.id == scan_id).first()
+    scan = await db.get(Scan, scan_id)
 
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
 
-    resolved = resolve_scan_path(scan.file_path)
+    store = blob_storage.get_store()
+    local = store.local_path(scan.file_path)
 
     return {
         "scan_id": scan_id,
         "stored_path": scan.file_path,
-        "resolved_path": str(resolved),
-        "exists": resolved.exists(),
-        "base_dir": str(BASE_DIR),
+        "backend": store.name,
+        "resolved_path": str(local) if local is not None else None,
+        "exists": await run_in_threadpool(store.exists, scan.file_path),
     }
@@ -0,0 +1,19 @@
+# backend/routers/email_outbox.py
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import get_async_db
+from backend.services import email_service
+
+router = APIRouter(prefix="/email", tags=["Email"])
+
+
+# ─────────────────────────────────────────────────────────────
+# Outbox health: messages by state, queue depth / oldest age,
+# send and queue-lag histograms
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/stats")
+async def email_stats(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(email_service.outbox_stats)
@@ -0,0 +1,81 @@
+# backend/routers/events.py
+
+import json
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from backend.security.jwt_handler import claims_user_id, get_token_claims
+from backend.services import events
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Comment lines keep proxies from closing idle streams
+HEARTBEAT_SECONDS = 15
+
+
+def _sse(item: dict) -> str:
+    return f"id: {item['id']}\nevent: {item['type']}\ndata: {json.dumps(item)}\n\n"
+
+
+# ─────────────────────────────────────────────────────────────
+# Scan status stream (Server-Sent Events)
+# EventSource cannot set headers, so the JWT comes as ?token=
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/scans")
+async def scan_events(
+    request: Request,
+    token: str = Query(...),
+    patient_id: int | None = None,
+    status: list[str] | None = Query(None),
+):
+
+    claims = await get_token_claims(token)
+
+    # Patients only ever see their own scans
+    if claims.get("role") == "patient":
+        own_id = claims_user_id(claims)
+        if patient_id not in (None, own_id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        patient_id = own_id
+
+    def wanted(item: dict) -> bool:
+        return (
+            (patient_id is None or item["patient_id"] == patient_id)
+            and (not status or item["status"] in status)
+        )
+
+    last_id = request.headers.get("last-event-id", "")
+    subscription = events.bus.subscribe(wanted)
+
+    async def stream():
+        try:
+            # Replay what a reconnecting client missed (same process only)
+            if last_id.isdigit():
+                for item in events.bus.replay(int(last_id), wanted):
+                    yield _sse(item)
+
+            yield ": connected\n\n"
+
+            while not await request.is_disconnected():
+                try:
+                    item = await asyncio.wait_for(subscription.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(item)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def event_stats():
+    return events.stats()
@@ -0,0 +1,23 @@
+# backend/routers/metrics_router.py
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from backend.services import http_metrics, metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+# ─────────────────────────────────────────────────────────────
+# Prometheus scrape endpoint: every registered metric of this
+# process (HTTP, inference stages, DB queries, queue depths, ...)
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+
+    if not http_metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+
+    # sync handler: the collectors read queue depths from the database
+    return Response(metrics.exposition(), headers={"Content-Type": metrics.CONTENT_TYPE})
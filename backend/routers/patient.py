@@ -1,43 +1,71 @@
 # backend/routers/patient.py
 
-import os
-import uuid
-import shutil
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from fastapi import APIRouter, UploadFile, File, Depends, Form, HTTPException
-from sqlalchemy.orm import Session
-
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models.schema import Scan
+from backend.models.user import User
 from backend.config import UPLOAD_DIR
+from backend.services import cas, derivatives, job_queue, prediction_cache, tracing, uploads
 
 router = APIRouter(
     prefix="/patient",
     tags=["Patient"]
 )
 
+# The body is parsed by uploads.receive_scan, so describe it for Swagger by hand.
+# patient_id must come before the file so it is checked before the file is read.
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["patient_id", "file"],
+                    "properties": {
+                        "patient_id": {"type": "integer"},
+                        "file": {"type": "string", "format": "binary"},
+                    },
+                }
+            }
+        },
+    }
+}
+
 
-@router.post("/upload")
-def upload_scan(
-    patient_id: int = Form(...),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    # ── Validate extension ─────────────────────────────────────────────────────
-    allowed = {".jpg", ".jpeg", ".png"}
-    ext = os.path.splitext(file.filename)[1].lower()
-    if ext not in allowed:
-        raise HTTPException(400, detail=f"Unsupported file type '{ext}'. Allowed: jpg, jpeg, png")
+async def _check_backlog(db: AsyncSession):
+    # ── Backpressure: refuse early when the AI backlog is full ─────────────────
+    if job_queue.AUTO_ANALYZE_ON_UPLOAD and await db.run_sync(job_queue.backlog_full):
+        job_queue.uploads_rejected.inc()
+        raise HTTPException(
+            503,
+            detail="AI analysis backlog is full. Please retry shortly.",
+            headers={"Retry-After": str(job_queue.AI_RETRY_AFTER_SECONDS)},
+        )
 
-    # ── Save to absolute path ──────────────────────────────────────────────────
-    filename      = f"{uuid.uuid4()}{ext}"
-    absolute_path = UPLOAD_DIR / filename          # pathlib handles slashes on any OS
 
-    with open(absolute_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def _check_patient(db: AsyncSession, fields: dict) -> None:
+    patient_id = fields.get("patient_id", "").strip()
+    if not patient_id.isdigit():
+        raise HTTPException(422, detail="patient_id is required and must be sent before the file")
 
-    # ── Store RELATIVE path in DB (always forward slashes) ────────────────────
-    relative_path = f"uploads/patient_scans/{filename}"
+    patient = await db.get(User, int(patient_id))
+    if patient is None or patient.role != "patient":
+        raise HTTPException(404, detail="Patient not found")
+
+
+async def _record_scan(db: AsyncSession, patient_id: int, stored: uploads.StoredUpload) -> dict:
+
+    # ── Content-addressed: identical scans share one file on disk ─────────────
+    with tracing.span("upload.store", sha256=stored.sha256) as span:
+        relative_path, deduplicated = await run_in_threadpool(
+            cas.commit_file, stored.path, stored.sha256, stored.ext
+        )
+        span.set_attribute("deduplicated", deduplicated)
 
     scan = Scan(
         patient_id=patient_id,
@@ -45,22 +73,68 @@ def upload_scan(
         status="PENDING_AI"
     )
 
-    db.add(scan)
-    db.commit()
-    db.refresh(scan)
+    with tracing.span("db.insert_scan"):
+        db.add(scan)
+        await db.commit()
+    tracing.annotate(scan_id=scan.id)
+
+    # Thumbnail + report-size copies, built off the request path
+    derivatives.schedule(relative_path, stored.sha256)
 
-    return {
+    response = {
         "message":   "Scan uploaded successfully",
         "scan_id":   scan.id,
         "status":    scan.status,
         "file_path": relative_path,
+        "sha256":    stored.sha256,
+        "size":      stored.size,
+        "deduplicated": deduplicated,
     }
 
+    # ── Pipeline mode: start AI analysis right away ────────────────────────────
+    if job_queue.AUTO_ANALYZE_ON_UPLOAD:
+        # The upload hash is the prediction-cache key: re-uploads finish here
+        with tracing.span("cache.lookup") as span:
+            cached = await run_in_threadpool(prediction_cache.get, stored.sha256)
+            span.set_attribute("hit", cached is not None)
+        if cached is not None:
+            scan.prediction = cached["label"]
+            scan.confidence = cached["confidence"]
+            scan.model_version = cached.get("model_version")
+            scan.status = "AI_ANALYZED"
+            await db.commit()
+            response["status"] = scan.status
+        else:
+            # the job row carries this trace to the worker that claims it
+            with tracing.span("queue.enqueue", kind="producer") as span:
+                job = await db.run_sync(job_queue.enqueue_analysis, scan.id)
+                span.set_attribute("job_id", job.id)
+            response["job_id"] = job.id
+
+    return response
+
+
+@router.post("/upload", openapi_extra=UPLOAD_OPENAPI)
+async def upload_scan(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _check_backlog(db)
+
+    # ── Stream to disk: size cap, magic-byte sniffing, SHA-256 on the fly ─────
+    with tracing.span("upload.receive") as span:
+        fields, stored = await uploads.receive_scan(
+            request, UPLOAD_DIR, check_fields=lambda received: _check_patient(db, received)
+        )
+        span.set_attribute("bytes", stored.size)
+
+    return await _record_scan(db, int(fields["patient_id"]), stored)
+
 
 @router.get("/status/{patient_id}")
-def patient_status(
+async def patient_status(
     patient_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    scans = db.query(Scan).filter(Scan.patient_id == patient_id).all()
-    return scans
\ No newline at end of file
+    result = await db.execute(select(Scan).where(Scan.patient_id == patient_id))
+    return result.scalars().all()
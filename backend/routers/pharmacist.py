@@ -1,9 +1,10 @@
 # backend/routers/pharmacist.py
 
 from fastapi import APIRouter, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models.schema import Scan
 
 router = APIRouter(
@@ -13,33 +14,31 @@ router = APIRouter(
 
 
 @router.get("/queue")
-def pharmacist_queue(
-    db: Session = Depends(get_db)
+async def pharmacist_queue(
+    db: AsyncSession = Depends(get_async_db)
 ):
 
-    return db.query(Scan).filter(
+    result = await db.execute(select(Scan).where(
 
         Scan.status == "DOCTOR_VERIFIED"
 
-    ).all()
+    ))
+
+    return result.scalars().all()
 
 
 @router.post("/complete/{scan_id}")
-def complete_prescription(
+async def complete_prescription(
 
     scan_id: int,
 
     notes: str = Form(...),
 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 
 ):
 
-    scan = db.query(Scan).filter(
-
-        Scan.id == scan_id
-
-    ).first()
+    scan = await db.get(Scan, scan_id)
 
     if not scan:
 
@@ -49,7 +48,7 @@ def complete_prescription(
 
     scan.status = "PHARMACIST_COMPLETED"
 
-    db.commit()
+    await db.commit()
 
     return {
 
@@ -57,4 +56,4 @@ def complete_prescription(
 
         "status": scan.status
 
-    }
\ No newline at end of file
+    }
\ No newline at end of file
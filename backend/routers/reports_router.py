@@ -0,0 +1,68 @@
+# backend/routers/reports_router.py
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from backend.database import get_async_db
+from backend.models.schema import Scan
+from backend.models.user import User
+from backend.services import blob_storage, reports
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["Reports"]
+)
+
+
+# ─────────────────────────────────────────────────────────────
+# Report PDF — rendered once per content version in the report
+# worker pool, then served straight from storage
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/pdf/{scan_id}")
+async def report_pdf(scan_id: int, request: Request, redirect: bool = True, db: AsyncSession = Depends(get_async_db)):
+
+    scan = await db.get(Scan, scan_id)
+
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    patient = await db.get(User, scan.patient_id)
+    snapshot = reports.report_snapshot(scan, patient)
+
+    etag = f'"{reports.content_version(snapshot)}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        key = await reports.ensure_report(snapshot)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {e}")
+
+    store = blob_storage.get_store()
+
+    if redirect:
+        url = store.presigned_url(key)
+        if url is not None:
+            return RedirectResponse(url, status_code=307)
+
+    info = await run_in_threadpool(store.stat, key)
+
+    return StreamingResponse(
+        store.stream(key),
+        media_type="application/pdf",
+        headers={
+            "Content-Length": str(info.size),
+            "Content-Disposition": f'attachment; filename="{reports.attachment_name(snapshot)}"',
+            # a changed report gets a new version, so revalidate with the ETag
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+        },
+    )
+
+
+@router.get("/stats")
+async def report_stats():
+    return reports.stats()
@@ -0,0 +1,28 @@
+# backend/schemas/scan_schema.py
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ScanSummary(BaseModel):
+    """Workqueue row: everything the list views show, no note fields."""
+
+    id: int
+    patient_id: int
+    status: Optional[str]
+    prediction: Optional[str]
+    confidence: Optional[float]
+    created_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class ScanPage(BaseModel):
+
+    items: List[ScanSummary]
+    next_cursor: Optional[str]
+    limit: int
+    sort: str
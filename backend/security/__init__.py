@@ -1,11 +1,20 @@
 # backend/security/__init__.py
 
 from .jwt_handler import create_access_token, verify_token
-from .password import hash_password, verify_password
+from .password import (
+    hash_password,
+    verify_password,
+    hash_password_async,
+    verify_password_async,
+    verify_and_rehash_async,
+)
 
 __all__ = [
     "create_access_token",
     "verify_token",
     "hash_password",
-    "verify_password"
+    "verify_password",
+    "hash_password_async",
+    "verify_password_async",
+    "verify_and_rehash_async"
 ]
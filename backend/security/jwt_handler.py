@@ -4,10 +4,12 @@ from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.database import get_db
+from backend.database import get_async_db
 from backend.models.user import User
+from backend.security import token_cache
+from backend.security.token_cache import AuthUser
 
 # ── JWT config ──────────────────────────────────────────────────────────────
 SECRET_KEY = "SUPER_SECRET_KEY_CHANGE_THIS"   # ← change before production
@@ -20,8 +22,10 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 # ── Create access token ──────────────────────────────────────────────────────
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire    = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now       = datetime.utcnow()
+    expire    = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # iat lets the auth cache distrust tokens issued before a role change
+    to_encode.update({"exp": expire, "iat": now})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -33,44 +37,65 @@ def verify_token(token: str) -> dict | None:
         return None
 
 
-# ── Get current user — fetches full row from DB including role ───────────────
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    """
-    Decode the JWT, extract user_id, then fetch the full User row from the DB.
-    This ensures current_user.role, current_user.email, etc. are all available.
-
-    Previously this returned User(id=user_id) — a dummy object with no role —
-    which caused every role check (current_user.role != "admin") to fail with 403.
-    """
-    credentials_exception = HTTPException(
+def _unauthorized(detail: str = "Invalid or expired token") -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid or expired token",
+        detail=detail,
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    payload = verify_token(token)
-    if payload is None:
-        raise credentials_exception
 
+def claims_user_id(payload: dict) -> int:
     # Support both "user_id" and "sub" as the ID claim
     user_id = payload.get("user_id") or payload.get("sub")
     if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload — no user_id or sub claim",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    # Fetch the actual user from the database
-    user: User | None = db.query(User).filter(User.id == int(user_id)).first()
+        raise _unauthorized("Invalid token payload — no user_id or sub claim")
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        raise _unauthorized("Invalid token payload — no user_id or sub claim")
+
+
+# ── Get token claims — verified payload, no DB access ────────────────────────
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Verified JWT payload. Decoding is skipped for tokens seen recently (the
+    cache honours exp); read-only endpoints can authorize from this alone.
+    """
+    payload = token_cache.get_claims(token)
+    if payload is None:
+        payload = verify_token(token)
+        if payload is None:
+            raise _unauthorized()
+        claims_user_id(payload)
+        token_cache.put_claims(token, payload)
+    return payload
+
+
+async def load_user(user_id: int, db: AsyncSession) -> AuthUser:
+    """users row for user_id, from the auth cache or the database."""
+
+    user = token_cache.get_user(user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User no longer exists",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        row: User | None = await db.get(User, user_id)
+        if row is None:
+            raise _unauthorized("User no longer exists")
+        user = AuthUser.from_row(row)
+        token_cache.put_user(user)
+    return user
 
-    return user   # ← full User object: .id, .name, .email, .role all populated
\ No newline at end of file
+
+# ── Get current user — the user's row, cached per process ────────────────────
+async def get_current_user(
+    payload: dict = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_async_db),
+) -> AuthUser:
+    """
+    Decode the JWT, extract user_id, then fetch the user's row. Rows are
+    served from the auth cache (evicted whenever the user changes), so most
+    requests never touch the users table.
+
+    Returns an immutable AuthUser (.id, .name, .email, .role); handlers that
+    modify the user must load the ORM row from their own session.
+    """
+    return await load_user(claims_user_id(payload), db)
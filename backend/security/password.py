@@ -1,8 +1,16 @@
 # backend/security/password.py
 
+import os
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.services.executors import run_cpu
+
+# bcrypt cost factor (2^rounds iterations). Stored hashes made with a
+# different cost are upgraded (or downgraded) on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 
 def hash_password(password: str):
@@ -13,3 +21,26 @@ def hash_password(password: str):
 def verify_password(plain_password, hashed_password):
 
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_rehash(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """(valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# bcrypt is deliberately slow (~100+ ms of pure CPU): async routes must use
+# these, which run it in the CPU process pool (may raise ExecutorSaturated)
+async def hash_password_async(password: str):
+
+    return await run_cpu(hash_password, password)
+
+
+async def verify_password_async(plain_password, hashed_password):
+
+    return await run_cpu(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_rehash_async(plain_password, hashed_password) -> tuple[bool, str | None]:
+
+    return await run_cpu(verify_and_rehash, plain_password, hashed_password)
@@ -0,0 +1,135 @@
+# backend/security/rate_limit.py
+
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from fastapi import HTTPException, Request
+
+from backend.services import metrics
+from backend.services.executors import ExecutorSaturated
+
+# ── Config ───────────────────────────────────────────────────────────────────
+# Token buckets: each login attempt takes one token; tokens refill at
+# *_PER_MINUTE and at most *_BURST accumulate.
+LOGIN_IP_PER_MINUTE    = float(os.getenv("LOGIN_IP_PER_MINUTE", "30"))
+LOGIN_IP_BURST         = int(os.getenv("LOGIN_IP_BURST", "10"))
+LOGIN_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", "5"))
+LOGIN_EMAIL_BURST      = int(os.getenv("LOGIN_EMAIL_BURST", "5"))
+# Only behind a reverse proxy that sets it — otherwise clients can forge it
+TRUST_FORWARDED_FOR    = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+RATE_LIMIT_MAX_KEYS    = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+login_attempts     = metrics.counter("login_attempts_total", "Login requests that passed the rate limiter")
+login_failures     = metrics.counter("login_failures_total", "Logins rejected for bad credentials")
+login_rate_limited = metrics.counter("login_rate_limited_total", "Logins refused by the per-IP / per-email limiter")
+login_rehashed     = metrics.counter("login_rehashed_total", "Password hashes upgraded to the current bcrypt cost on login")
+login_busy         = metrics.counter("login_busy_total", "Logins refused because the password pool was saturated")
+login_latency      = metrics.histogram("login_latency_seconds", "Login handling time (lookup + bcrypt + token)")
+
+
+# ── Token bucket ─────────────────────────────────────────────────────────────
+class TokenBucketLimiter:
+    """
+    In-memory token buckets keyed by an arbitrary string. Buckets refill
+    lazily on access; the least recently used ones are dropped beyond
+    max_keys, which only ever forgives a client (a fresh bucket is full).
+    Per process: with several uvicorn workers each enforces its own limit.
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = per_minute / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Take a token for key: 0 if allowed, else seconds until one is available."""
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                tokens, wait = tokens - 1, 0.0
+            else:
+                wait = (1 - tokens) / self.rate if self.rate > 0 else float("inf")
+
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+ip_limiter    = TokenBucketLimiter(LOGIN_IP_PER_MINUTE, LOGIN_IP_BURST)
+email_limiter = TokenBucketLimiter(LOGIN_EMAIL_PER_MINUTE, LOGIN_EMAIL_BURST)
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _too_many(wait: float):
+    login_rate_limited.inc()
+    retry_after = "3600" if math.isinf(wait) else str(max(1, math.ceil(wait)))
+    raise HTTPException(429, "Too many login attempts, try again later", headers={"Retry-After": retry_after})
+
+
+def check_login_rate(request: Request, email: str):
+    """Raise 429 when this IP or this account is over its login budget."""
+
+    wait = ip_limiter.take(client_ip(request))
+    if wait:
+        _too_many(wait)
+
+    wait = email_limiter.take(email.strip().lower())
+    if wait:
+        _too_many(wait)
+
+
+# ── Login guard (rate limit + metrics) ──────────────────────────────────────
+@contextmanager
+def login_attempt(request: Request, email: str):
+    """
+    Wrap a login handler body:
+
+        with login_attempt(request, user.email):
+            ...
+
+    Applies the rate limits, records latency and failures, and turns a
+    saturated password pool into 503 + Retry-After.
+    """
+
+    check_login_rate(request, email)
+    login_attempts.inc()
+
+    started = time.perf_counter()
+    try:
+        yield
+    except HTTPException as e:
+        if e.status_code == 401:
+            login_failures.inc()
+        raise
+    except ExecutorSaturated:
+        login_busy.inc()
+        raise HTTPException(503, "Login service busy, try again shortly", headers={"Retry-After": "1"})
+    finally:
+        login_latency.observe(time.perf_counter() - started)
+
+
+def login_stats() -> dict:
+    return metrics.snapshot(prefix="login_")
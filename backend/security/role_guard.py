@@ -1,34 +1,64 @@
 # backend/security/role_guard.py
 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from backend.security.jwt_handler import verify_token
+from sqlalchemy.ext.asyncio import AsyncSession
 
-security = HTTPBearer()
+from backend.database import get_async_db
+from backend.security import token_cache
+from backend.security.jwt_handler import claims_user_id, get_current_user, get_token_claims, load_user
+from backend.security.token_cache import AuthUser
 
 
-def require_role(required_role: str):
+def _forbidden() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Access denied"
+    )
 
-    def role_checker(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
-        token = credentials.credentials
+def require_role(*roles: str):
+    """
+    Claims-only guard for read-only endpoints: authorizes from the token's
+    role without touching the database. Only when the user's role or email
+    changed after the token was issued is the row (cached) re-read, and
+    only if the change was made in this process: a role changed by another
+    API process or worker is not seen until the token expires.
 
-        payload = verify_token(token)
+    Returns the token payload.
+    """
 
-        if payload is None:
+    async def role_checker(
+        payload: dict = Depends(get_token_claims),
+        db: AsyncSession = Depends(get_async_db),
+    ):
 
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        role = payload.get("role")
 
-        if payload.get("role") != required_role:
+        if not token_cache.claims_trusted(payload):
 
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
+            role = (await load_user(claims_user_id(payload), db)).role
+
+        if role not in roles:
+
+            raise _forbidden()
 
         return payload
 
     return role_checker
+
+
+def require_user(*roles: str):
+    """
+    Guard for endpoints that act on the user's current row (writes):
+    checks the role stored in the users table. Returns the AuthUser.
+    """
+
+    async def user_checker(user: AuthUser = Depends(get_current_user)):
+
+        if user.role not in roles:
+
+            raise _forbidden()
+
+        return user
+
+    return user_checker
@@ -0,0 +1,228 @@
+# backend/security/token_cache.py
+"""
+Per-process cache for request authentication.
+
+Two TTL LRUs replace the per-request JWT decode and users-table lookup:
+
+    claims   SHA-256(token) → decoded payload, kept until the token's exp
+             or AUTH_CACHE_TTL_SECONDS, whichever comes first
+    users    user id → AuthUser (id/name/email/role snapshot of the row)
+
+User rows are evicted by ORM events whenever a User is updated or deleted
+(bulk UPDATE/DELETE statements on users clear the whole cache). When the
+change could make existing tokens lie — role or email changed, user
+deleted — the user is also marked stale: claims issued before the change
+are then no longer trusted on their own and authorization re-reads the
+row.
+
+Invalidation is local to the process that made the change. Elsewhere a
+cached user row is refreshed after AUTH_CACHE_TTL_SECONDS, but the stale
+marker is never set, so require_role() keeps honouring the role in an
+already-issued token until that token expires (up to
+ACCESS_TOKEN_EXPIRE_MINUTES). Use require_user() where a demotion must
+take effect sooner.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from backend.models.user import User
+from backend.services import metrics
+
+# ── Config ────────────────────────────────────────────
+AUTH_CACHE_ENABLED     = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+AUTH_CACHE_SIZE        = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+# ── Metrics ───────────────────────────────────────────
+claims_hits   = metrics.counter("auth_cache_claims_hits_total", "Tokens authenticated without decoding")
+claims_misses = metrics.counter("auth_cache_claims_misses_total", "Tokens decoded and verified")
+user_hits     = metrics.counter("auth_cache_user_hits_total", "Current-user lookups served from memory")
+user_misses   = metrics.counter("auth_cache_user_misses_total", "Current-user lookups that queried the users table")
+invalidations = metrics.counter("auth_cache_invalidations_total", "User entries dropped after a users-table change")
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """Immutable snapshot of a users row, safe to share between requests."""
+
+    id: int
+    name: str
+    email: str
+    role: str
+
+    @classmethod
+    def from_row(cls, user: User) -> "AuthUser":
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role)
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after a per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_claims = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+_users  = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+# user id → wall-clock time of the last identity change; claims with an
+# older iat must be checked against the row. Kept for a token lifetime.
+_stale_since: dict[int, float] = {}
+_all_stale_since = 0.0
+_stale_lock = threading.Lock()
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# ── Claims ────────────────────────────────────────────
+def get_claims(token: str) -> dict | None:
+    if not AUTH_CACHE_ENABLED:
+        return None
+    claims = _claims.get(token_key(token))
+    if claims is None:
+        claims_misses.inc()
+    else:
+        claims_hits.inc()
+    return claims
+
+
+def put_claims(token: str, claims: dict):
+    if not AUTH_CACHE_ENABLED:
+        return
+    exp = claims.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+    _claims.set(token_key(token), claims, ttl)
+
+
+def claims_trusted(claims: dict) -> bool:
+    """False when the user's identity changed after this token was issued."""
+
+    issued = claims.get("iat", 0)
+    if issued < _all_stale_since:
+        return False
+    user_id = claims.get("user_id") or claims.get("sub")
+    try:
+        changed = _stale_since.get(int(user_id))
+    except (TypeError, ValueError):
+        return False
+    return changed is None or issued >= changed
+
+
+# ── Users ─────────────────────────────────────────────
+def get_user(user_id: int) -> AuthUser | None:
+    if not AUTH_CACHE_ENABLED:
+        return None
+    user = _users.get(user_id)
+    if user is None:
+        user_misses.inc()
+    else:
+        user_hits.inc()
+    return user
+
+
+def put_user(user: AuthUser):
+    if AUTH_CACHE_ENABLED:
+        _users.set(user.id, user)
+
+
+def invalidate_user(user_id: int, identity_changed: bool = False):
+    from backend.security.jwt_handler import ACCESS_TOKEN_EXPIRE_MINUTES
+
+    invalidations.inc()
+    _users.pop(user_id)
+    if identity_changed:
+        now = time.time()
+        with _stale_lock:
+            _stale_since[user_id] = now
+            # markers older than any live token are pointless
+            horizon = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            for uid in [u for u, t in _stale_since.items() if t < horizon]:
+                del _stale_since[uid]
+
+
+def invalidate_all():
+    global _all_stale_since
+    invalidations.inc()
+    _users.clear()
+    _claims.clear()
+    _all_stale_since = time.time()
+
+
+def stats() -> dict:
+    return {
+        "enabled": AUTH_CACHE_ENABLED,
+        "ttl_seconds": AUTH_CACHE_TTL_SECONDS,
+        "claims_entries": len(_claims),
+        "user_entries": len(_users),
+        "stale_users": len(_stale_since),
+        **metrics.snapshot(prefix="auth_cache_"),
+    }
+
+
+# ── Invalidation hooks ────────────────────────────────
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    identity_changed = any(state.attrs[name].history.has_changes() for name in ("role", "email"))
+    invalidate_user(target.id, identity_changed)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate_user(target.id, identity_changed=True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_user_change(orm_execute_state):
+    # update(User)/delete(User) statements skip the mapper events above
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        m.class_ is User for m in orm_execute_state.all_mappers
+    ):
+        invalidate_all()
@@ -1,92 +1,94 @@
 ﻿# backend/services/ai_service.py
 
 import os
-import json
-import tensorflow as tf
+import time
 import numpy as np
-import cv2
 from dotenv import load_dotenv
 
+from backend.services import model_registry, prediction_cache, preprocessing, tta
+from backend.services.batching import MicroBatcher
+
 load_dotenv()
 
-# ── Paths ─────────────────────────────────────────────
-MODEL_PATH   = os.getenv("AI_MODEL_PATH", "models/lung_model.h5")
-LABELS_PATH  = os.getenv("CLASS_LABELS_PATH", "models/metadata/class_labels.json")
+# ── Config ────────────────────────────────────────────
+# The model itself is loaded lazily by model_registry on first use.
+MODEL_PATH  = model_registry.MODEL_PATH
+LABELS_PATH = model_registry.LABELS_PATH
 CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.75"))
 
-# ── Validate files ────────────────────────────────────
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"AI model not found at: {MODEL_PATH}")
-
-if not os.path.exists(LABELS_PATH):
-    raise FileNotFoundError(f"Class labels file not found at: {LABELS_PATH}")
 
-# ── Load class labels ─────────────────────────────────
-with open(LABELS_PATH, "r") as f:
-    CLASS_NAMES = json.load(f)
+# ── Micro-batching ────────────────────────────────────
+# Concurrent predict_scan() / predict_bytes() calls in one process (scripts,
+# benchmarks) are coalesced into one forward pass. Analysis jobs do not go
+# through it: AI workers batch by claim and call predict_array() directly.
+AI_BATCHING_ENABLED  = os.getenv("AI_BATCHING_ENABLED", "true").lower() == "true"
+AI_BATCH_MAX_SIZE    = int(os.getenv("AI_BATCH_MAX_SIZE", "16"))
+AI_BATCH_MAX_WAIT_MS = float(os.getenv("AI_BATCH_MAX_WAIT_MS", "10"))
 
-# ── Load model ────────────────────────────────────────
-model = tf.keras.models.load_model(MODEL_PATH)
+# ── Stage timings (resize / normalise are observed in preprocessing) ─
+decode_seconds      = preprocessing.stage_seconds.labels("decode")
+predict_seconds     = preprocessing.stage_seconds.labels("predict")
+postprocess_seconds = preprocessing.stage_seconds.labels("postprocess")
 
-# 🔥 AUTO-DETECT INPUT SIZE FROM MODEL
-MODEL_INPUT_SHAPE = model.input_shape
-IMG_HEIGHT = MODEL_INPUT_SHAPE[1]
-IMG_WIDTH  = MODEL_INPUT_SHAPE[2]
-IMG_CHANNELS = MODEL_INPUT_SHAPE[3]
 
-print(f"[AI] Model loaded successfully")
-print(f"[AI] Expected input size: {IMG_HEIGHT}x{IMG_WIDTH}x{IMG_CHANNELS}")
+def _decode(data) -> np.ndarray:
+    started = time.perf_counter()
+    img = preprocessing.decode(data)
+    decode_seconds.observe(time.perf_counter() - started)
+    return img
 
 
 # ──────────────────────────────────────────────────────
-def predict_scan(image_path: str) -> dict:
+def load_image(image_path: str) -> np.ndarray:
+    """Read a scan from disk and return a normalised HxWx3 float32 array."""
 
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Image not found at: {image_path}")
 
-    # ── Load image ─────────────────────────────────────
-    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    return load_image_bytes(preprocessing.read_bytes(image_path))
 
-    if img is None:
-        raise ValueError(f"OpenCV cannot read image: {image_path}")
 
-    # ── Convert BGR → RGB ─────────────────────────────
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+def load_image_bytes(data) -> np.ndarray:
+    """Decode an in-memory upload and return a normalised HxWx3 float32 array."""
 
-    # ── Resize to MODEL REQUIRED SIZE (NOT HARDCODED) ─
-    img = cv2.resize(img, (IMG_WIDTH, IMG_HEIGHT))
+    loaded = model_registry.get_model()
+    return preprocessing.preprocess(_decode(data), loaded.height, loaded.width)
 
-    # ── Normalize ─────────────────────────────────────
-    img = img.astype("float32") / 255.0
 
-    # ── Add batch dimension ───────────────────────────
-    img = np.expand_dims(img, axis=0)
+def batch_buffer(size: int) -> preprocessing.BatchBuffer:
+    """This thread's preallocated input buffer, sized for the current model."""
 
-    # ── Predict ───────────────────────────────────────
-    try:
-        predictions = model.predict(img, verbose=0)
-    except Exception as e:
-        raise ValueError(f"Model prediction failed: {str(e)}")
+    loaded = model_registry.get_model()
+    return preprocessing.get_buffer(size, loaded.height, loaded.width, loaded.channels)
+
+
+def decode_into(data, out: np.ndarray) -> np.ndarray:
+    """Decode encoded bytes straight into a batch-buffer slot."""
+    return preprocessing.preprocess_into(_decode(data), out)
 
-    if predictions is None or len(predictions) == 0:
-        raise ValueError("Model returned empty predictions")
 
-    confidence  = float(np.max(predictions))
-    class_index = int(np.argmax(predictions))
+def build_result(probabilities: np.ndarray) -> dict:
+    """Turn one row of class probabilities into the predict_scan result dict."""
 
-    if class_index >= len(CLASS_NAMES):
+    loaded = model_registry.get_model()
+    class_names = loaded.class_names
+
+    confidence  = float(np.max(probabilities))
+    class_index = int(np.argmax(probabilities))
+
+    if class_index >= len(class_names):
         raise ValueError(
-            f"Predicted class index {class_index} exceeds class labels ({len(CLASS_NAMES)})"
+            f"Predicted class index {class_index} exceeds class labels ({len(class_names)})"
         )
 
-    label = CLASS_NAMES[class_index]
+    label = class_names[class_index]
 
     if confidence < CONFIDENCE_THRESHOLD:
         label = "Uncertain"
 
     all_predictions = {
-        CLASS_NAMES[i]: float(predictions[0][i])
-        for i in range(len(CLASS_NAMES))
+        class_names[i]: float(probabilities[i])
+        for i in range(len(class_names))
     }
 
     return {
@@ -95,5 +97,95 @@ def predict_scan(image_path: str) -> dict:
         "class_index": class_index,
         "all_predictions": all_predictions,
         "threshold_used": CONFIDENCE_THRESHOLD,
-        "model_input_size": f"{IMG_HEIGHT}x{IMG_WIDTH}x{IMG_CHANNELS}"
+        "model_input_size": loaded.input_size
     }
+
+
+def predict_array(batch: np.ndarray) -> list[dict]:
+    """Run one forward pass over an already assembled NxHxWx3 batch."""
+
+    # ── Predict ───────────────────────────────────────
+    started = time.perf_counter()
+    try:
+        predictions = model_registry.get_model().predict(batch)
+    except Exception as e:
+        raise ValueError(f"Model prediction failed: {str(e)}")
+    predict_seconds.observe(time.perf_counter() - started)
+
+    if predictions is None or len(predictions) != len(batch):
+        raise ValueError("Model returned empty predictions")
+
+    # ── Low-confidence rows: TTA / ensemble (no-op unless AI_TTA_ENABLED) ─
+    predictions, refined = tta.refine(batch, predictions)
+
+    started = time.perf_counter()
+    version = model_registry.model_version()
+    results = [{**build_result(row), "model_version": version} for row in predictions]
+    for i, detail in refined.items():
+        results[i]["tta"] = detail
+    postprocess_seconds.observe(time.perf_counter() - started)
+    return results
+
+
+def predict_batch(images: list[np.ndarray]) -> list[dict]:
+    """Run one forward pass over a list of preprocessed images."""
+
+    buf = batch_buffer(len(images))
+    for i, img in enumerate(images):
+        buf.slot(i)[...] = img
+
+    return predict_array(buf.view(len(images)))
+
+
+_batcher: MicroBatcher | None = None
+
+
+def get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            predict_batch,
+            max_batch_size=AI_BATCH_MAX_SIZE,
+            max_wait_ms=AI_BATCH_MAX_WAIT_MS,
+            name="ai_inference",
+        )
+    return _batcher
+
+
+def batching_stats() -> dict:
+    """Stats of this process's batcher, without starting one just to report on it."""
+
+    if not AI_BATCHING_ENABLED:
+        return {"enabled": False}
+    if _batcher is None:
+        return {"enabled": True, "in_use": False}
+    return {"enabled": True, "in_use": True, **_batcher.stats()}
+
+
+# ──────────────────────────────────────────────────────
+def predict_scan(image_path: str) -> dict:
+
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image not found at: {image_path}")
+
+    return predict_bytes(preprocessing.read_bytes(image_path))
+
+
+def predict_bytes(data) -> dict:
+    """predict_scan for an upload already in memory — no disk round-trip."""
+
+    # ── Identical bytes + same model → reuse the earlier result ─
+    digest = prediction_cache.content_hash(data)
+    cached = prediction_cache.get(digest)
+    if cached is not None:
+        return cached
+
+    img = load_image_bytes(data)
+
+    if AI_BATCHING_ENABLED:
+        result = get_batcher()(img)
+    else:
+        result = predict_batch([img])[0]
+
+    prediction_cache.put(digest, result)
+    return result
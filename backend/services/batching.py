@@ -0,0 +1,151 @@
+# backend/services/batching.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions into batches and runs them through a
+    single call of batch_fn(items) -> list[result].
+
+    A batch is dispatched as soon as max_batch_size items are waiting, or
+    max_wait_ms after the first item of the batch arrived — whichever comes
+    first. Each caller gets back a Future resolving to its own result.
+    """
+
+    def __init__(
+        self,
+        batch_fn,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.name = name
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        # ── Metrics ───────────────────────────────────────
+        self.queue_depth = metrics.gauge(
+            f"{name}_queue_depth", "Items waiting to be batched"
+        )
+        self.batch_size = metrics.histogram(
+            f"{name}_batch_size", "Items per dispatched batch", buckets=BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait = metrics.histogram(
+            f"{name}_queue_wait_seconds", "Time from submit to batch dispatch"
+        )
+        self.batch_latency = metrics.histogram(
+            f"{name}_batch_seconds", "Wall time of one batch_fn call"
+        )
+        self.failures = metrics.counter(
+            f"{name}_batch_failures_total", "Batches whose batch_fn raised"
+        )
+
+    # ──────────────────────────────────────────────────
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-dispatcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, item) -> Future:
+        self.start()
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        self.queue_depth.inc()
+        return future
+
+    def __call__(self, item, timeout: float | None = None):
+        return self.submit(item).result(timeout)
+
+    # ──────────────────────────────────────────────────
+    def _collect(self, first) -> tuple[list, bool]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+
+        return batch, False
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch, stopping = self._collect(first)
+            self.queue_depth.dec(len(batch))
+            self._dispatch(batch)
+
+            if stopping:
+                return
+
+    def _dispatch(self, batch: list):
+        dispatched_at = time.perf_counter()
+        for _, _, submitted_at in batch:
+            self.queue_wait.observe(dispatched_at - submitted_at)
+        self.batch_size.observe(len(batch))
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise ValueError(
+                    f"batch_fn returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            self.failures.inc()
+            logger.exception(f"[{self.name}] batch of {len(items)} failed")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self.batch_latency.observe(time.perf_counter() - dispatched_at)
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            **metrics.snapshot(prefix=f"{self.name}_"),
+        }
@@ -0,0 +1,381 @@
+# backend/services/blob_storage.py
+"""
+Blob storage for scans and rendered reports.
+
+Objects are addressed by the same relative keys the DB already stores
+(e.g. uploads/patient_scans/ab/cd/<sha256>.png), so the backend can be
+switched without rewriting rows:
+
+    STORAGE_BACKEND=local   files under the project root (default)
+    STORAGE_BACKEND=s3      any S3-compatible service (AWS, MinIO, Ceph …)
+
+Reads can be streamed and ranged so large scans are never buffered whole
+by the API; the S3 client keeps a pooled set of HTTP connections shared by
+all threads of the process.
+"""
+
+import os
+import logging
+import mimetypes
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+from backend.config import BASE_DIR, resolve_scan_path
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STREAM_CHUNK_BYTES = int(os.getenv("STORAGE_STREAM_CHUNK_KB", "256")) * 1024
+
+S3_BUCKET           = os.getenv("S3_BUCKET", "csss")
+S3_PREFIX           = os.getenv("S3_PREFIX", "").strip("/")
+S3_ENDPOINT_URL     = os.getenv("S3_ENDPOINT_URL")          # e.g. http://localhost:9000 for MinIO
+S3_REGION           = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY       = os.getenv("S3_ACCESS_KEY")
+S3_SECRET_KEY       = os.getenv("S3_SECRET_KEY")
+S3_MAX_POOL         = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_PRESIGN_SECONDS  = int(os.getenv("S3_PRESIGN_SECONDS", "900"))
+
+
+class BlobInfo:
+
+    def __init__(self, key: str, size: int, modified: float):
+        self.key = key
+        self.size = size
+        self.modified = modified
+
+
+class BlobStore(ABC):
+    """Operations every backend provides. Missing keys raise FileNotFoundError."""
+
+    name = "abstract"
+
+    @abstractmethod
+    def put_file(self, key: str, path: Path):
+        """Store a local file under key, consuming it (the file is moved or deleted)."""
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes, content_type: str | None = None):
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def stream(self, key: str, start: int = 0, end: int | None = None,
+               chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        """Yield bytes [start, end] (inclusive, like an HTTP Range) in chunks."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def stat(self, key: str) -> BlobInfo:
+        ...
+
+    @abstractmethod
+    def touch(self, key: str):
+        """Refresh the modification time (keeps a re-referenced blob out of GC)."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[BlobInfo]:
+        ...
+
+    def presigned_url(self, key: str, expires: int = S3_PRESIGN_SECONDS) -> str | None:
+        """Time-limited direct download URL, or None if the backend cannot issue one."""
+        return None
+
+    def local_path(self, key: str) -> Path | None:
+        """Filesystem path for backends that have one (None otherwise)."""
+        return None
+
+
+# ──────────────────────────────────────────────────────
+# Local disk
+# ──────────────────────────────────────────────────────
+
+class LocalBlobStore(BlobStore):
+
+    name = "local"
+
+    def __init__(self, root: Path = BASE_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        if self.root == BASE_DIR:
+            return resolve_scan_path(key)
+        p = Path(key)
+        return p if p.is_absolute() else self.root / p
+
+    def put_file(self, key: str, path: Path):
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str | None = None):
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".part")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def stream(self, key, start=0, end=None, chunk_size=STREAM_CHUNK_BYTES):
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def stat(self, key: str) -> BlobInfo:
+        st = self._path(key).stat()
+        return BlobInfo(key, st.st_size, st.st_mtime)
+
+    def touch(self, key: str):
+        os.utime(self._path(key))
+
+    def delete(self, key: str):
+        path = self._path(key)
+        path.unlink(missing_ok=True)
+        # prune the two-character shard directories (ab/cd/) left empty
+        for parent in list(path.parents)[:2]:
+            if len(parent.name) != 2 or not parent.is_relative_to(self.root):
+                break
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+
+    def list(self, prefix: str) -> Iterator[BlobInfo]:
+        base = self.root / prefix
+        if not base.exists():
+            return
+        for p in base.rglob("*"):
+            if p.is_file() and not p.name.endswith(".part"):
+                st = p.stat()
+                yield BlobInfo(p.relative_to(self.root).as_posix(), st.st_size, st.st_mtime)
+
+    def local_path(self, key: str) -> Path:
+        return self._path(key)
+
+
+# ──────────────────────────────────────────────────────
+# S3-compatible
+# ──────────────────────────────────────────────────────
+
+class S3BlobStore(BlobStore):
+
+    name = "s3"
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX):
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)") from e
+
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+
+        # One client per process: boto3 clients are thread-safe and keep a
+        # urllib3 pool of up to max_pool_connections keep-alive connections.
+        self.client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION,
+            aws_access_key_id=S3_ACCESS_KEY,
+            aws_secret_access_key=S3_SECRET_KEY,
+            config=Config(
+                max_pool_connections=S3_MAX_POOL,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                # MinIO and most self-hosted services need path-style URLs
+                s3={"addressing_style": "path" if S3_ENDPOINT_URL else "auto"},
+            ),
+        )
+
+    def _key(self, key: str) -> str:
+        key = key.lstrip("/")
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _missing(self, e) -> bool:
+        return e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, key: str, path: Path):
+        # upload_file switches to parallel multipart uploads for large files
+        content_type, _ = mimetypes.guess_type(key)
+        extra = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(str(path), self.bucket, self._key(key), ExtraArgs=extra)
+        Path(path).unlink(missing_ok=True)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str | None = None):
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **extra)
+
+    def _get_object(self, key: str, byte_range: str | None = None):
+        kwargs = {"Bucket": self.bucket, "Key": self._key(key)}
+        if byte_range:
+            kwargs["Range"] = byte_range
+        try:
+            return self.client.get_object(**kwargs)
+        except self._client_error as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def get(self, key: str) -> bytes:
+        body = self._get_object(key)["Body"]
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def stream(self, key, start=0, end=None, chunk_size=STREAM_CHUNK_BYTES):
+        byte_range = None
+        if start or end is not None:
+            byte_range = f"bytes={start}-{'' if end is None else end}"
+        body = self._get_object(key, byte_range)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def _head(self, key: str) -> dict:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self._client_error as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._head(key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stat(self, key: str) -> BlobInfo:
+        head = self._head(key)
+        return BlobInfo(key, head["ContentLength"], head["LastModified"].timestamp())
+
+    def touch(self, key: str):
+        # Self-copy with REPLACE is the S3 idiom for bumping LastModified.
+        # REPLACE drops whatever is not resent, so carry the headers over.
+        k = self._key(key)
+        head = self._head(key)
+        kept = {
+            field: head[field]
+            for field in ("ContentType", "CacheControl", "ContentDisposition", "ContentEncoding")
+            if head.get(field)
+        }
+        self.client.copy_object(
+            Bucket=self.bucket, Key=k,
+            CopySource={"Bucket": self.bucket, "Key": k},
+            MetadataDirective="REPLACE",
+            Metadata=head.get("Metadata", {}),
+            **kept,
+        )
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix: str) -> Iterator[BlobInfo]:
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                yield BlobInfo(obj["Key"][strip:], obj["Size"], obj["LastModified"].timestamp())
+
+    def presigned_url(self, key: str, expires: int = S3_PRESIGN_SECONDS) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=expires,
+        )
+
+
+# ──────────────────────────────────────────────────────
+BACKENDS = {
+    "local": LocalBlobStore,
+    "s3": S3BlobStore,
+}
+
+_store: BlobStore | None = None
+_lock = threading.Lock()
+
+
+def get_store() -> BlobStore:
+    """The process-wide store for STORAGE_BACKEND (created on first use)."""
+
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                if STORAGE_BACKEND not in BACKENDS:
+                    raise ValueError(
+                        f"STORAGE_BACKEND must be one of {sorted(BACKENDS)}, got {STORAGE_BACKEND!r}"
+                    )
+                _store = BACKENDS[STORAGE_BACKEND]()
+                logger.info(f"[STORAGE] using {_store.name} blob store")
+    return _store
+
+
+def set_store(store: BlobStore):
+    """Swap the process-wide store (e.g. a MinIO-backed S3BlobStore in tests)."""
+
+    global _store
+    with _lock:
+        _store = store
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single-range HTTP Range header into inclusive (start, end).
+    Returns None for no/unsupported ranges; raises ValueError if unsatisfiable.
+    """
+
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    if first == "":
+        if not last.isdigit():
+            return None
+        length = int(last)
+        if length == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - length, 0), size - 1
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def http_date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
@@ -0,0 +1,253 @@
+# backend/services/cas.py
+"""
+Content-addressed scan storage.
+
+Scans are stored once per distinct content under a two-level sharded
+layout derived from their SHA-256:
+
+    uploads/patient_scans/ab/cd/abcd…ef.png
+
+The path is the object key in whichever blob store is configured
+(blob_storage). Scan.file_path rows are the references: an object is live
+while at least one scan points at it, and collect_garbage() removes the
+rest. Freshly committed objects are protected by a grace period so an
+upload whose scan row is not yet committed is never collected.
+
+Derivatives (services.derivatives, services.gradcam) live beside their
+original as <sha256>.<tag>.<ext> and are collected together with it.
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+from pathlib import Path
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.config import UPLOAD_DIR
+from backend.models.schema import Scan
+from backend.services.blob_storage import get_store
+
+logger = logging.getLogger(__name__)
+
+GC_GRACE_SECONDS = int(os.getenv("SCAN_GC_GRACE_MINUTES", "60")) * 60
+
+SCAN_PREFIX = "uploads/patient_scans"
+
+_CAS_NAME = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]+)$")
+_DERIVATIVE_NAME = re.compile(r"^([0-9a-f]{64})\.[a-z][a-z0-9-]*(\.[a-z0-9]+)$")
+
+
+# ──────────────────────────────────────────────────────
+# Layout
+# ──────────────────────────────────────────────────────
+
+def relative_key(sha256: str, ext: str) -> str:
+    """DB value / blob key for a stored scan (always forward slashes)."""
+    return f"{SCAN_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def digest_from_path(path) -> str | None:
+    """The SHA-256 embedded in a content-addressed filename, if it is one."""
+
+    p = Path(path)
+    match = _CAS_NAME.match(p.name)
+    if not match:
+        return None
+    digest = match.group(1)
+    if p.parent.name != digest[2:4] or p.parent.parent.name != digest[:2]:
+        return None
+    return digest
+
+
+def derivative_key(sha256: str, tag: str, ext: str) -> str:
+    """Blob key of a derived image (e.g. tag "thumb256") of a stored scan."""
+    return f"{SCAN_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{tag}{ext}"
+
+
+def derivative_source(path) -> str | None:
+    """The SHA-256 of the scan a derivative was made from, if path is one."""
+
+    p = Path(path)
+    match = _DERIVATIVE_NAME.match(p.name)
+    if not match:
+        return None
+    digest = match.group(1)
+    if p.parent.name != digest[2:4] or p.parent.parent.name != digest[:2]:
+        return None
+    return digest
+
+
+def digest_of(key: str) -> str:
+    """SHA-256 of a stored scan — free for content-addressed keys, streamed otherwise."""
+
+    digest = digest_from_path(key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.sha256()
+    for chunk in get_store().stream(key):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def is_addressed(relative_path: str) -> bool:
+    return digest_from_path(relative_path) is not None
+
+
+# ──────────────────────────────────────────────────────
+# Writes
+# ──────────────────────────────────────────────────────
+
+def commit_file(tmp_path: Path, sha256: str, ext: str) -> tuple[str, bool]:
+    """
+    Move a fully written temp file into its content address.
+    Returns (relative_key, deduplicated). When the content already exists
+    the temp file is dropped and the existing object's mtime refreshed so
+    the GC grace period covers the new reference too.
+    """
+
+    store = get_store()
+    key = relative_key(sha256, ext)
+
+    if store.exists(key):
+        os.unlink(tmp_path)
+        store.touch(key)
+        return key, True
+
+    store.put_file(key, tmp_path)
+    return key, False
+
+
+# ──────────────────────────────────────────────────────
+# Reference counting + garbage collection
+# ──────────────────────────────────────────────────────
+
+def reference_counts(db: Session) -> dict[str, int]:
+    rows = db.query(Scan.file_path, func.count(Scan.id)).group_by(Scan.file_path).all()
+    return {path: count for path, count in rows}
+
+
+def collect_garbage(db: Session, dry_run: bool = False, grace_seconds: int = GC_GRACE_SECONDS) -> dict:
+    """Delete unreferenced stored scans, their derivatives and abandoned partial uploads."""
+
+    store = get_store()
+    referenced = set(reference_counts(db))
+    # Derivatives of legacy (not yet migrated) scans are not recognised as
+    # live; they are collected after the grace period and simply rebuilt.
+    referenced_digests = {digest_from_path(path) for path in referenced} - {None}
+    cutoff = time.time() - grace_seconds
+
+    removed, freed, kept = [], 0, 0
+
+    # materialised first: deleting while a directory walk is live breaks it
+    for blob in list(store.list(SCAN_PREFIX)):
+        source = derivative_source(blob.key)
+        if source is not None:
+            live = source in referenced_digests
+        elif is_addressed(blob.key):
+            live = blob.key in referenced
+        else:
+            continue
+        if live or blob.modified > cutoff:
+            kept += 1
+            continue
+        removed.append(blob.key)
+        freed += blob.size
+        if not dry_run:
+            store.delete(blob.key)
+
+    # .part files are the local spool of uploads that never completed
+    for part in UPLOAD_DIR.glob("*.part"):
+        stat = part.stat()
+        if stat.st_mtime > cutoff:
+            kept += 1
+            continue
+        removed.append(f"{SCAN_PREFIX}/{part.name}")
+        freed += stat.st_size
+        if not dry_run:
+            part.unlink(missing_ok=True)
+
+    return {
+        "removed": removed,
+        "removed_count": len(removed),
+        "freed_bytes": freed,
+        "kept": kept,
+        "dry_run": dry_run,
+    }
+
+
+# ──────────────────────────────────────────────────────
+# Migration from flat uuid4 filenames
+# ──────────────────────────────────────────────────────
+
+def migrate(db: Session, chunk_size: int = 500, dry_run: bool = False) -> dict:
+    """
+    Rewrite legacy scans (uploads/patient_scans/<uuid>.<ext>) into the
+    content-addressed layout, deduplicating identical files. Rows are
+    committed per chunk, so an interrupted run can simply be restarted.
+    """
+
+    store = get_store()
+    migrated, deduplicated, missing, last_id = 0, 0, [], 0
+
+    while True:
+        scans = db.query(Scan).filter(Scan.id > last_id).order_by(Scan.id).limit(chunk_size).all()
+        if not scans:
+            break
+        last_id = scans[-1].id
+
+        legacy_keys = set()
+        for scan in scans:
+            if is_addressed(scan.file_path):
+                continue
+
+            source = scan.file_path
+            if not store.exists(source):
+                missing.append(scan.id)
+                continue
+
+            sha256 = digest_of(source)
+            ext = Path(source).suffix.lower()
+            if ext == ".jpeg":
+                ext = ".jpg"
+            target = relative_key(sha256, ext)
+
+            if store.exists(target):
+                deduplicated += 1
+            elif not dry_run:
+                _copy(store, source, target)
+
+            if not dry_run:
+                scan.file_path = target
+                legacy_keys.add(source)
+            migrated += 1
+
+        if not dry_run:
+            db.commit()
+            # Only drop the old objects once the rows pointing at the new
+            # location are durable.
+            for source in legacy_keys:
+                store.delete(source)
+
+    return {
+        "migrated": migrated,
+        "deduplicated": deduplicated,
+        "missing_files": missing,
+        "dry_run": dry_run,
+    }
+
+
+def _copy(store, source: str, target: str):
+    src, dst = store.local_path(source), store.local_path(target)
+    if src is not None and dst is not None:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    store.put_bytes(target, store.get(source))
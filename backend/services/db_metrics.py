@@ -0,0 +1,71 @@
+# backend/services/db_metrics.py
+"""
+Query counts and durations from SQLAlchemy cursor events.
+
+    db_queries_total{operation}            SELECT / INSERT / UPDATE / DELETE / OTHER
+    db_query_duration_seconds{operation}
+    db_query_errors_total{operation}
+
+instrument() hooks an engine (for an AsyncEngine, its sync_engine). The
+start time rides on the DBAPI connection's info dict between
+before_cursor_execute and after_cursor_execute, so the hooks cost two
+perf_counter() calls and a list append/pop per statement.
+"""
+
+import time
+
+from sqlalchemy import event
+
+from backend.services import metrics
+
+OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# ── Metrics ───────────────────────────────────────────
+queries       = metrics.counter("db_queries_total", "SQL statements executed", labels=("operation",))
+query_seconds = metrics.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", buckets=QUERY_BUCKETS, labels=("operation",)
+)
+query_errors  = metrics.counter("db_query_errors_total", "SQL statements that raised", labels=("operation",))
+
+_STARTS = "metrics_query_start"
+
+
+def operation(statement: str) -> str:
+    word = statement.lstrip()[:6].upper()
+    return word if word in OPERATIONS else "OTHER"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_STARTS, []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_STARTS)
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    op = operation(statement)
+    queries.labels(op).inc()
+    query_seconds.labels(op).observe(elapsed)
+
+
+def _error(context):
+    conn = context.connection
+    starts = conn.info.get(_STARTS) if conn is not None else None
+    if starts:
+        starts.pop()
+    query_errors.labels(operation(context.statement or "")).inc()
+
+
+def instrument(engine):
+    """Record every statement engine executes (idempotent)."""
+
+    target = getattr(engine, "sync_engine", engine)
+    if event.contains(target, "before_cursor_execute", _before):
+        return engine
+    event.listen(target, "before_cursor_execute", _before)
+    event.listen(target, "after_cursor_execute", _after)
+    event.listen(target, "handle_error", _error)
+    return engine
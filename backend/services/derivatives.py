@@ -0,0 +1,219 @@
+# backend/services/derivatives.py
+"""
+Downscaled scan images for dashboards and report PDFs.
+
+Originals can be many megabytes; only the full viewer needs them. Every
+stored scan gets, beside its content-addressed original,
+
+    uploads/patient_scans/ab/cd/<sha256>.report1024.jpg    embedded in report PDFs
+    uploads/patient_scans/ab/cd/<sha256>.report1024.webp
+    uploads/patient_scans/ab/cd/<sha256>.thumb256.jpg      dashboard tables
+    uploads/patient_scans/ab/cd/<sha256>.thumb256.webp
+
+all built from one decode (the thumbnail is resized from the report size,
+not from the original). They are generated in the background right after
+an upload, by the AI worker for scans analysed without them, and on
+demand by the image endpoint otherwise.
+
+Keys depend only on the scan content and the variant size, so a file
+never changes once written and can be cached forever; changing a size
+produces new keys. The quality settings only affect files generated
+afterwards. cas.collect_garbage() removes the derivatives of scans that
+are no longer referenced.
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+import cv2
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models.schema import Scan
+from backend.services import cas, executors, metrics, preprocessing, tracing
+from backend.services.blob_storage import get_store
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+DERIVATIVES_ENABLED   = os.getenv("DERIVATIVES_ENABLED", "true").lower() == "true"
+THUMB_MAX_EDGE        = int(os.getenv("THUMB_MAX_EDGE", "256"))
+REPORT_IMAGE_MAX_EDGE = int(os.getenv("REPORT_IMAGE_MAX_EDGE", "1024"))
+JPEG_QUALITY          = int(os.getenv("DERIVATIVE_JPEG_QUALITY", "85"))
+WEBP_QUALITY          = int(os.getenv("DERIVATIVE_WEBP_QUALITY", "80"))
+
+# variant → longest edge in pixels (largest first: each is resized from the previous)
+VARIANTS = dict(sorted(
+    {"report": REPORT_IMAGE_MAX_EDGE, "thumb": THUMB_MAX_EDGE}.items(),
+    key=lambda item: -item[1],
+))
+
+# format → (extension, media type, encoder params)
+FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 1]),
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY]),
+}
+
+# ── Metrics ───────────────────────────────────────────
+generated     = metrics.counter("derivatives_generated_total", "Scans whose derivatives were generated")
+on_demand     = metrics.counter("derivatives_on_demand_total", "Derivatives generated because a request found them missing")
+failures      = metrics.counter("derivatives_failures_total", "Derivative generations that raised")
+bytes_written = metrics.counter("derivatives_bytes_total", "Bytes of derivative images written")
+seconds       = metrics.histogram("derivative_seconds", "Fetch + decode + resize + encode + store time per scan")
+pending       = metrics.gauge("derivatives_pending", "Uploads whose derivatives are still being generated in the background")
+
+
+# ──────────────────────────────────────────────────────
+# Layout
+# ──────────────────────────────────────────────────────
+
+def key_for(digest: str, variant: str, fmt: str) -> str:
+    return cas.derivative_key(digest, f"{variant}{VARIANTS[variant]}", FORMATS[fmt][0])
+
+
+def keys_for(digest: str) -> list[str]:
+    """Every derivative key of a scan, in the order they are written."""
+    return [key_for(digest, variant, fmt) for variant in VARIANTS for fmt in FORMATS]
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][1]
+
+
+# ──────────────────────────────────────────────────────
+# Generation
+# ──────────────────────────────────────────────────────
+
+def to_display(img: np.ndarray) -> np.ndarray:
+    """8-bit grey or BGR, whatever the scan was stored as."""
+
+    if img.dtype != np.uint8:
+        # 16-bit X-rays rarely use the full range: stretch what is there
+        img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+    if img.ndim == 3 and img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    return img
+
+
+def fit(img: np.ndarray, max_edge: int) -> np.ndarray:
+    height, width = img.shape[:2]
+    scale = max_edge / max(height, width)
+    if scale >= 1:
+        return img                         # never upscale
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def render(data) -> dict[tuple[str, str], bytes]:
+    """Encoded derivatives of an encoded scan image, keyed by (variant, format)."""
+
+    img = to_display(preprocessing.decode(data))
+    out = {}
+    for variant, max_edge in VARIANTS.items():
+        img = fit(img, max_edge)
+        for fmt, (ext, _, params) in FORMATS.items():
+            ok, encoded = cv2.imencode(ext, img, params)
+            if not ok:
+                raise ValueError(f"Cannot encode {variant} derivative as {fmt}")
+            out[variant, fmt] = encoded.tobytes()
+    return out
+
+
+def generate(key: str, digest: str | None = None, data: bytes | None = None, force: bool = False) -> str:
+    """
+    Build and store the derivatives of the scan stored under key unless they
+    exist already. Returns the scan digest (the input to key_for). The last
+    key written doubles as the completion marker, so one existence check
+    covers all of them.
+    """
+
+    store = get_store()
+    digest = digest or cas.digest_of(key)
+    keys = keys_for(digest)
+
+    if not force and store.exists(keys[-1]):
+        return digest
+
+    started = time.perf_counter()
+    try:
+        with tracing.span("derivatives.generate", forced=force):
+            if data is None:
+                data = store.get(key)
+            for (variant, fmt), encoded in render(data).items():
+                store.put_bytes(key_for(digest, variant, fmt), encoded, content_type=media_type(fmt))
+                bytes_written.inc(len(encoded))
+    except Exception:
+        failures.inc()
+        raise
+
+    generated.inc()
+    seconds.observe(time.perf_counter() - started)
+    return digest
+
+
+def try_generate(key: str, digest: str | None = None) -> str | None:
+    """generate() for callers that must not fail because of it (upload, AI worker)."""
+
+    if not DERIVATIVES_ENABLED:
+        return None
+    try:
+        return generate(key, digest)
+    except Exception as e:
+        logger.warning(f"[derivatives] {key}: {e}")
+        return None
+
+
+_background: set[asyncio.Task] = set()
+
+
+def schedule(key: str, digest: str | None = None) -> asyncio.Task | None:
+    """Generate in the background on the blocking executor (after an upload)."""
+
+    if not DERIVATIVES_ENABLED:
+        return None
+    task = asyncio.get_running_loop().create_task(executors.run_blocking(try_generate, key, digest))
+    _background.add(task)
+    pending.inc()
+    task.add_done_callback(_finished)
+    return task
+
+
+def _finished(task: asyncio.Task):
+    _background.discard(task)
+    pending.dec()
+
+
+def backfill(db: Session, chunk_size: int = 500, force: bool = False) -> dict:
+    """Generate derivatives for every stored scan that lacks them."""
+
+    done, missing, failed, last_path = 0, [], [], ""
+    generated_before = generated.value
+
+    while True:
+        paths = db.execute(
+            select(Scan.file_path).where(Scan.file_path > last_path)
+            .group_by(Scan.file_path).order_by(Scan.file_path).limit(chunk_size)
+        ).scalars().all()
+        if not paths:
+            break
+        last_path = paths[-1]
+
+        for path in paths:
+            try:
+                generate(path, force=force)
+                done += 1
+            except FileNotFoundError:
+                missing.append(path)
+            except Exception as e:
+                logger.warning(f"[derivatives] {path}: {e}")
+                failed.append(path)
+
+    return {
+        "scans": done,
+        "generated": int(generated.value - generated_before),
+        "missing_files": missing,
+        "failed": failed,
+    }
@@ -0,0 +1,509 @@
+# backend/services/email_service.py
+"""
+Outbound email through a database outbox.
+
+Requests never talk to SMTP. queue_otp_email() and queue_report_email()
+add a row to email_outbox in the caller's session, so the message is
+stored by the same commit as the change that triggered it and the request
+returns as soon as that commit does. A background sender (EMAIL_SENDERS
+threads in the API process, or standalone via
+`python -m backend.services.email_service run`) then:
+
+    claims        up to EMAIL_BATCH_SIZE due messages with one conditional
+                  UPDATE (safe across processes; the claim of a sender that
+                  died expires after EMAIL_CLAIM_LEASE_SECONDS)
+    sends         them over a persistent SMTP connection per sender thread,
+                  logged in once and reused across batches until it has
+                  been idle for SMTP_IDLE_TIMEOUT_SECONDS or the server
+                  drops it
+    retries       transient failures with exponential backoff and jitter:
+                  EMAIL_RETRY_BASE_SECONDS · 2^(attempt-1), capped at
+                  EMAIL_RETRY_MAX_SECONDS
+    dead-letters  permanent failures (5xx replies, refused recipients, a
+                  missing attachment) and messages out of attempts as DEAD;
+                  they stay in the table until requeue_dead()
+
+Delivery is at-least-once: a sender that dies between the SMTP reply and
+the batch commit sends that batch again once its claim expires.
+
+With SMTP_SECURITY=none and no SMTP_USER the sender speaks plain SMTP, so
+a local stand-in works for development and tests:
+
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_SECURITY=none
+"""
+
+import os
+import ssl
+import time
+import uuid
+import random
+import logging
+import smtplib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, engine
+from backend.models.outbox import OutboxEmail
+from backend.services import metrics, tracing
+from backend.services.blob_storage import get_store
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+SMTP_HOST                 = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT                 = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER                 = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD             = os.getenv("SMTP_PASSWORD", "")
+SMTP_SECURITY             = os.getenv("SMTP_SECURITY", "starttls").lower()   # starttls | ssl | none
+SMTP_TIMEOUT_SECONDS      = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+SMTP_IDLE_TIMEOUT_SECONDS = float(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", "60"))
+EMAIL_SENDER              = os.getenv("EMAIL_SENDER", SMTP_USER or "noreply@csss.local")
+
+# EMAIL_SENDERS=0 disables the in-app sender; run this module standalone instead.
+EMAIL_SENDERS             = int(os.getenv("EMAIL_SENDERS", "1"))
+EMAIL_BATCH_SIZE          = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_POLL_SECONDS        = float(os.getenv("EMAIL_POLL_SECONDS", "2"))
+EMAIL_MAX_ATTEMPTS        = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS  = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "10"))
+EMAIL_RETRY_MAX_SECONDS   = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "1800"))
+EMAIL_CLAIM_LEASE_SECONDS = int(os.getenv("EMAIL_CLAIM_LEASE_SECONDS", "300"))
+EMAIL_KEEP_SENT_DAYS      = int(os.getenv("EMAIL_KEEP_SENT_DAYS", "7"))
+
+# ── Message states ────────────────────────────────────
+QUEUED  = "QUEUED"
+SENDING = "SENDING"
+SENT    = "SENT"
+DEAD    = "DEAD"
+
+# ── Metrics ───────────────────────────────────────────
+queued       = metrics.counter("email_queued_total", "Messages added to the outbox")
+sent         = metrics.counter("email_sent_total", "Messages accepted by the SMTP server")
+retried      = metrics.counter("email_retried_total", "Send attempts that failed and were rescheduled")
+dead         = metrics.counter("email_dead_total", "Messages moved to the dead-letter state")
+connections  = metrics.counter("email_smtp_connections_total", "SMTP connections opened (and logged in)")
+send_seconds = metrics.histogram("email_send_seconds", "SMTP time per message")
+queue_lag    = metrics.histogram("email_queue_lag_seconds", "Time from queueing to acceptance by the SMTP server")
+depth        = metrics.gauge("email_outbox_depth", "Messages queued or being sent")
+oldest_age   = metrics.gauge("email_outbox_oldest_seconds", "Age of the oldest message not yet sent")
+
+
+# ──────────────────────────────────────────────────────
+# Producer side (requests)
+# ──────────────────────────────────────────────────────
+
+def queue_email(
+    db,
+    kind: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    attachment_key: str | None = None,
+    attachment_name: str | None = None,
+) -> OutboxEmail:
+    """Add a message to db (Session or AsyncSession); it is sent once db commits."""
+
+    message = OutboxEmail(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        attachment_key=attachment_key,
+        attachment_name=attachment_name,
+        status=QUEUED,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        traceparent=tracing.current_traceparent(),
+    )
+    db.add(message)
+    db.info["email_queued"] = True
+    queued.inc()
+    return message
+
+
+def queue_otp_email(db, to_email: str, otp: str, name: str | None, expires_minutes: int) -> OutboxEmail:
+    return queue_email(
+        db,
+        kind="otp",
+        to_email=to_email,
+        subject="Your CSSS admin login code",
+        body=(
+            f"Dear {name or 'administrator'},\n\n"
+            f"Your one-time login code is {otp}. It expires in {expires_minutes} minutes.\n\n"
+            "If you did not request it, please ignore this email.\n\n"
+            "Clinical Scan Support System"
+        ),
+    )
+
+
+def queue_report_email(db, snapshot: dict, pdf_key: str, filename: str) -> OutboxEmail:
+    return queue_email(
+        db,
+        kind="report",
+        to_email=snapshot["patient_email"],
+        subject=f"Your Scan Report #{snapshot['scan_id']}",
+        body="Dear patient,\n\nYour scan report is ready. Please find it attached.\n\nRegards,\nClinical Scan Support System",
+        attachment_key=pdf_key,
+        attachment_name=filename,
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_on_commit(session):
+    if session.info.pop("email_queued", False):
+        wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("email_queued", None)
+
+
+# ──────────────────────────────────────────────────────
+# SMTP connection
+# ──────────────────────────────────────────────────────
+
+class SMTPConnection:
+    """One logged-in SMTP session, opened lazily and reused between batches."""
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        security: str = SMTP_SECURITY,
+        user: str = SMTP_USER,
+        password: str = SMTP_PASSWORD,
+        idle_timeout: float = SMTP_IDLE_TIMEOUT_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.security = security
+        self.user = user
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self._smtp: smtplib.SMTP | None = None
+        self._last_used = 0.0
+
+    def _open(self) -> smtplib.SMTP:
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if self.security == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+            if self.user:
+                smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        connections.inc()
+        return smtp
+
+    def send(self, message: EmailMessage):
+        for attempt in (1, 2):
+            if self._smtp is None:
+                self._smtp = self._open()
+            try:
+                self._smtp.send_message(message)
+                break
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                raise                           # the server answered: the session is still usable
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # servers drop idle sessions: reconnect once, then give up
+                self.close()
+                if attempt == 2:
+                    raise
+            except OSError:
+                self.close()
+                raise
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+
+# ──────────────────────────────────────────────────────
+# Consumer side (sender threads)
+# ──────────────────────────────────────────────────────
+
+def build_message(row: OutboxEmail) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = row.subject
+    message["From"] = EMAIL_SENDER
+    message["To"] = row.to_email
+    message.set_content(row.body)
+
+    if row.attachment_key:
+        data = get_store().get(row.attachment_key)
+        message.add_attachment(
+            data,
+            maintype="application",
+            subtype="pdf",
+            filename=row.attachment_name or row.attachment_key.rsplit("/", 1)[-1],
+        )
+    return message
+
+
+def claim_batch(db: Session, sender_id: str, limit: int = EMAIL_BATCH_SIZE) -> list[OutboxEmail]:
+    """
+    Atomically move up to `limit` due messages to SENDING under a fresh
+    claim token. Messages stuck in SENDING past the lease are due again.
+    """
+
+    now = datetime.utcnow()
+    due = or_(
+        and_(OutboxEmail.status == QUEUED, OutboxEmail.next_attempt_at <= now),
+        and_(OutboxEmail.status == SENDING, OutboxEmail.claimed_at < now - timedelta(seconds=EMAIL_CLAIM_LEASE_SECONDS)),
+    )
+
+    candidates = db.execute(
+        select(OutboxEmail.id).where(due).order_by(OutboxEmail.next_attempt_at, OutboxEmail.id).limit(limit)
+    ).scalars().all()
+    if not candidates:
+        return []
+
+    token = f"{sender_id}:{uuid.uuid4().hex[:8]}"
+    db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(candidates), due)
+        .values(status=SENDING, sender=token, claimed_at=now, attempts=OutboxEmail.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    return db.execute(
+        select(OutboxEmail).where(OutboxEmail.sender == token).order_by(OutboxEmail.id)
+    ).scalars().all()
+
+
+def _permanent(error: Exception) -> bool:
+    if isinstance(error, FileNotFoundError):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _retry_or_dead(row: OutboxEmail, error: Exception):
+    row.error = f"{type(error).__name__}: {error}"[:2000]
+    row.sender = None
+    if _permanent(error) or (row.attempts or 0) >= EMAIL_MAX_ATTEMPTS:
+        row.status = DEAD
+        dead.inc()
+        logger.warning(f"[EMAIL] message {row.id} to {row.to_email} is dead: {row.error}")
+    else:
+        row.status = QUEUED
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(row.attempts or 1))
+        retried.inc()
+
+
+def send_batch(db: Session, connection: SMTPConnection, sender_id: str) -> int:
+    """Claim, send and record one batch; returns the number of messages claimed."""
+
+    rows = claim_batch(db, sender_id)
+
+    for row in rows:
+        started = time.perf_counter()
+        # in the trace of the request that queued the message, from queueing on
+        trace = tracing.start_span(
+            "email.deliver",
+            parent=row.traceparent,
+            kind="consumer",
+            start_ns=tracing.unix_ns(row.created_at),
+            message_id=row.id,
+            email_kind=row.kind,
+            attempt=row.attempts,
+        )
+        tracing.record("email.queue_wait", trace.start_ns, tracing.unix_ns(row.claimed_at), parent=trace)
+        try:
+            with tracing.activate(trace):
+                with tracing.span("email.build", attachment=bool(row.attachment_key)):
+                    message = build_message(row)
+                with tracing.span("smtp.send", kind="client", host=connection.host):
+                    connection.send(message)
+        except Exception as e:
+            trace.record_exception(e)
+            trace.end()
+            _retry_or_dead(row, e)
+            continue
+
+        row.status = SENT
+        row.sent_at = datetime.utcnow()
+        row.error = None
+        sent.inc()
+        send_seconds.observe(time.perf_counter() - started)
+        queue_lag.observe((row.sent_at - row.created_at).total_seconds())
+        trace.end()
+
+    # one commit per batch, not per message
+    if rows:
+        db.commit()
+    return len(rows)
+
+
+def update_depth(db: Session):
+    count, oldest = db.execute(
+        select(func.count(OutboxEmail.id), func.min(OutboxEmail.created_at))
+        .where(OutboxEmail.status.in_((QUEUED, SENDING)))
+    ).one()
+    depth.set(count)
+    oldest_age.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0)
+
+
+@metrics.register_collector
+def collect_depth():
+    # also current when the sender runs in another process (EMAIL_SENDERS=0)
+    with SessionLocal() as db:
+        update_depth(db)
+
+
+def purge_sent(db: Session, keep_days: int = EMAIL_KEEP_SENT_DAYS) -> int:
+    """Delete sent messages (OTP codes included) older than keep_days."""
+
+    result = db.execute(
+        delete(OutboxEmail).where(
+            OutboxEmail.status == SENT,
+            OutboxEmail.sent_at < datetime.utcnow() - timedelta(days=keep_days),
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def requeue_dead(db: Session, ids: list[int] | None = None) -> int:
+    """Give dead messages (all, or the given ids) a fresh set of attempts."""
+
+    query = update(OutboxEmail).where(OutboxEmail.status == DEAD)
+    if ids:
+        query = query.where(OutboxEmail.id.in_(ids))
+    result = db.execute(query.values(status=QUEUED, attempts=0, next_attempt_at=datetime.utcnow(), error=None))
+    db.commit()
+    if result.rowcount:
+        wake()
+    return result.rowcount
+
+
+def outbox_stats(db: Session) -> dict:
+    rows = db.execute(select(OutboxEmail.status, func.count(OutboxEmail.id)).group_by(OutboxEmail.status)).all()
+    update_depth(db)
+    return {
+        "senders": len(_threads),
+        "by_status": {status: count for status, count in rows},
+        **metrics.snapshot(prefix="email_"),
+    }
+
+
+# ──────────────────────────────────────────────────────
+# Sender threads
+# ──────────────────────────────────────────────────────
+
+_threads: list[threading.Thread] = []
+_stop = threading.Event()
+_wake = threading.Event()
+
+PURGE_EVERY_SECONDS = 3600
+
+
+def wake():
+    """Let idle senders look at the outbox now instead of after the poll interval."""
+    _wake.set()
+
+
+def run_sender(sender_id: str):
+    connection = SMTPConnection()
+    last_purge = 0.0
+
+    while not _stop.is_set():
+        claimed = 0
+        db = SessionLocal()
+        try:
+            claimed = send_batch(db, connection, sender_id)
+            update_depth(db)
+            if time.monotonic() - last_purge > PURGE_EVERY_SECONDS:
+                purge_sent(db)
+                last_purge = time.monotonic()
+        except Exception:
+            logger.exception(f"[EMAIL] sender {sender_id} loop error")
+        finally:
+            db.close()
+
+        if claimed:
+            continue                # keep draining while there is work
+
+        connection.close_if_idle()
+        _wake.wait(EMAIL_POLL_SECONDS)
+        _wake.clear()
+
+    connection.close()
+
+
+def start_sender(senders: int = EMAIL_SENDERS) -> list[threading.Thread]:
+    if senders <= 0 or _threads:
+        return _threads
+
+    OutboxEmail.__table__.create(bind=engine, checkfirst=True)
+    _stop.clear()
+
+    for i in range(senders):
+        thread = threading.Thread(target=run_sender, args=(f"email-{os.getpid()}-{i}",), name=f"email-sender-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+    return _threads
+
+
+def stop_sender(timeout: float = 10.0):
+    _stop.set()
+    _wake.set()
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="CSSS email outbox")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="run the sender in this process (use with EMAIL_SENDERS=0 in the API)")
+    requeue = sub.add_parser("requeue-dead", help="retry dead-lettered messages")
+    requeue.add_argument("ids", nargs="*", type=int)
+    args = parser.parse_args()
+
+    if args.command == "requeue-dead":
+        db = SessionLocal()
+        try:
+            print(f"requeued {requeue_dead(db, args.ids)} messages")
+        finally:
+            db.close()
+    else:
+        start_sender(max(EMAIL_SENDERS, 1))
+        try:
+            for thread in list(_threads):
+                while thread.is_alive():
+                    thread.join(1.0)
+        except KeyboardInterrupt:
+            stop_sender()
@@ -0,0 +1,313 @@
+# backend/services/events.py
+"""
+Scan status events, pushed to dashboards instead of being polled for.
+
+Every committed change of Scan.status — a new upload (PENDING_AI),
+AI_ANALYZED, DOCTOR_VERIFIED, PHARMACIST_COMPLETED, REPORT_READY — is
+captured by ORM hooks and published after the transaction commits, so
+rolled-back changes never go out and no router has to remember to publish.
+"previous" is filled in when the old status was loaded at the time of the
+change (it is not re-read just for the event).
+
+Delivery:
+
+    in-process   EventBus fans events out to asyncio subscribers (the SSE
+                 endpoint); publish() is thread-safe and never blocks
+    AI workers   processes started by job_queue.start_worker_pool forward
+                 their events to the API over a multiprocessing queue
+    fan-out      with EVENTS_REDIS_URL every process also publishes to a
+                 Redis (or Redis-compatible) channel and relays what the
+                 others publish — needed with several API processes or
+                 standalone workers (AI_WORKERS=0)
+
+RedisBroker takes any redis-py compatible client, so a local stand-in
+(e.g. fakeredis.FakeRedis()) can be passed to set_broker() in tests.
+"""
+
+import os
+import json
+import uuid
+import queue
+import asyncio
+import logging
+import threading
+import itertools
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from backend.models.schema import Scan
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+EVENTS_REDIS_URL         = os.getenv("EVENTS_REDIS_URL", "")
+EVENTS_CHANNEL           = os.getenv("EVENTS_CHANNEL", "csss:scan-events")
+EVENTS_SUBSCRIBER_BUFFER = int(os.getenv("EVENTS_SUBSCRIBER_BUFFER", "256"))
+EVENTS_REPLAY_SIZE       = int(os.getenv("EVENTS_REPLAY_SIZE", "500"))
+
+# Identifies this process's messages on the shared channel
+ORIGIN = uuid.uuid4().hex
+
+# ── Metrics ───────────────────────────────────────────
+published   = metrics.counter("events_published_total", "Scan events published by this process")
+delivered   = metrics.counter("events_delivered_total", "Events handed to local subscribers")
+dropped     = metrics.counter("events_dropped_total", "Events dropped because a subscriber fell behind")
+subscribers = metrics.gauge("events_subscribers", "Open event subscriptions in this process")
+
+
+def scan_event(scan: Scan, previous: str | None = None, created: bool = False) -> dict:
+    return {
+        "type": "scan.uploaded" if created else "scan.status",
+        "scan_id": scan.id,
+        "patient_id": scan.patient_id,
+        "status": scan.status,
+        "previous": previous,
+        "prediction": scan.prediction,
+        "confidence": scan.confidence,
+        "at": datetime.utcnow().isoformat(),
+    }
+
+
+# ──────────────────────────────────────────────────────
+# Subscriptions
+# ──────────────────────────────────────────────────────
+
+class Subscription:
+    """A bounded per-client queue living on the subscriber's event loop."""
+
+    def __init__(self, bus: "EventBus", predicate):
+        self.bus = bus
+        self.predicate = predicate
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENTS_SUBSCRIBER_BUFFER)
+
+    def _offer(self, item: dict):
+        # runs on self.loop; a slow client loses its oldest events, not others'
+        if self.queue.full():
+            self.queue.get_nowait()
+            dropped.inc()
+        self.queue.put_nowait(item)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+
+    def __init__(self, replay_size: int = EVENTS_REPLAY_SIZE):
+        self._subs: set[Subscription] = set()
+        self._recent: deque = deque(maxlen=replay_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, predicate=lambda item: True) -> Subscription:
+        sub = Subscription(self, predicate)
+        with self._lock:
+            self._subs.add(sub)
+        subscribers.inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub not in self._subs:
+                return
+            self._subs.discard(sub)
+        subscribers.dec()
+
+    def deliver(self, item: dict) -> dict:
+        """Stamp item with a local id and hand it to matching subscribers."""
+
+        with self._lock:
+            item = {**item, "id": next(self._ids)}
+            self._recent.append(item)
+            subs = list(self._subs)
+
+        for sub in subs:
+            if sub.predicate(item):
+                try:
+                    sub.loop.call_soon_threadsafe(sub._offer, item)
+                    delivered.inc()
+                except RuntimeError:
+                    # the subscriber's loop is gone (shutdown)
+                    self.unsubscribe(sub)
+        return item
+
+    def replay(self, after_id: int, predicate=lambda item: True) -> list[dict]:
+        """Buffered events newer than after_id (SSE Last-Event-ID resume)."""
+
+        with self._lock:
+            return [item for item in self._recent if item["id"] > after_id and predicate(item)]
+
+
+bus = EventBus()
+
+
+# ──────────────────────────────────────────────────────
+# Cross-process fan-out
+# ──────────────────────────────────────────────────────
+
+class RedisBroker:
+    """
+    Publishes and relays events over a Redis pub/sub channel from two
+    daemon threads, so callers (ORM hooks, event loop) never block on I/O.
+    """
+
+    def __init__(self, client, channel: str = EVENTS_CHANNEL):
+        self.client = client
+        self.channel = channel
+        self._outbox: queue.SimpleQueue = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    @classmethod
+    def from_url(cls, url: str, channel: str = EVENTS_CHANNEL) -> "RedisBroker":
+        import redis                      # optional dependency
+
+        return cls(redis.Redis.from_url(url), channel)
+
+    def start(self, relay: bool = True):
+        targets = [self._publisher] + ([self._relay] if relay else [])
+        for target in targets:
+            thread = threading.Thread(target=target, name=f"events-{target.__name__.strip('_')}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def publish(self, item: dict):
+        self._outbox.put(json.dumps({"origin": ORIGIN, "event": item}))
+
+    def _publisher(self):
+        while not self._stop.is_set():
+            message = self._outbox.get()
+            if message is None:
+                return
+            try:
+                self.client.publish(self.channel, message)
+            except Exception as e:
+                logger.warning(f"[events] publish to {self.channel} failed: {e}")
+
+    def _relay(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        while not self._stop.is_set():
+            try:
+                message = pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                logger.warning(f"[events] relay from {self.channel} failed: {e}")
+                self._stop.wait(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            payload = json.loads(message["data"])
+            if payload.get("origin") != ORIGIN:
+                bus.deliver(payload["event"])
+        pubsub.close()
+
+    def stop(self):
+        self._stop.set()
+        self._outbox.put(None)
+
+
+_broker: RedisBroker | None = None
+_forward_queue = None
+
+
+def set_broker(broker: RedisBroker | None, relay: bool = True):
+    """Install (and start) a fan-out broker; None goes back to local only."""
+
+    global _broker
+    if _broker is not None:
+        _broker.stop()
+    _broker = broker
+    if broker is not None:
+        broker.start(relay=relay)
+
+
+def start_broker(relay: bool = True) -> RedisBroker | None:
+    """Connect to EVENTS_REDIS_URL if configured (API startup / workers)."""
+
+    if EVENTS_REDIS_URL and _broker is None:
+        set_broker(RedisBroker.from_url(EVENTS_REDIS_URL), relay=relay)
+    return _broker
+
+
+def broker_enabled() -> bool:
+    return _broker is not None
+
+
+def forward_to(event_queue):
+    """Worker side: send this process's events to the API over event_queue."""
+
+    global _forward_queue
+    _forward_queue = event_queue
+
+
+def relay_from(event_queue) -> threading.Thread:
+    """API side: deliver events forwarded by worker processes."""
+
+    def run():
+        while True:
+            item = event_queue.get()
+            if item is None:
+                return
+            bus.deliver(item)
+
+    thread = threading.Thread(target=run, name="events-worker-relay", daemon=True)
+    thread.start()
+    return thread
+
+
+def publish(item: dict):
+    published.inc()
+    bus.deliver(item)
+    if _broker is not None:
+        _broker.publish(item)
+    elif _forward_queue is not None:
+        _forward_queue.put(item)
+
+
+def stats() -> dict:
+    return {
+        "broker": "redis" if _broker is not None else None,
+        "channel": EVENTS_CHANNEL,
+        **metrics.snapshot(prefix="events_"),
+    }
+
+
+# ──────────────────────────────────────────────────────
+# ORM hooks: collect on flush, publish on commit
+# ──────────────────────────────────────────────────────
+
+def _collect(target: Scan, previous: str | None = None, created: bool = False):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("scan_events", []).append(scan_event(target, previous, created))
+
+
+@event.listens_for(Scan, "after_insert")
+def _scan_inserted(mapper, connection, target):
+    _collect(target, created=True)
+
+
+@event.listens_for(Scan, "after_update")
+def _scan_updated(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if history.has_changes():
+        _collect(target, history.deleted[0] if history.deleted else None)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    for item in session.info.pop("scan_events", ()):
+        publish(item)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("scan_events", None)
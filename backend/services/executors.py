@@ -0,0 +1,125 @@
+# backend/services/executors.py
+"""
+Explicit executors for blocking work called from async routes.
+
+Async handlers must never run CPU-heavy or blocking calls on the event
+loop. Rather than sharing AnyIO's default threadpool (also used by sync
+dependencies and file I/O), blocking work gets its own bounded pools so a
+burst of logins or report renders cannot starve everything else:
+
+    BLOCKING_WORKERS   threads: PDF rendering, SMTP, inference calls
+    CPU_WORKERS        processes: pure-CPU work that holds the GIL
+                       (bcrypt); at most CPU_MAX_PENDING calls may wait,
+                       beyond that run_cpu raises ExecutorSaturated
+"""
+
+import os
+import asyncio
+import functools
+import contextvars
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.services import metrics
+
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", str(min(8, (os.cpu_count() or 2) * 2))))
+CPU_WORKERS      = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_MAX_PENDING  = int(os.getenv("CPU_MAX_PENDING", "64"))
+
+_pool: ThreadPoolExecutor | None = None
+_cpu_pool: ProcessPoolExecutor | None = None
+
+in_flight = metrics.gauge("blocking_executor_in_flight", "Calls submitted to the blocking executor and not yet finished")
+
+cpu_in_flight   = metrics.gauge("cpu_pool_in_flight", "Calls submitted to the CPU process pool and not yet finished")
+cpu_queue_depth = metrics.gauge("cpu_pool_queue_depth", "CPU pool calls waiting for a free worker process")
+cpu_rejected    = metrics.counter("cpu_pool_rejected_total", "CPU pool calls refused because CPU_MAX_PENDING was reached")
+cpu_latency     = metrics.histogram("cpu_pool_call_seconds", "Queue wait + run time of CPU pool calls")
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised instead of queueing more work than the pool is allowed to hold."""
+
+
+def get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+    return _pool
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on the blocking pool."""
+
+    loop = asyncio.get_running_loop()
+    # in a copy of the caller's context, so spans started by fn join its trace
+    context = contextvars.copy_context()
+    in_flight.inc()
+    try:
+        return await loop.run_in_executor(get_pool(), functools.partial(context.run, fn, *args, **kwargs))
+    finally:
+        in_flight.dec()
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        # spawn, like the analysis workers: forking a process that already
+        # runs threads (event loop, executors, DB pool) is not safe
+        _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=mp.get_context("spawn"))
+    return _cpu_pool
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) in the CPU process pool. fn and its
+    arguments must be picklable (module-level functions).
+    """
+
+    if cpu_in_flight.value >= CPU_WORKERS + CPU_MAX_PENDING:
+        cpu_rejected.inc()
+        raise ExecutorSaturated(f"{int(cpu_in_flight.value)} CPU pool calls already pending")
+
+    global _cpu_pool
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    cpu_in_flight.inc()
+    cpu_queue_depth.set(max(0, cpu_in_flight.value - CPU_WORKERS))
+    try:
+        return await loop.run_in_executor(get_cpu_pool(), functools.partial(fn, *args, **kwargs))
+    except BrokenProcessPool:
+        # a worker died (OOM, signal); start a fresh pool for the next call
+        _cpu_pool = None
+        raise
+    finally:
+        cpu_in_flight.dec()
+        cpu_queue_depth.set(max(0, cpu_in_flight.value - CPU_WORKERS))
+        cpu_latency.observe(loop.time() - started)
+
+
+def warm_cpu_pool():
+    """Start every CPU pool worker up front (spawning one costs ~1 s)."""
+
+    pool = get_cpu_pool()
+    for future in [pool.submit(os.getpid) for _ in range(CPU_WORKERS)]:
+        future.result()
+
+
+def cpu_pool_stats() -> dict:
+    return {
+        "workers": CPU_WORKERS,
+        "max_pending": CPU_MAX_PENDING,
+        **metrics.snapshot(prefix="cpu_pool_"),
+    }
+
+
+def shutdown():
+    global _pool, _cpu_pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
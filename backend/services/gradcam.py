@@ -0,0 +1,293 @@
+# backend/services/gradcam.py
+"""
+Grad-CAM overlays: which part of a scan drove the model's prediction.
+
+Same method as generate_gradcam() / overlay_heatmap() in
+train_lung_model.py (gradients of the top class score w.r.t. the last
+convolutional block, 'Conv_1' in MobileNetV2), but built for serving:
+
+    - the gradient model and its tf.function are built once per process,
+      with a batch-polymorphic input signature, so neither the first nor
+      any later request retraces or rebuilds anything (warm_up() pays for
+      the single trace at startup)
+    - heatmaps are computed per sample in one batched pass: concurrent
+      requests are coalesced by a MicroBatcher, and the AI worker passes
+      the batch it has just predicted on (GRADCAM_MODE=eager)
+    - overlays are stored beside the scan as derivatives,
+
+        uploads/patient_scans/ab/cd/<sha256>.gradcam1024-<model version>.jpg
+        uploads/patient_scans/ab/cd/<sha256>.gradcam1024-<model version>.webp
+
+      so repeat views are a blob read (or a redirect), a new model
+      produces new keys, and cas.collect_garbage() removes them with the scan
+
+GRADCAM_MODE=lazy computes an overlay the first time it is requested,
+eager right after analysis, off disables the endpoint. The TFLite runtime
+has no gradients: overlays then come from the Keras model at
+GRADCAM_MODEL_PATH.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+from backend.services import cas, derivatives, metrics, model_registry, preprocessing
+from backend.services.batching import MicroBatcher
+from backend.services.blob_storage import get_store
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+GRADCAM_MODE              = os.getenv("GRADCAM_MODE", "lazy").lower()      # lazy | eager | off
+GRADCAM_LAYER             = os.getenv("GRADCAM_LAYER", "Conv_1")
+GRADCAM_MODEL_PATH        = os.getenv("GRADCAM_MODEL_PATH", model_registry.MODEL_PATH)
+GRADCAM_MAX_EDGE          = int(os.getenv("GRADCAM_MAX_EDGE", str(derivatives.REPORT_IMAGE_MAX_EDGE)))
+GRADCAM_ALPHA             = float(os.getenv("GRADCAM_ALPHA", "0.4"))
+GRADCAM_BATCH_MAX_SIZE    = int(os.getenv("GRADCAM_BATCH_MAX_SIZE", "8"))
+GRADCAM_BATCH_MAX_WAIT_MS = float(os.getenv("GRADCAM_BATCH_MAX_WAIT_MS", "20"))
+GRADCAM_WARMUP_ON_STARTUP = os.getenv("GRADCAM_WARMUP_ON_STARTUP", "true").lower() == "true"
+
+MODES = ("lazy", "eager", "off")
+
+# ── Metrics ───────────────────────────────────────────
+cache_hits      = metrics.counter("gradcam_cache_hits_total", "Overlay requests served from a stored overlay")
+overlays        = metrics.counter("gradcam_overlays_total", "Scans whose Grad-CAM overlays were computed")
+failures        = metrics.counter("gradcam_failures_total", "Grad-CAM computations that raised")
+compute_seconds = metrics.histogram("gradcam_compute_seconds", "Gradient pass time per batch of heatmaps")
+
+
+# ──────────────────────────────────────────────────────
+# Layout
+# ──────────────────────────────────────────────────────
+
+def enabled() -> bool:
+    return GRADCAM_MODE in ("lazy", "eager")
+
+
+def key_for(digest: str, fmt: str, model_version: str | None = None) -> str:
+    version = model_version or model_registry.model_version()
+    return cas.derivative_key(digest, f"gradcam{GRADCAM_MAX_EDGE}-{version}", derivatives.FORMATS[fmt][0])
+
+
+def keys_for(digest: str, model_version: str | None = None) -> list[str]:
+    """Every overlay key of a scan, in the order they are written."""
+    return [key_for(digest, fmt, model_version) for fmt in derivatives.FORMATS]
+
+
+# ──────────────────────────────────────────────────────
+# Heatmaps
+# ──────────────────────────────────────────────────────
+
+def _keras_model():
+    """The Keras model behind the serving runtime (gradients need one)."""
+
+    loaded = model_registry.get_model()
+    if loaded.runtime == "keras":
+        return loaded.model
+    if loaded.runtime == "graph":
+        return loaded.model.keras_model
+
+    import tensorflow as tf
+
+    if not os.path.exists(GRADCAM_MODEL_PATH):
+        raise FileNotFoundError(f"Grad-CAM model not found at: {GRADCAM_MODEL_PATH}")
+    return tf.keras.models.load_model(GRADCAM_MODEL_PATH)
+
+
+class GradCAM:
+    """Gradient model plus one traced function computing a batch of heatmaps."""
+
+    def __init__(self, model, layer: str = GRADCAM_LAYER):
+        import tensorflow as tf
+
+        self.layer = layer
+        self.input_shape = model.input_shape
+        grad_model = tf.keras.Model(model.inputs, [model.get_layer(layer).output, model.output])
+
+        def heatmaps(batch):
+            with tf.GradientTape() as tape:
+                conv_outputs, predictions = grad_model(batch, training=False)
+                # each sample's own top class, not the first sample's
+                top = tf.argmax(predictions, axis=1)
+                scores = tf.gather(predictions, top, axis=1, batch_dims=1)
+            grads = tape.gradient(scores, conv_outputs)
+            weights = tf.reduce_mean(grads, axis=(1, 2))
+            cams = tf.nn.relu(tf.einsum("nhwc,nc->nhw", conv_outputs, weights))
+            return cams / (tf.reduce_max(cams, axis=(1, 2), keepdims=True) + 1e-8)
+
+        self._fn = tf.function(
+            heatmaps,
+            input_signature=[tf.TensorSpec([None, *self.input_shape[1:]], tf.float32)],
+        )
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        started = time.perf_counter()
+        out = self._fn(batch).numpy()
+        compute_seconds.observe(time.perf_counter() - started)
+        return out
+
+
+_explainer: GradCAM | None = None
+_explainer_version: str | None = None
+_lock = threading.Lock()
+
+
+def get_explainer() -> GradCAM:
+    """This process's GradCAM, rebuilt only when the model changes."""
+
+    global _explainer, _explainer_version
+    version = model_registry.model_version()
+    if _explainer is not None and _explainer_version == version:
+        return _explainer
+
+    with _lock:
+        if _explainer is None or _explainer_version != version:
+            started = time.perf_counter()
+            _explainer = GradCAM(_keras_model())
+            _explainer_version = version
+            logger.info(f"[AI] Grad-CAM model built on '{GRADCAM_LAYER}' in {time.perf_counter() - started:.2f}s")
+    return _explainer
+
+
+def warm_up() -> dict:
+    """Build the gradient model and trace its function with a dummy batch."""
+
+    started = time.perf_counter()
+    explainer = get_explainer()
+    built = time.perf_counter()
+    explainer(np.zeros((1, *explainer.input_shape[1:]), dtype="float32"))
+    return {
+        "layer": GRADCAM_LAYER,
+        "build_seconds": built - started,
+        "first_heatmap_seconds": time.perf_counter() - built,
+    }
+
+
+def start_warm_up() -> threading.Thread:
+    """warm_up() without holding up startup."""
+
+    def run():
+        try:
+            warm = warm_up()
+            logger.info(f"[AI] Grad-CAM ready (first heatmap {warm['first_heatmap_seconds']:.2f}s)")
+        except Exception as e:
+            logger.warning(f"[AI] Grad-CAM warm-up failed: {e}")
+
+    thread = threading.Thread(target=run, name="gradcam-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# ──────────────────────────────────────────────────────
+# Overlays
+# ──────────────────────────────────────────────────────
+
+def overlay(data, heatmap: np.ndarray, alpha: float = GRADCAM_ALPHA) -> np.ndarray:
+    """The scan at GRADCAM_MAX_EDGE with the JET-coloured heatmap blended over it."""
+
+    img = derivatives.fit(derivatives.to_display(preprocessing.decode(data)), GRADCAM_MAX_EDGE)
+    if img.ndim == 2 or img.shape[2] == 1:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+    heat = cv2.resize(heatmap.astype(np.float32), (img.shape[1], img.shape[0]), interpolation=cv2.INTER_LINEAR)
+    heat = cv2.applyColorMap(np.uint8(255 * np.clip(heat, 0, 1)), cv2.COLORMAP_JET)
+    return cv2.addWeighted(heat, alpha, img, 1.0, 0)
+
+
+def store_overlays(digest: str, data, heatmap: np.ndarray, model_version: str | None = None):
+    """Encode one overlay in every format and store it; the last key is the completion marker."""
+
+    img = overlay(data, heatmap)
+    store = get_store()
+    for fmt, key in zip(derivatives.FORMATS, keys_for(digest, model_version)):
+        ext, media, params = derivatives.FORMATS[fmt]
+        ok, encoded = cv2.imencode(ext, img, params)
+        if not ok:
+            raise ValueError(f"Cannot encode Grad-CAM overlay as {fmt}")
+        store.put_bytes(key, encoded.tobytes(), content_type=media)
+    overlays.inc()
+
+
+def _heatmap_batch(images: list[np.ndarray]) -> list[np.ndarray]:
+    from backend.services import ai_service
+
+    buf = ai_service.batch_buffer(len(images))
+    for i, img in enumerate(images):
+        buf.slot(i)[...] = img
+    return list(get_explainer()(buf.view(len(images))))
+
+
+_batcher: MicroBatcher | None = None
+
+
+def get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            _heatmap_batch,
+            max_batch_size=GRADCAM_BATCH_MAX_SIZE,
+            max_wait_ms=GRADCAM_BATCH_MAX_WAIT_MS,
+            name="gradcam",
+        )
+    return _batcher
+
+
+def ensure(key: str, digest: str, fmt: str = "jpeg") -> str:
+    """
+    Blob key of the overlay of the scan stored under key, computing it if
+    it does not exist yet (lazy mode, or scans analysed before eager mode).
+    """
+
+    version = model_registry.model_version()
+    target = key_for(digest, fmt, version)
+    store = get_store()
+    if store.exists(target):
+        cache_hits.inc()
+        return target
+
+    from backend.services import ai_service
+
+    try:
+        data = store.get(key)
+        heatmap = get_batcher()(ai_service.load_image_bytes(data))
+        store_overlays(digest, data, heatmap, version)
+    except Exception:
+        failures.inc()
+        raise
+    return target
+
+
+def store_batch(items: list[tuple[str, str]], batch: np.ndarray):
+    """
+    Eager mode, from the AI worker: overlays for the (key, digest) scans
+    whose preprocessed pixels are the rows of batch, in one gradient pass.
+    """
+
+    try:
+        heatmaps = get_explainer()(batch)
+    except Exception as e:
+        failures.inc()
+        logger.warning(f"[AI] Grad-CAM batch of {len(items)} failed: {e}")
+        return
+
+    store = get_store()
+    version = model_registry.model_version()
+    for (key, digest), heatmap in zip(items, heatmaps):
+        try:
+            store_overlays(digest, store.get(key), heatmap, version)
+        except Exception as e:
+            failures.inc()
+            logger.warning(f"[AI] Grad-CAM overlay for {key} failed: {e}")
+
+
+def stats() -> dict:
+    return {
+        "mode": GRADCAM_MODE,
+        "layer": GRADCAM_LAYER,
+        "ready": _explainer is not None,
+        **metrics.snapshot(prefix="gradcam_"),
+    }
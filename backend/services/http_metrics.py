@@ -0,0 +1,69 @@
+# backend/services/http_metrics.py
+"""
+Per-route HTTP metrics, recorded by a pure ASGI middleware.
+
+    http_requests_total{method, route, status}
+    http_request_duration_seconds{method, route}     until the last body byte is sent
+    http_requests_in_progress
+
+route is the matched route template (/doctor/scan/{scan_id}/image), so
+the number of series stays bounded whatever ids are requested; requests
+that match no route are counted under "unmatched". Per request this costs
+two perf_counter() calls and two dict lookups. There is no
+BaseHTTPMiddleware task or body buffering, so streamed responses (SSE,
+scan images) pass straight through.
+"""
+
+import os
+import time
+
+from backend.services import metrics
+
+# ── Config ────────────────────────────────────────────
+METRICS_ENABLED       = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_EXCLUDE_PATHS = {p.strip() for p in os.getenv("METRICS_EXCLUDE_PATHS", "/metrics").split(",") if p.strip()}
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ── Metrics ───────────────────────────────────────────
+requests_total   = metrics.counter("http_requests_total", "HTTP requests by route and status", labels=("method", "route", "status"))
+request_seconds  = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", buckets=HTTP_BUCKETS, labels=("method", "route")
+)
+requests_active  = metrics.gauge("http_requests_in_progress", "HTTP requests being handled")
+
+
+def route_template(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in METRICS_EXCLUDE_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        requests_active.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_active.dec()
+            # the router has put the matched route into scope by now
+            route = route_template(scope)
+            request_seconds.labels(scope["method"], route).observe(elapsed)
+            requests_total.labels(scope["method"], route, str(status)).inc()
@@ -0,0 +1,613 @@
+# backend/services/job_queue.py
+
+import os
+import time
+import socket
+import logging
+import threading
+import multiprocessing as mp
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, engine
+from backend.models.job import AnalysisJob
+from backend.models.schema import Scan
+from backend.services import blob_storage, cas, derivatives, events, gradcam, metrics, prediction_cache, tracing
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+# AI_WORKERS=0 disables the in-app pool; run `python -m backend.services.job_queue`
+# on a separate node/process instead.
+AI_WORKERS            = int(os.getenv("AI_WORKERS", "2"))
+AI_JOB_POLL_SECONDS   = float(os.getenv("AI_JOB_POLL_SECONDS", "0.5"))
+AI_JOB_MAX_ATTEMPTS   = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "3"))
+AI_JOB_CLAIM_SIZE     = int(os.getenv("AI_JOB_CLAIM_SIZE", os.getenv("AI_BATCH_MAX_SIZE", "16")))
+# A claim is a lease: the worker renews it every AI_JOB_HEARTBEAT_SECONDS, and
+# any process may requeue a RUNNING job whose lease has lapsed (checked every
+# AI_JOB_REAP_SECONDS), so a restart never takes jobs away from live workers.
+AI_JOB_LEASE_SECONDS     = int(os.getenv("AI_JOB_LEASE_SECONDS", "300"))
+AI_JOB_HEARTBEAT_SECONDS = float(os.getenv("AI_JOB_HEARTBEAT_SECONDS", str(AI_JOB_LEASE_SECONDS / 3)))
+AI_JOB_REAP_SECONDS      = float(os.getenv("AI_JOB_REAP_SECONDS", "60"))
+# Workers have no API of their own: worker i serves /metrics on this port + i (0 = off)
+AI_WORKER_METRICS_PORT = int(os.getenv("AI_WORKER_METRICS_PORT", "0"))
+
+# ── Auto-analyze on upload ────────────────────────────
+# When enabled, /patient/upload queues analysis as soon as the scan row is
+# committed. Uploads are refused with 503 once AI_MAX_BACKLOG jobs are waiting.
+AUTO_ANALYZE_ON_UPLOAD = os.getenv("AUTO_ANALYZE_ON_UPLOAD", "false").lower() == "true"
+AI_MAX_BACKLOG         = int(os.getenv("AI_MAX_BACKLOG", "200"))
+AI_RETRY_AFTER_SECONDS = int(os.getenv("AI_RETRY_AFTER_SECONDS", "30"))
+
+# ── Job states ────────────────────────────────────────
+QUEUED  = "QUEUED"
+RUNNING = "RUNNING"
+DONE    = "DONE"
+FAILED  = "FAILED"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Scan states analysis may (re)run in; later ones belong to doctor/pharmacist
+ANALYZABLE_SCAN_STATES = ("PENDING_AI", "AI_ANALYZED")
+
+# ── API-side counters ─────────────────────────────────
+jobs_enqueued    = metrics.counter("ai_jobs_enqueued_total", "Analysis jobs created")
+uploads_rejected = metrics.counter("ai_uploads_rejected_total", "Uploads refused because the backlog was full")
+
+# ── Queue depth (read from the jobs table at scrape time) ─
+jobs_queued  = metrics.gauge("ai_jobs_queued", "Analysis jobs waiting for a worker")
+jobs_running = metrics.gauge("ai_jobs_running", "Analysis jobs claimed by a worker")
+
+
+# ──────────────────────────────────────────────────────
+# Producer side (API process)
+# ──────────────────────────────────────────────────────
+
+def _active_job(db: Session, scan_id: int) -> AnalysisJob | None:
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.scan_id == scan_id,
+        AnalysisJob.status.in_(ACTIVE_STATES)
+    ).first()
+
+
+def enqueue_analysis(db: Session, scan_id: int) -> AnalysisJob:
+    """Queue a scan for analysis, reusing an already queued/running job."""
+
+    job = _active_job(db, scan_id)
+    if job:
+        return job
+
+    job = AnalysisJob(scan_id=scan_id, status=QUEUED, traceparent=tracing.current_traceparent())
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # uq_analysis_jobs_active_scan: a concurrent request queued it first
+        db.rollback()
+        job = _active_job(db, scan_id)
+        if job is None:
+            raise
+        return job
+
+    db.refresh(job)
+    jobs_enqueued.inc()
+    return job
+
+
+def enqueue_pending(db: Session) -> list[AnalysisJob]:
+    """Queue every PENDING_AI scan that does not already have an active job."""
+
+    active = select(AnalysisJob.scan_id).where(
+        AnalysisJob.status.in_(ACTIVE_STATES)
+    )
+
+    for attempt in range(3):
+        scan_ids = [
+            row.id for row in db.query(Scan.id).filter(
+                Scan.status == "PENDING_AI",
+                Scan.id.not_in(active)
+            ).order_by(Scan.id).all()
+        ]
+
+        jobs = [AnalysisJob(scan_id=scan_id, status=QUEUED) for scan_id in scan_ids]
+        db.add_all(jobs)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # another request queued some of these scans meanwhile: their
+            # jobs are committed now, so the next pass skips them
+            db.rollback()
+            if attempt == 2:
+                raise
+    jobs_enqueued.inc(len(jobs))
+
+    for job in jobs:
+        db.refresh(job)
+    return jobs
+
+
+def get_job(db: Session, job_id: int) -> AnalysisJob | None:
+    return db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+
+
+def queue_depth(db: Session) -> int:
+    return db.query(AnalysisJob).filter(AnalysisJob.status == QUEUED).count()
+
+
+def backlog_full(db: Session) -> bool:
+    return queue_depth(db) >= AI_MAX_BACKLOG
+
+
+@metrics.register_collector
+def collect_queue_depth():
+    with SessionLocal() as db:
+        counts = dict(db.execute(
+            select(AnalysisJob.status, func.count(AnalysisJob.id))
+            .where(AnalysisJob.status.in_(ACTIVE_STATES))
+            .group_by(AnalysisJob.status)
+        ).all())
+    jobs_queued.set(counts.get(QUEUED, 0))
+    jobs_running.set(counts.get(RUNNING, 0))
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def pipeline_stats(db: Session, window_minutes: int = 5) -> dict:
+    """
+    Throughput and latency of finished jobs over a recent window.
+    Read from the jobs table so numbers cover every worker process.
+    """
+
+    since = datetime.utcnow() - timedelta(minutes=window_minutes)
+
+    finished = db.query(
+        AnalysisJob.status,
+        AnalysisJob.created_at,
+        AnalysisJob.started_at,
+        AnalysisJob.finished_at,
+    ).filter(
+        AnalysisJob.finished_at >= since
+    ).all()
+
+    done = [j for j in finished if j.status == DONE]
+    queue_wait = [
+        (j.started_at - j.created_at).total_seconds()
+        for j in done if j.started_at and j.created_at
+    ]
+    end_to_end = [
+        (j.finished_at - j.created_at).total_seconds()
+        for j in done if j.created_at
+    ]
+
+    return {
+        "window_minutes": window_minutes,
+        "queued": queue_depth(db),
+        "running": db.query(AnalysisJob).filter(AnalysisJob.status == RUNNING).count(),
+        "max_backlog": AI_MAX_BACKLOG,
+        "auto_analyze_on_upload": AUTO_ANALYZE_ON_UPLOAD,
+        "done": len(done),
+        "failed": len(finished) - len(done),
+        "throughput_per_second": len(done) / (window_minutes * 60.0),
+        "queue_wait_seconds": {
+            "p50": _percentile(queue_wait, 50),
+            "p95": _percentile(queue_wait, 95),
+        },
+        "latency_seconds": {
+            "p50": _percentile(end_to_end, 50),
+            "p95": _percentile(end_to_end, 95),
+            "p99": _percentile(end_to_end, 99),
+        },
+        "enqueued_total": jobs_enqueued.value,
+        "uploads_rejected_total": uploads_rejected.value,
+    }
+
+
+# ──────────────────────────────────────────────────────
+# Consumer side (worker processes)
+# ──────────────────────────────────────────────────────
+
+def claim_jobs(db: Session, worker_id: str, limit: int = 1) -> list[AnalysisJob]:
+    """
+    Atomically move up to `limit` QUEUED jobs to RUNNING for this worker.
+    The conditional UPDATE makes the claim safe across processes.
+    """
+
+    candidates = [
+        row.id for row in db.query(AnalysisJob.id).filter(
+            AnalysisJob.status == QUEUED
+        ).order_by(AnalysisJob.id).limit(limit).all()
+    ]
+
+    claimed = []
+    for job_id in candidates:
+        now = datetime.utcnow()
+        result = db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == QUEUED)
+            .values(
+                status=RUNNING,
+                worker=worker_id,
+                started_at=now,
+                claimed_until=now + timedelta(seconds=AI_JOB_LEASE_SECONDS),
+                attempts=AnalysisJob.attempts + 1,
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            claimed.append(job_id)
+
+    if not claimed:
+        return []
+
+    return db.query(AnalysisJob).filter(AnalysisJob.id.in_(claimed)).order_by(AnalysisJob.id).all()
+
+
+def _finish(job: AnalysisJob, status: str, error: str | None = None):
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.utcnow()
+
+
+def _retry_or_fail(job: AnalysisJob, error: str):
+    if (job.attempts or 0) < AI_JOB_MAX_ATTEMPTS:
+        job.status = QUEUED
+        job.error = error
+        job.worker = None
+        job.claimed_until = None
+    else:
+        _finish(job, FAILED, error)
+
+
+def _apply_result(job: AnalysisJob, scan: Scan, result: dict):
+    scan.prediction = result["label"]
+    scan.confidence = result["confidence"]
+    scan.model_version = result.get("model_version")
+    # Only move forward: the scan may have been verified or completed
+    # while a re-analysis was waiting in the queue.
+    if scan.status == "PENDING_AI":
+        scan.status = "AI_ANALYZED"
+    _finish(job, DONE)
+
+
+def _job_span(job: AnalysisJob) -> tracing.Span:
+    """
+    The span of one claimed job, in the trace of the request that queued
+    it: from enqueueing until this attempt ends, starting with the wait.
+    """
+
+    span = tracing.start_span(
+        "ai.job",
+        parent=job.traceparent,
+        kind="consumer",
+        start_ns=tracing.unix_ns(job.created_at),
+        job_id=job.id,
+        scan_id=job.scan_id,
+        attempt=job.attempts,
+        worker=job.worker,
+    )
+    tracing.record("queue.wait", span.start_ns, tracing.unix_ns(job.started_at), parent=span)
+    return span
+
+
+def _record_step(name: str, started_ns: int, spans: list, **attributes):
+    """A batched step (one forward pass, one commit) in the trace of every job it served."""
+
+    ended = time.time_ns()
+    for span in spans:
+        tracing.record(name, started_ns, ended, parent=span, **attributes)
+
+
+def _end_job_span(job: AnalysisJob, span: tracing.Span):
+    if span.sampled:
+        try:
+            status, error = job.status, job.error        # reloaded after the commit
+        except Exception as e:
+            status, error = None, f"worker error: {e}"
+        span.set_attribute("status", status)
+        if status != DONE:
+            span.set_error(error or f"job left {status}")
+    span.end()
+
+
+def process_jobs(db: Session, jobs: list[AnalysisJob], ai_service) -> None:
+    """
+    Run one batched forward pass over the claimed jobs. Each scan's
+    prediction fields and its job row are committed together.
+    """
+
+    traces = {job.id: _job_span(job) for job in jobs}
+    try:
+        _run_batch(db, jobs, ai_service, traces)
+    finally:
+        for job in jobs:
+            _end_job_span(job, traces[job.id])
+
+
+def _run_batch(db: Session, jobs: list[AnalysisJob], ai_service, traces: dict[int, tracing.Span]):
+
+    # Each object is read once: the same bytes are hashed for the cache and
+    # decoded straight into this worker's preallocated batch buffer.
+    store = blob_storage.get_store()
+    buf = ai_service.batch_buffer(len(jobs))
+    ready = []
+
+    for job in jobs:
+        scan = db.query(Scan).filter(Scan.id == job.scan_id).first()
+        if not scan:
+            _finish(job, FAILED, "Scan not found")
+            continue
+
+        key = scan.file_path
+        try:
+            with tracing.span("ai.fetch_decode", parent=traces[job.id]) as span:
+                # Content-addressed scans carry their hash in the key, so a
+                # cache hit does not even need to fetch the object.
+                digest = cas.digest_from_path(key)
+                data = None
+                if digest is None:
+                    data = store.get(key)
+                    digest = prediction_cache.content_hash(data)
+                cached = prediction_cache.get(digest)
+                span.set_attribute("cache_hit", cached is not None)
+                if cached is not None:
+                    _apply_result(job, scan, cached)
+                    continue
+
+                if data is None:
+                    data = store.get(key)
+
+                ai_service.decode_into(data, buf.slot(len(ready)))
+            ready.append((job, scan, digest))
+        except (FileNotFoundError, ValueError) as e:
+            # Missing or undecodable input never succeeds on retry
+            _finish(job, FAILED, str(e))
+        except Exception as e:
+            # Storage hiccup (timeout, throttling): worth another attempt
+            logger.warning(f"[AI] could not fetch {key}: {e}")
+            _retry_or_fail(job, f"Could not read scan: {e}")
+
+    started = time.time_ns()
+    db.commit()
+    _record_step("db.commit", started, list(traces.values()))
+
+    if not ready:
+        return
+
+    batch_spans = [traces[job.id] for job, _, _ in ready]
+    started = time.time_ns()
+    try:
+        results = ai_service.predict_array(buf.view(len(ready)))
+    except Exception as e:
+        logger.exception(f"[AI] batch of {len(ready)} jobs failed")
+        for job, _, _ in ready:
+            _retry_or_fail(job, f"AI prediction failed: {e}")
+        db.commit()
+        return
+    _record_step("ai.predict", started, batch_spans, batch_size=len(ready))
+
+    for (job, scan, digest), result in zip(ready, results):
+        _apply_result(job, scan, result)
+        prediction_cache.put(digest, result)
+
+    started = time.time_ns()
+    db.commit()
+    _record_step("db.commit", started, batch_spans)
+
+    # Eager explanations: the gradient pass reuses the batch just predicted on
+    if gradcam.GRADCAM_MODE == "eager":
+        started = time.time_ns()
+        gradcam.store_batch([(scan.file_path, digest) for _, scan, digest in ready], buf.view(len(ready)))
+        _record_step("gradcam.store", started, batch_spans, batch_size=len(ready))
+
+    # Scans that reached analysis without derivatives (failed or disabled at
+    # upload time) get them here, after their results are already committed.
+    for job, scan, digest in ready:
+        with tracing.activate(traces[job.id]):
+            derivatives.try_generate(scan.file_path, digest)
+
+
+def renew_leases(db: Session, worker_id: str) -> int:
+    """Heartbeat: extend the lease of every job this worker is running."""
+
+    result = db.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.worker == worker_id, AnalysisJob.status == RUNNING)
+        .values(claimed_until=datetime.utcnow() + timedelta(seconds=AI_JOB_LEASE_SECONDS))
+    )
+    db.commit()
+    return result.rowcount
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Return RUNNING jobs whose lease has lapsed (their worker died or hung)
+    to the queue. A job that has used up its attempts fails instead, so a
+    scan that kills its worker is not retried forever. Safe to run from
+    any process at any time: live workers keep their leases current.
+    """
+
+    now = datetime.utcnow()
+    stale = and_(
+        AnalysisJob.status == RUNNING,
+        or_(
+            AnalysisJob.claimed_until < now,
+            # claimed before leases existed
+            and_(AnalysisJob.claimed_until.is_(None), AnalysisJob.started_at < now - timedelta(seconds=AI_JOB_LEASE_SECONDS)),
+        ),
+    )
+
+    failed = db.execute(
+        update(AnalysisJob)
+        .where(stale, AnalysisJob.attempts >= AI_JOB_MAX_ATTEMPTS)
+        .values(status=FAILED, error="Worker lost the job on every attempt", finished_at=now, claimed_until=None)
+    )
+    requeued = db.execute(
+        update(AnalysisJob)
+        .where(stale)
+        .values(status=QUEUED, worker=None, claimed_until=None)
+    )
+    db.commit()
+
+    if failed.rowcount:
+        logger.warning(f"[AI] {failed.rowcount} jobs failed after {AI_JOB_MAX_ATTEMPTS} lost attempts")
+    if requeued.rowcount:
+        logger.info(f"[AI] requeued {requeued.rowcount} jobs with an expired lease")
+    return requeued.rowcount
+
+
+def _heartbeat(worker_id: str, stop_event):
+    while not stop_event.wait(AI_JOB_HEARTBEAT_SECONDS):
+        try:
+            with SessionLocal() as db:
+                renew_leases(db, worker_id)
+        except Exception:
+            logger.exception(f"[AI] worker {worker_id} heartbeat failed")
+
+
+def run_worker(worker_id: str, stop_event=None, event_queue=None, metrics_port: int = 0):
+    """Worker process entry point: load the model once, then drain the queue."""
+
+    from backend.services import ai_service, model_registry, tta
+
+    # inference stage timings, batch sizes, DB queries of this process
+    if metrics_port:
+        try:
+            metrics.start_http_server(metrics_port)
+        except OSError as e:
+            logger.warning(f"[AI] worker {worker_id} cannot serve metrics on port {metrics_port}: {e}")
+
+    # AI_ANALYZED events reach dashboards via Redis when configured, else
+    # through the API process that started this worker
+    if events.start_broker(relay=False) is None and event_queue is not None:
+        events.forward_to(event_queue)
+
+    # Load the model once per process before claiming any job
+    try:
+        warm = model_registry.warm_up()
+    except Exception:
+        logger.exception(f"[AI] worker {worker_id} could not load the model")
+        return
+
+    logger.info(
+        f"[AI] worker {worker_id} ready (pid={os.getpid()}, "
+        f"load={warm['load_seconds']:.2f}s, first_inference={warm['first_inference_seconds']:.2f}s)"
+    )
+
+    # TTA / ensemble members: loaded and timed before their first budgeted pass
+    try:
+        tta.warm_up()
+    except Exception as e:
+        logger.warning(f"[AI] worker {worker_id} could not warm up TTA: {e}")
+
+    # Eager mode explains every batch: trace the gradient function up front too
+    if gradcam.GRADCAM_MODE == "eager":
+        try:
+            gradcam.warm_up()
+        except Exception as e:
+            logger.warning(f"[AI] worker {worker_id} could not build the Grad-CAM model: {e}")
+
+    stop_event = stop_event if stop_event is not None else threading.Event()
+    threading.Thread(target=_heartbeat, args=(worker_id, stop_event), name="ai-heartbeat", daemon=True).start()
+    last_reap = 0.0
+
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            # jobs of workers that died anywhere, not just in this pool
+            if time.monotonic() - last_reap > AI_JOB_REAP_SECONDS:
+                requeue_stale_jobs(db)
+                last_reap = time.monotonic()
+
+            jobs = claim_jobs(db, worker_id, limit=AI_JOB_CLAIM_SIZE)
+            if jobs:
+                process_jobs(db, jobs, ai_service)
+                continue
+        except Exception:
+            logger.exception(f"[AI] worker {worker_id} loop error")
+        finally:
+            db.close()
+
+        stop_event.wait(AI_JOB_POLL_SECONDS)
+
+
+# ──────────────────────────────────────────────────────
+# Pool management
+# ──────────────────────────────────────────────────────
+
+_processes: list = []
+_stop_event = None
+_event_queue = None
+
+
+def start_worker_pool(workers: int = AI_WORKERS) -> list:
+    global _stop_event, _event_queue
+
+    if workers <= 0 or _processes:
+        return _processes
+
+    AnalysisJob.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        requeue_stale_jobs(db)
+    finally:
+        db.close()
+
+    # TensorFlow is not fork-safe — always spawn fresh interpreters
+    ctx = mp.get_context("spawn")
+    _stop_event = ctx.Event()
+
+    if not events.broker_enabled():
+        _event_queue = ctx.Queue()
+        events.relay_from(_event_queue)
+
+    for i in range(workers):
+        # unique across API processes and hosts: leases are renewed by worker id
+        p = ctx.Process(
+            target=run_worker,
+            args=(f"ai-worker-{socket.gethostname()}-{os.getpid()}-{i}", _stop_event, _event_queue, AI_WORKER_METRICS_PORT + i if AI_WORKER_METRICS_PORT else 0),
+            name=f"ai-worker-{i}",
+            daemon=True,
+        )
+        p.start()
+        _processes.append(p)
+
+    return _processes
+
+
+def stop_worker_pool(timeout: float = 10.0):
+    if _stop_event is not None:
+        _stop_event.set()
+
+    for p in _processes:
+        p.join(timeout)
+        if p.is_alive():
+            p.terminate()
+
+    _processes.clear()
+
+    if _event_queue is not None:
+        _event_queue.put(None)          # ends the relay thread
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    start_worker_pool(max(AI_WORKERS, 1))
+
+    try:
+        for p in list(_processes):
+            p.join()
+    except KeyboardInterrupt:
+        stop_worker_pool()
@@ -0,0 +1,297 @@
+# backend/services/metrics.py
+
+import math
+import logging
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# ── In-process metric primitives ──────────────────────────────────────────────
+# Every metric registers itself in REGISTRY by name so that endpoints can
+# expose a single snapshot of the whole process.
+REGISTRY: dict[str, "Metric"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str = ""):
+        super().__init__(name, description)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict:
+        return {"type": self.kind, "value": self._value}
+
+
+class Gauge(Metric):
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str = ""):
+        super().__init__(name, description)
+        self._value = 0.0
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict:
+        return {"type": self.kind, "value": self._value}
+
+
+class Histogram(Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str = "", buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)   # last slot = +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+
+        return {
+            "type": self.kind,
+            "buckets": cumulative,
+            "count": count,
+            "sum": total,
+        }
+
+
+class Family(Metric):
+    """
+    One child metric per combination of label values, e.g. request counts
+    per route and status. Keep label values low-cardinality (route
+    templates, not raw paths).
+    """
+
+    def __init__(self, name: str, description: str = "", labels: tuple = (), metric_cls=Counter, **kwargs):
+        super().__init__(name, description)
+        self.kind = metric_cls.kind
+        self.label_names = tuple(labels)
+        self._metric_cls = metric_cls
+        self._kwargs = kwargs
+        self._children: dict[tuple, Metric] = {}
+
+    def labels(self, *values) -> Metric:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._metric_cls(self.name, self.description, **self._kwargs)
+                    self._children[values] = child
+        return child
+
+    def series(self) -> list[tuple[tuple, Metric]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.kind,
+            "labels": list(self.label_names),
+            "series": [
+                {
+                    "labels": dict(zip(self.label_names, values)),
+                    **{k: v for k, v in child.snapshot().items() if k != "type"},
+                }
+                for values, child in self.series()
+            ],
+        }
+
+
+def _register(cls, name: str, description: str, **kwargs):
+    with _REGISTRY_LOCK:
+        existing = REGISTRY.get(name)
+        if existing is not None:
+            if not isinstance(existing, cls):
+                raise ValueError(f"Metric '{name}' already registered as {existing.kind}")
+            return existing
+        metric = cls(name, description, **kwargs)
+        REGISTRY[name] = metric
+        return metric
+
+
+def counter(name: str, description: str = "", labels: tuple = ()) -> Counter | Family:
+    if labels:
+        return _register(Family, name, description, labels=labels, metric_cls=Counter)
+    return _register(Counter, name, description)
+
+
+def gauge(name: str, description: str = "", labels: tuple = ()) -> Gauge | Family:
+    if labels:
+        return _register(Family, name, description, labels=labels, metric_cls=Gauge)
+    return _register(Gauge, name, description)
+
+
+def histogram(name: str, description: str = "", buckets=DEFAULT_BUCKETS, labels: tuple = ()) -> Histogram | Family:
+    if labels:
+        return _register(Family, name, description, labels=labels, metric_cls=Histogram, buckets=buckets)
+    return _register(Histogram, name, description, buckets=buckets)
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Return a JSON-serialisable view of every metric whose name starts with prefix."""
+    with _REGISTRY_LOCK:
+        metrics = [m for name, m in REGISTRY.items() if name.startswith(prefix)]
+    return {m.name: m.snapshot() for m in metrics}
+
+
+# ── Collectors ────────────────────────────────────────────────────────────────
+# Values that are cheaper to read on demand than to keep current (queue
+# depths held in the database, say) are refreshed by collectors right
+# before each scrape.
+_COLLECTORS: list = []
+
+
+def register_collector(fn):
+    """Call fn() before every exposition(); usable as a decorator."""
+    if fn not in _COLLECTORS:
+        _COLLECTORS.append(fn)
+    return fn
+
+
+def collect():
+    for fn in list(_COLLECTORS):
+        try:
+            fn()
+        except Exception as e:
+            logger.warning(f"[metrics] collector {getattr(fn, '__name__', fn)} failed: {e}")
+
+
+# ── Prometheus text exposition (format 0.0.4) ─────────────────────────────────
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str, quote: bool = True) -> str:
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _render(lines: list[str], metric: Metric, name: str, pairs: list[tuple[str, str]]):
+    snap = metric.snapshot()
+    if metric.kind != "histogram":
+        lines.append(f"{name}{_labels(pairs)} {_number(snap['value'])}")
+        return
+    for bound, count in snap["buckets"].items():
+        lines.append(f"{name}_bucket{_labels(pairs + [('le', bound)])} {count}")
+    lines.append(f"{name}_sum{_labels(pairs)} {_number(snap['sum'])}")
+    lines.append(f"{name}_count{_labels(pairs)} {snap['count']}")
+
+
+def exposition(prefix: str = "") -> str:
+    """Every registered metric (after running the collectors) in Prometheus text format."""
+
+    collect()
+    with _REGISTRY_LOCK:
+        registered = sorted((m for name, m in REGISTRY.items() if name.startswith(prefix)), key=lambda m: m.name)
+
+    lines = []
+    for metric in registered:
+        lines.append(f"# HELP {metric.name} {_escape(metric.description, quote=False)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Family):
+            for values, child in metric.series():
+                _render(lines, child, metric.name, list(zip(metric.label_names, values)))
+        else:
+            _render(lines, metric, metric.name, [])
+    return "\n".join(lines) + "\n"
+
+
+def start_http_server(port: int, host: str = "0.0.0.0"):
+    """
+    Serve exposition() on http://host:port/metrics from a daemon thread, for
+    processes without an API of their own (AI workers, standalone senders).
+    """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    return server
@@ -0,0 +1,216 @@
+# backend/services/model_registry.py
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ── Paths ─────────────────────────────────────────────
+MODEL_PATH  = os.getenv("AI_MODEL_PATH", "models/lung_model.h5")
+LABELS_PATH = os.getenv("CLASS_LABELS_PATH", "models/metadata/class_labels.json")
+
+# ── Runtime ───────────────────────────────────────────
+# keras  → tf.keras Model.predict (default)
+# graph  → traced tf.function, XLA-compiled when AI_XLA=true
+# tflite → TFLite interpreter on AI_TFLITE_PATH (see export_lung_model.py)
+AI_RUNTIME      = os.getenv("AI_RUNTIME", "keras").lower()
+AI_XLA          = os.getenv("AI_XLA", "false").lower() == "true"
+TFLITE_PATH     = os.getenv("AI_TFLITE_PATH", "models/lung_model_dynamic.tflite")
+TFLITE_THREADS  = int(os.getenv("AI_TFLITE_THREADS", "0")) or None
+
+RUNTIMES = ("keras", "graph", "tflite")
+
+DEFAULT_MODEL = "default"
+
+# name → model file; more entries can be added with register_model()
+MODEL_PATHS: dict[str, str] = {
+    DEFAULT_MODEL: TFLITE_PATH if AI_RUNTIME == "tflite" else MODEL_PATH
+}
+
+
+class LoadedModel:
+    """A loaded model plus the metadata every caller needs alongside it."""
+
+    def __init__(self, name: str, path: str, model, class_names: list, load_seconds: float, runtime: str = "keras"):
+        self.name = name
+        self.path = path
+        self.runtime = runtime
+        self.model = model
+        self.class_names = class_names
+        self.load_seconds = load_seconds
+
+        # 🔥 AUTO-DETECT INPUT SIZE FROM MODEL
+        shape = model.input_shape
+        self.height = shape[1]
+        self.width = shape[2]
+        self.channels = shape[3]
+
+    @property
+    def input_size(self) -> str:
+        return f"{self.height}x{self.width}x{self.channels}"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, verbose=0)
+
+
+_models: dict[str, LoadedModel] = {}
+_lock = threading.Lock()
+
+
+def register_model(name: str, path: str):
+    with _lock:
+        MODEL_PATHS[name] = path
+        _models.pop(name, None)
+
+
+def load_class_names() -> list:
+    if not os.path.exists(LABELS_PATH):
+        raise FileNotFoundError(f"Class labels file not found at: {LABELS_PATH}")
+
+    with open(LABELS_PATH, "r") as f:
+        return json.load(f)
+
+
+def _load_runtime(path: str):
+    """Build the runtime for a model file; .tflite files always use TFLite."""
+
+    # TensorFlow is imported lazily (here and in runtimes), not at module
+    # level, so that routers, CLIs and tests which never run inference do
+    # not pay for it.
+    from backend.services import runtimes
+
+    if path.endswith(".tflite"):
+        return runtimes.TFLiteModel(path, num_threads=TFLITE_THREADS), "tflite"
+
+    if AI_RUNTIME not in RUNTIMES:
+        raise ValueError(f"Unknown AI_RUNTIME '{AI_RUNTIME}'. Expected one of {RUNTIMES}")
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(path)
+
+    if AI_RUNTIME == "graph":
+        return runtimes.GraphModel(model, jit_compile=AI_XLA), "graph"
+
+    return model, "keras"
+
+
+def _load(name: str) -> LoadedModel:
+    path = MODEL_PATHS.get(name)
+    if path is None:
+        raise KeyError(f"Unknown model '{name}'")
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"AI model not found at: {path}")
+
+    class_names = load_class_names()
+
+    started = time.perf_counter()
+    model, runtime = _load_runtime(path)
+    loaded = LoadedModel(name, path, model, class_names, time.perf_counter() - started, runtime)
+
+    logger.info(f"[AI] Model '{name}' ({runtime}) loaded from {path} in {loaded.load_seconds:.2f}s")
+    logger.info(f"[AI] Expected input size: {loaded.input_size}")
+
+    return loaded
+
+
+def get_model(name: str = DEFAULT_MODEL) -> LoadedModel:
+    """Return the named model, loading it on first use (thread-safe)."""
+
+    loaded = _models.get(name)
+    if loaded is not None:
+        return loaded
+
+    with _lock:
+        loaded = _models.get(name)
+        if loaded is None:
+            loaded = _load(name)
+            _models[name] = loaded
+    return loaded
+
+
+_versions: dict[tuple, str] = {}
+
+
+def _version_files(path: str) -> list[str]:
+    """Files whose bytes identify a model: the file itself, or the graph + variable index of a SavedModel."""
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, "saved_model.pb"),
+            os.path.join(path, "variables", "variables.index"),
+        ]
+    return [path]
+
+
+def model_version(name: str = DEFAULT_MODEL) -> str:
+    """
+    Short content hash of the named model's weights plus the runtime.
+    Does not load TensorFlow; memoised per (path, size, mtime).
+    """
+
+    path = MODEL_PATHS.get(name)
+    if path is None:
+        raise KeyError(f"Unknown model '{name}'")
+
+    files = _version_files(path)
+    stamp = tuple((f, os.path.getsize(f), os.path.getmtime(f)) for f in files)
+
+    version = _versions.get(stamp)
+    if version is None:
+        digest = hashlib.sha256(AI_RUNTIME.encode())
+        for f in files:
+            with open(f, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    digest.update(chunk)
+        version = digest.hexdigest()[:16]
+        _versions[stamp] = version
+
+    return version
+
+
+def is_loaded(name: str = DEFAULT_MODEL) -> bool:
+    return name in _models
+
+
+def warm_up(name: str = DEFAULT_MODEL) -> dict:
+    """
+    Load the model and run one dummy forward pass so the first real
+    request does not pay for graph tracing / kernel selection.
+    """
+
+    started = time.perf_counter()
+    loaded = get_model(name)
+    load_done = time.perf_counter()
+
+    dummy = np.zeros((1, loaded.height, loaded.width, loaded.channels), dtype="float32")
+    loaded.predict(dummy)
+    predict_done = time.perf_counter()
+
+    return {
+        "model": name,
+        "path": loaded.path,
+        "load_seconds": load_done - started,
+        "first_inference_seconds": predict_done - load_done,
+    }
+
+
+def stats() -> dict:
+    return {
+        name: {
+            "path": MODEL_PATHS.get(name),
+            "runtime": _models[name].runtime if name in _models else None,
+            "loaded": name in _models,
+            "load_seconds": _models[name].load_seconds if name in _models else None,
+        }
+        for name in MODEL_PATHS
+    }
@@ -0,0 +1,212 @@
+# backend/services/prediction_cache.py
+"""
+Two-tier prediction cache keyed by the SHA-256 of the scan bytes.
+
+Tier 1 is a per-process LRU, tier 2 the prediction_cache table so hits
+survive restarts and are shared between API and worker processes.
+Entries are stored under a cache version derived from the model weights
+and CONFIDENCE_THRESHOLD; changing either makes old entries unreachable
+(and purge_stale() deletes them).
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from backend.database import SessionLocal, engine
+from backend.models.prediction_cache import PredictionCacheEntry
+from backend.services import metrics, model_registry
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+PREDICTION_CACHE_SIZE    = int(os.getenv("PREDICTION_CACHE_SIZE", "2048"))
+
+# ── Metrics ───────────────────────────────────────────
+memory_hits = metrics.counter("prediction_cache_memory_hits_total", "Hits served from the in-process LRU")
+db_hits     = metrics.counter("prediction_cache_db_hits_total", "Hits served from the prediction_cache table")
+misses      = metrics.counter("prediction_cache_misses_total", "Lookups that required inference")
+
+_lru: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+_table_ready = False
+
+
+# ──────────────────────────────────────────────────────
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_version() -> str | None:
+    """Model weights + threshold (+ TTA setup); None when the model file is unavailable."""
+
+    from backend.services import tta
+    from backend.services.ai_service import CONFIDENCE_THRESHOLD
+
+    try:
+        model = model_registry.model_version()
+        tta_tag = tta.config_tag()
+    except (OSError, KeyError):
+        return None
+    version = f"{model}:{CONFIDENCE_THRESHOLD}"
+    return f"{version}:{tta_tag}" if tta_tag else version
+
+
+def _ensure_table():
+    global _table_ready
+    if not _table_ready:
+        PredictionCacheEntry.__table__.create(bind=engine, checkfirst=True)
+        _table_ready = True
+
+
+def _remember(key: tuple, result: dict):
+    with _lock:
+        _lru[key] = result
+        _lru.move_to_end(key)
+        while len(_lru) > PREDICTION_CACHE_SIZE:
+            _lru.popitem(last=False)
+
+
+# ──────────────────────────────────────────────────────
+def get(digest: str) -> dict | None:
+    if not PREDICTION_CACHE_ENABLED:
+        return None
+
+    version = cache_version()
+    if version is None:
+        return None
+
+    key = (digest, version)
+
+    with _lock:
+        result = _lru.get(key)
+        if result is not None:
+            _lru.move_to_end(key)
+
+    if result is not None:
+        memory_hits.inc()
+        return {**result, "cached": True}
+
+    _ensure_table()
+    db = SessionLocal()
+    try:
+        entry = db.query(PredictionCacheEntry).filter(
+            PredictionCacheEntry.content_hash == digest,
+            PredictionCacheEntry.cache_version == version
+        ).first()
+    finally:
+        db.close()
+
+    if entry is None:
+        misses.inc()
+        return None
+
+    result = json.loads(entry.result)
+    _remember(key, result)
+    db_hits.inc()
+    return {**result, "cached": True}
+
+
+def put(digest: str, result: dict):
+    if not PREDICTION_CACHE_ENABLED:
+        return
+
+    version = cache_version()
+    if version is None:
+        return
+
+    result = {k: v for k, v in result.items() if k != "cached"}
+    _remember((digest, version), result)
+
+    _ensure_table()
+    db = SessionLocal()
+    try:
+        db.merge(PredictionCacheEntry(
+            content_hash=digest,
+            cache_version=version,
+            result=json.dumps(result),
+        ))
+        db.commit()
+    except Exception:
+        # A lost cache write only costs a future re-inference
+        db.rollback()
+        logger.exception("[AI] prediction cache write failed")
+    finally:
+        db.close()
+
+
+def put_many(entries: list[tuple[str, dict]]):
+    """put() for many (digest, result) pairs in one transaction (bulk re-scoring)."""
+
+    if not PREDICTION_CACHE_ENABLED or not entries:
+        return
+
+    version = cache_version()
+    if version is None:
+        return
+
+    _ensure_table()
+    db = SessionLocal()
+    try:
+        # deduplicated scans share a digest: one row each
+        for digest, result in dict(entries).items():
+            result = {k: v for k, v in result.items() if k != "cached"}
+            _remember((digest, version), result)
+            db.merge(PredictionCacheEntry(content_hash=digest, cache_version=version, result=json.dumps(result)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("[AI] prediction cache bulk write failed")
+    finally:
+        db.close()
+
+
+def purge_stale() -> int:
+    """Delete persisted entries written under any other cache version."""
+
+    version = cache_version()
+    if version is None:
+        return 0
+
+    _ensure_table()
+    db = SessionLocal()
+    try:
+        deleted = db.query(PredictionCacheEntry).filter(
+            PredictionCacheEntry.cache_version != version
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    with _lock:
+        for key in [k for k in _lru if k[1] != version]:
+            del _lru[key]
+
+    return deleted
+
+
+def stats() -> dict:
+    hits = memory_hits.value + db_hits.value
+    lookups = hits + misses.value
+    return {
+        "enabled": PREDICTION_CACHE_ENABLED,
+        "version": cache_version(),
+        "memory_entries": len(_lru),
+        "memory_capacity": PREDICTION_CACHE_SIZE,
+        "memory_hits": memory_hits.value,
+        "db_hits": db_hits.value,
+        "misses": misses.value,
+        "hit_rate": hits / lookups if lookups else None,
+    }
@@ -0,0 +1,134 @@
+# backend/services/preprocessing.py
+"""
+Allocation-light image preprocessing for inference.
+
+Pipeline per image:
+    bytes ──imdecode──▶ uint8/uint16 (1, 3 or 4 channels, native size)
+          ──resize────▶ model size, still in the native channel count
+          ──normalise─▶ written straight into a slot of a preallocated
+                        float32 batch buffer (BGR→RGB and grey→RGB are
+                        done by the same write, no intermediate copies)
+
+Compared with imread → cvtColor → resize → astype/255 → expand_dims this
+skips the colour-converted full-size copy, the float32 temporary and the
+batch-dimension copy, and single-channel X-rays are resized as one plane
+instead of three.
+"""
+
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from backend.services import metrics
+
+# Shared with ai_service (decode / predict / postprocess)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+stage_seconds = metrics.histogram(
+    "ai_stage_seconds", "Inference pipeline time per stage (per image, per batch for predict)",
+    buckets=STAGE_BUCKETS, labels=("stage",),
+)
+resize_seconds    = stage_seconds.labels("resize")
+normalise_seconds = stage_seconds.labels("normalise")
+
+
+def decode(data) -> np.ndarray:
+    """Decode an encoded image (bytes, bytearray, memoryview or uint8 array) without touching disk."""
+
+    buf = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.uint8)
+
+    # ANYCOLOR keeps grey scans single-channel; unlike IMREAD_UNCHANGED it
+    # still applies EXIF orientation, matching the old imread(IMREAD_COLOR).
+    img = cv2.imdecode(buf, cv2.IMREAD_ANYCOLOR | cv2.IMREAD_ANYDEPTH)
+
+    if img is None:
+        raise ValueError("OpenCV cannot decode image bytes")
+
+    return img
+
+
+def read_bytes(path: str) -> np.ndarray:
+    """Read a file once into a uint8 array (usable for both hashing and decoding)."""
+    return np.fromfile(path, dtype=np.uint8)
+
+
+def _scale_for(img: np.ndarray) -> float:
+    if img.dtype == np.uint8:
+        return 1.0 / 255.0
+    if img.dtype == np.uint16:
+        return 1.0 / 65535.0
+    raise ValueError(f"Unsupported image dtype: {img.dtype}")
+
+
+def preprocess_into(img: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Resize a decoded image to out's HxW and write the normalised RGB result
+    into out (float32, HxWx3) in place.
+    """
+
+    height, width = out.shape[:2]
+    scale = _scale_for(img)
+
+    # Resize first, in the native channel count (1 plane for grey X-rays)
+    started = time.perf_counter()
+    if img.shape[0] != height or img.shape[1] != width:
+        img = cv2.resize(img, (width, height))
+    resized = time.perf_counter()
+    resize_seconds.observe(resized - started)
+
+    if img.ndim == 2:
+        img = img[..., np.newaxis]
+
+    if img.shape[2] < 3:
+        # grey → RGB by broadcasting the single plane over 3 output channels
+        np.multiply(img[..., :1], np.float32(scale), out=out, dtype=np.float32, casting="unsafe")
+    else:
+        # BGR(A) → RGB via a reversed channel view, alpha dropped
+        np.multiply(img[..., 2::-1], np.float32(scale), out=out, dtype=np.float32, casting="unsafe")
+
+    normalise_seconds.observe(time.perf_counter() - resized)
+    return out
+
+
+def preprocess(img: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Standalone variant that allocates its own HxWx3 float32 output."""
+    return preprocess_into(img, np.empty((height, width, 3), dtype=np.float32))
+
+
+class BatchBuffer:
+    """Preallocated float32 batch tensor reused across batches."""
+
+    def __init__(self, capacity: int, height: int, width: int, channels: int = 3):
+        self.capacity = capacity
+        self.array = np.empty((capacity, height, width, channels), dtype=np.float32)
+
+    @property
+    def shape(self) -> tuple:
+        return self.array.shape[1:]
+
+    def ensure(self, size: int):
+        if size > self.capacity:
+            self.capacity = size
+            self.array = np.empty((size, *self.shape), dtype=np.float32)
+
+    def slot(self, i: int) -> np.ndarray:
+        return self.array[i]
+
+    def view(self, n: int) -> np.ndarray:
+        """First n rows, no copy."""
+        return self.array[:n]
+
+
+_local = threading.local()
+
+
+def get_buffer(capacity: int, height: int, width: int, channels: int = 3) -> BatchBuffer:
+    """Per-thread BatchBuffer (one per worker/dispatcher thread), grown as needed."""
+
+    buf = getattr(_local, "buffer", None)
+    if buf is None or buf.shape != (height, width, channels):
+        buf = BatchBuffer(capacity, height, width, channels)
+        _local.buffer = buf
+    buf.ensure(capacity)
+    return buf
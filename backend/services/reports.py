@@ -0,0 +1,327 @@
+# backend/services/reports.py
+"""
+PDF report rendering off the request path, with rendered files cached.
+
+WeasyPrint rendering is CPU-bound (hundreds of ms per report), so reports
+are rendered in a dedicated spawn-context process pool (REPORT_WORKERS).
+Each worker compiles the Jinja template once, in its initializer.
+
+Rendered PDFs are stored in blob storage under
+
+    reports/cache/<scan id>/<content version>.pdf
+
+where the content version hashes everything that appears in the report
+(scan fields, patient details, scan image key, template). Repeat downloads
+of an unchanged report are served from that file; editing the notes or the
+template produces a new version. The report date printed is that of the
+first render — the report as issued.
+
+The scan is embedded as its report-resolution JPEG derivative
+(services.derivatives), referenced by file path or presigned URL rather
+than inlined as base64: WeasyPrint copies the JPEG stream into the PDF
+as-is instead of re-encoding a multi-megabyte original.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import multiprocessing as mp
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.services import derivatives, metrics, tracing
+from backend.services.blob_storage import get_store
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+REPORT_WORKERS      = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_CACHE_PREFIX = os.getenv("REPORT_CACHE_PREFIX", "reports/cache")
+TEMPLATES_DIR       = Path(__file__).resolve().parent.parent / "templates"
+TEMPLATE_NAME       = "report_template.html"
+
+# Bump when the context building below changes what a report looks like
+RENDERER_VERSION = "2"
+
+# ── Metrics ───────────────────────────────────────────
+render_seconds = metrics.histogram("report_render_seconds", "Template + WeasyPrint time per rendered report")
+job_seconds    = metrics.histogram("report_job_seconds", "Queue wait + render + store time per report request")
+cache_hits     = metrics.counter("report_cache_hits_total", "Reports served from an already rendered PDF")
+renders        = metrics.counter("report_renders_total", "Reports rendered")
+failures       = metrics.counter("report_failures_total", "Report renders that raised")
+in_flight      = metrics.gauge("report_jobs_in_flight", "Reports being rendered or waiting for a worker")
+queue_depth    = metrics.gauge("report_queue_depth", "Reports waiting for a free render worker")
+
+
+# ──────────────────────────────────────────────────────
+# Snapshot + content version (API process)
+# ──────────────────────────────────────────────────────
+
+def report_snapshot(scan, patient) -> dict:
+    """Plain, picklable copy of everything the report shows."""
+
+    return {
+        "scan_id": scan.id,
+        "patient_id": scan.patient_id,
+        "file_path": scan.file_path,
+        "prediction": scan.prediction,
+        "confidence": scan.confidence,
+        "doctor_notes": scan.doctor_notes,
+        "pharmacist_notes": scan.pharmacist_notes,
+        "created_at": scan.created_at.isoformat() if scan.created_at else None,
+        "patient_name": patient.name if patient else None,
+        "patient_email": patient.email if patient else None,
+    }
+
+
+_template_digest: str | None = None
+
+
+def template_digest() -> str:
+    global _template_digest
+    if _template_digest is None:
+        _template_digest = hashlib.sha256((TEMPLATES_DIR / TEMPLATE_NAME).read_bytes()).hexdigest()
+    return _template_digest
+
+
+def content_version(snapshot: dict) -> str:
+    payload = json.dumps(snapshot, sort_keys=True, default=str)
+    renderer = f"{RENDERER_VERSION}:{derivatives.REPORT_IMAGE_MAX_EDGE}:{template_digest()}"
+    return hashlib.sha256(f"{renderer}:{payload}".encode()).hexdigest()[:32]
+
+
+def report_key(snapshot: dict) -> str:
+    return f"{REPORT_CACHE_PREFIX}/{snapshot['scan_id']}/{content_version(snapshot)}.pdf"
+
+
+def attachment_name(snapshot: dict) -> str:
+    return f"Report_Scan_{snapshot['scan_id']}_P{str(snapshot['patient_id']).zfill(6)}.pdf"
+
+
+# ──────────────────────────────────────────────────────
+# Rendering (worker processes)
+# ──────────────────────────────────────────────────────
+
+_template = None
+
+
+def _init_worker():
+    """Pool initializer: compile the template once per worker process."""
+
+    global _template
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=select_autoescape(["html"]))
+    _template = env.get_template(TEMPLATE_NAME)
+
+
+def _risk_level(prediction: str | None, confidence: float | None) -> str:
+    if not prediction or prediction == "Normal":
+        return "Low"
+    return "High" if (confidence or 0) >= 0.75 else "Moderate"
+
+
+def scan_image_url(file_path: str) -> str | None:
+    """URL WeasyPrint can load the report-resolution scan image from."""
+
+    digest = derivatives.generate(file_path)
+    key = derivatives.key_for(digest, "report", "jpeg")
+    store = get_store()
+    path = store.local_path(key)
+    return path.as_uri() if path is not None else store.presigned_url(key)
+
+
+def build_context(snapshot: dict) -> dict:
+    created = datetime.fromisoformat(snapshot["created_at"]) if snapshot["created_at"] else None
+    now = datetime.now()
+    prediction = snapshot["prediction"] or "Pending"
+    confidence = snapshot["confidence"]
+
+    image_url = None
+    try:
+        image_url = scan_image_url(snapshot["file_path"])
+    except (FileNotFoundError, ValueError):
+        logger.warning(f"[REPORT] scan image {snapshot['file_path']} not available")
+
+    return {
+        "report_id": f"RPT-{snapshot['scan_id']:06d}",
+        "report_date": now.strftime("%d %b %Y"),
+        "report_time": now.strftime("%H:%M"),
+        "hospital": "Clinical Scan Support System",
+        "department": "Radiology",
+        "patient_name": snapshot["patient_name"] or "—",
+        "patient_id": f"P-{str(snapshot['patient_id']).zfill(6)}",
+        "email": snapshot["patient_email"] or "—",
+        "age": "—", "gender": "—", "dob": "—", "blood_group": "—",
+        "phone": "—", "address": "—", "emergency_contact": "—", "insurance": "—",
+        "scan_id": snapshot["scan_id"],
+        "scan_type": "Chest X-Ray",
+        "body_part": "Chest",
+        "scan_date": created.strftime("%d %b %Y") if created else "—",
+        "scan_time": created.strftime("%H:%M") if created else "—",
+        "machine": "—", "technician": "—", "contrast_used": "No",
+        "scan_quality": "Diagnostic",
+        "priority": "Routine",
+        "clinical_indication": "—",
+        "referring_doctor": "—",
+        "doctor_name": "—",
+        "doctor_qualification": "",
+        "pharmacist_name": "—",
+        "prediction": prediction,
+        "confidence": f"{confidence * 100:.2f}%" if confidence is not None else "—",
+        "risk_level": _risk_level(snapshot["prediction"], confidence),
+        "ai_model": "MobileNetV2",
+        "ai_version": Path(os.getenv("AI_MODEL_PATH", "models/lung_model.h5")).name,
+        "processing_time": "—",
+        "doctor_notes": snapshot["doctor_notes"] or "—",
+        "impression": (
+            "No acute cardiopulmonary abnormality detected."
+            if prediction == "Normal"
+            else f"Findings suggestive of {prediction.replace('_', ' ')}; clinical correlation advised."
+        ),
+        "recommendations": (
+            ["Routine follow-up as clinically indicated."]
+            if prediction == "Normal"
+            else ["Clinical correlation with symptoms and history.", "Follow-up imaging as advised by the treating physician."]
+        ),
+        "prescription": snapshot["pharmacist_notes"],
+        "scan_image_url": image_url,
+    }
+
+
+def render_pdf(snapshot: dict) -> bytes:
+    if _template is None:
+        _init_worker()
+    from weasyprint import HTML
+
+    return HTML(string=_template.render(**build_context(snapshot))).write_pdf()
+
+
+def render_to_store(snapshot: dict, key: str) -> dict:
+    """Worker entry point: render unless key already exists, then store it."""
+
+    store = get_store()
+    if store.exists(key):
+        return {"key": key, "cached": True}
+
+    # wall-clock times, so the API process can trace the steps taken here
+    started_ns = time.time_ns()
+    pdf = render_pdf(snapshot)
+    rendered_ns = time.time_ns()
+
+    store.put_bytes(key, pdf, content_type="application/pdf")
+    return {
+        "key": key,
+        "cached": False,
+        "render_seconds": (rendered_ns - started_ns) / 1e9,
+        "bytes": len(pdf),
+        "started_ns": started_ns,
+        "rendered_ns": rendered_ns,
+        "stored_ns": time.time_ns(),
+    }
+
+
+# ──────────────────────────────────────────────────────
+# Pool + single-flight (API process)
+# ──────────────────────────────────────────────────────
+
+_pool: ProcessPoolExecutor | None = None
+_pending: dict[str, asyncio.Future] = {}
+_background: set[asyncio.Task] = set()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+async def ensure_report(snapshot: dict) -> str:
+    """Blob key of the rendered PDF for snapshot, rendering it if needed."""
+
+    key = report_key(snapshot)
+    store = get_store()
+
+    with tracing.span("report.ensure", scan_id=snapshot["scan_id"]) as span:
+        if await asyncio.to_thread(store.exists, key):
+            cache_hits.inc()
+            span.set_attribute("cached", True)
+            return key
+
+        # concurrent requests for the same report share one render
+        pending = _pending.get(key)
+        if pending is not None:
+            span.set_attribute("shared", True)
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _pending[key] = future
+        started = loop.time()
+        submitted_ns = time.time_ns()
+        in_flight.inc()
+        queue_depth.set(max(0, in_flight.value - REPORT_WORKERS))
+        try:
+            result = await loop.run_in_executor(get_pool(), render_to_store, snapshot, key)
+            span.set_attribute("cached", result["cached"])
+            if result["cached"]:
+                cache_hits.inc()
+            else:
+                renders.inc()
+                render_seconds.observe(result["render_seconds"])
+                # the render process reports when each of its steps happened
+                tracing.record("report.pool_wait", submitted_ns, result["started_ns"])
+                tracing.record("weasyprint.render", result["started_ns"], result["rendered_ns"], bytes=result["bytes"])
+                tracing.record("report.store", result["rendered_ns"], result["stored_ns"])
+            future.set_result(key)
+            return key
+        except BaseException as e:
+            failures.inc()
+            future.set_exception(e)
+            future.exception()              # consumed here if nobody else waits
+            raise
+        finally:
+            _pending.pop(key, None)
+            in_flight.dec()
+            queue_depth.set(max(0, in_flight.value - REPORT_WORKERS))
+            job_seconds.observe(loop.time() - started)
+
+
+def submit(coro) -> asyncio.Task:
+    """Run a report coroutine in the background, keeping a reference to it."""
+
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def warm_pool():
+    """Start the render workers (and compile their templates) up front."""
+
+    pool = get_pool()
+    for future in [pool.submit(os.getpid) for _ in range(REPORT_WORKERS)]:
+        future.result()
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def stats() -> dict:
+    return {
+        "workers": REPORT_WORKERS,
+        **metrics.snapshot(prefix="report_"),
+    }
@@ -0,0 +1,277 @@
+# backend/services/rescoring.py
+"""
+Bulk re-scoring of stored scans after a model change.
+
+Every prediction records the model_version that produced it
+(model_registry.model_version(): a hash of the weights and runtime).
+rescore() streams the scans whose prediction came from another model, or
+from before versions were recorded, in id order and chunk_size rows at a
+time. For each chunk:
+
+    fetch + decode  on a thread pool (blob reads and OpenCV release the
+                    GIL) straight into one of two preallocated batch
+                    buffers, so batch n+1 is decoded while batch n runs
+    inference       one forward pass per batch_size scans
+    write-back      prediction, confidence and model_version for the whole
+                    chunk in one executemany UPDATE, the prediction cache
+                    entries in one transaction, then the checkpoint
+
+The checkpoint (last scan id written, per model version and status
+filter) lets an interrupted run resume where it stopped. A run for
+another model version starts over. Only the AI fields change: status and
+notes are left alone, no status events are published, and issued report
+PDFs pick up the new prediction as a new content version.
+
+    python -m backend.manage_scans rescore [--chunk-size 512] [--batch-size 32] [--decode-workers 8]
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.schema import Scan
+from backend.services import ai_service, cas, model_registry, prediction_cache, preprocessing
+from backend.services.blob_storage import get_store
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+RESCORE_CHUNK_SIZE     = int(os.getenv("RESCORE_CHUNK_SIZE", "512"))
+RESCORE_BATCH_SIZE     = int(os.getenv("RESCORE_BATCH_SIZE", "32"))
+RESCORE_DECODE_WORKERS = int(os.getenv("RESCORE_DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+RESCORE_CHECKPOINT     = os.getenv("RESCORE_CHECKPOINT", "database/rescore_checkpoint.json")
+
+
+# ──────────────────────────────────────────────────────
+# Checkpoint
+# ──────────────────────────────────────────────────────
+
+def load_checkpoint(path: str, model_version: str, statuses: list[str] | None) -> dict | None:
+    """The saved state for this model version and filter, if there is one."""
+
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if state.get("model_version") != model_version or state.get("statuses") != statuses:
+        return None
+    return state
+
+
+def save_checkpoint(path: str, state: dict):
+    # written beside the target and renamed: a crash never leaves half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({**state, "updated_at": datetime.utcnow().isoformat()}, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ──────────────────────────────────────────────────────
+# Scoring
+# ──────────────────────────────────────────────────────
+
+def stale_scans(db: Session, model_version: str, after_id: int, limit: int, statuses: list[str] | None = None):
+    """Next chunk of (id, file_path, prediction) rows scored by another model."""
+
+    query = (
+        select(Scan.id, Scan.file_path, Scan.prediction)
+        .where(
+            Scan.id > after_id,
+            Scan.prediction.is_not(None),
+            or_(Scan.model_version.is_(None), Scan.model_version != model_version),
+        )
+        .order_by(Scan.id)
+        .limit(limit)
+    )
+    if statuses:
+        query = query.where(Scan.status.in_(statuses))
+    return db.execute(query).all()
+
+
+def _fetch_decode(key: str, out) -> str:
+    """Read one scan and decode it into a batch slot; returns its content hash."""
+
+    data = get_store().get(key)
+    digest = cas.digest_from_path(key) or prediction_cache.content_hash(data)
+    ai_service.decode_into(data, out)
+    return digest
+
+
+class ChunkScorer:
+    """Decode-ahead batched inference over chunks of scan rows."""
+
+    def __init__(self, batch_size: int, decode_workers: int):
+        loaded = model_registry.get_model()
+        self.batch_size = batch_size
+        self.pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="rescore-decode")
+        self.buffers = [
+            preprocessing.BatchBuffer(batch_size, loaded.height, loaded.width, loaded.channels)
+            for _ in range(2)
+        ]
+        self.decode_wait_seconds = 0.0
+        self.inference_seconds = 0.0
+
+    def _submit(self, batch: list, buffer: preprocessing.BatchBuffer) -> list:
+        return [self.pool.submit(_fetch_decode, row.file_path, buffer.slot(i)) for i, row in enumerate(batch)]
+
+    def score(self, rows: list) -> tuple[list, list]:
+        """Returns ([(row, digest, result)], [(scan id, error)])."""
+
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        scored, failed = [], []
+
+        pending = self._submit(batches[0], self.buffers[0]) if batches else []
+        for n, batch in enumerate(batches):
+            buffer = self.buffers[n % 2]
+
+            started = time.perf_counter()
+            decoded = []
+            for i, (row, future) in enumerate(zip(batch, pending)):
+                try:
+                    decoded.append((i, row, future.result()))
+                except Exception as e:
+                    failed.append((row.id, str(e)))
+            self.decode_wait_seconds += time.perf_counter() - started
+
+            # decode the next batch into the other buffer while this one runs
+            if n + 1 < len(batches):
+                pending = self._submit(batches[n + 1], self.buffers[(n + 1) % 2])
+
+            if not decoded:
+                continue
+
+            started = time.perf_counter()
+            try:
+                # failed slots hold stale pixels; their results are dropped
+                results = ai_service.predict_array(buffer.view(len(batch)))
+            except Exception as e:
+                failed.extend((row.id, str(e)) for _, row, _ in decoded)
+                continue
+            finally:
+                self.inference_seconds += time.perf_counter() - started
+
+            scored.extend((row, digest, results[i]) for i, row, digest in decoded)
+
+        return scored, failed
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+def write_back(db: Session, scored: list, model_version: str):
+    """One executemany UPDATE for the chunk, then its prediction cache entries."""
+
+    if not scored:
+        return
+    db.execute(update(Scan), [
+        {
+            "id": row.id,
+            "prediction": result["label"],
+            "confidence": result["confidence"],
+            "model_version": model_version,
+        }
+        for row, _, result in scored
+    ])
+    db.commit()
+    prediction_cache.put_many([(digest, result) for _, digest, result in scored])
+
+
+# ──────────────────────────────────────────────────────
+# Driver
+# ──────────────────────────────────────────────────────
+
+def rescore(
+    db: Session,
+    chunk_size: int = RESCORE_CHUNK_SIZE,
+    batch_size: int = RESCORE_BATCH_SIZE,
+    decode_workers: int = RESCORE_DECODE_WORKERS,
+    checkpoint_path: str = RESCORE_CHECKPOINT,
+    statuses: list[str] | None = None,
+    restart: bool = False,
+    limit: int | None = None,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Re-score every scan predicted by another model. dry_run scores without
+    writing anything (with limit, a quick throughput sample).
+    """
+
+    model_version = model_registry.model_version()
+    state = None if restart or dry_run else load_checkpoint(checkpoint_path, model_version, statuses)
+    resumed_from = state["last_id"] if state else None
+    state = state or {
+        "model_version": model_version,
+        "statuses": statuses,
+        "last_id": 0,
+        "rescored": 0,
+        "changed": 0,
+        "failed": 0,
+        "seconds": 0.0,
+    }
+
+    scorer = ChunkScorer(batch_size, decode_workers)
+    started = time.perf_counter()
+    run_scored, run_failed, failed_ids, write_seconds = 0, 0, [], 0.0
+
+    try:
+        while limit is None or run_scored + run_failed < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - run_scored - run_failed)
+            rows = stale_scans(db, model_version, state["last_id"], size, statuses)
+            if not rows:
+                break
+
+            scored, failed = scorer.score(rows)
+
+            write_started = time.perf_counter()
+            if not dry_run:
+                write_back(db, scored, model_version)
+            write_seconds += time.perf_counter() - write_started
+
+            run_scored += len(scored)
+            run_failed += len(failed)
+            failed_ids.extend(scan_id for scan_id, _ in failed)
+            for scan_id, error in failed:
+                logger.warning(f"[RESCORE] scan {scan_id}: {error}")
+
+            state["last_id"] = rows[-1].id
+            state["rescored"] += len(scored)
+            state["changed"] += sum(1 for row, _, result in scored if row.prediction != result["label"])
+            state["failed"] += len(failed)
+            if not dry_run:
+                save_checkpoint(checkpoint_path, {**state, "seconds": state["seconds"] + time.perf_counter() - started})
+
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"[RESCORE] up to scan {state['last_id']}: {run_scored} scored this run, "
+                f"{run_scored / elapsed:.1f} scans/s"
+            )
+    finally:
+        scorer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "model_version": model_version,
+        "dry_run": dry_run,
+        "resumed_from_id": resumed_from,
+        "last_id": state["last_id"],
+        "rescored": run_scored,
+        "failed": run_failed,
+        "failed_scan_ids": failed_ids[:100],
+        "total_rescored": state["rescored"],
+        "total_changed": state["changed"],
+        "seconds": elapsed,
+        "scans_per_second": run_scored / elapsed if elapsed else None,
+        "decode_wait_seconds": scorer.decode_wait_seconds,
+        "inference_seconds": scorer.inference_seconds,
+        "write_seconds": write_seconds,
+        "batch_size": batch_size,
+        "decode_workers": decode_workers,
+    }
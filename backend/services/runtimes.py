@@ -0,0 +1,90 @@
+# backend/services/runtimes.py
+"""
+Inference runtimes that expose the small surface model_registry relies on
+from a Keras model: `input_shape` and `predict(batch, verbose=0)`.
+"""
+
+import threading
+
+import numpy as np
+
+
+class GraphModel:
+    """Keras model wrapped in a traced tf.function (optionally XLA-compiled)."""
+
+    def __init__(self, keras_model, jit_compile: bool = False):
+        import tensorflow as tf
+
+        self._model = keras_model
+        self.input_shape = keras_model.input_shape
+        self._fn = tf.function(
+            lambda x: keras_model(x, training=False),
+            jit_compile=jit_compile,
+            reduce_retracing=True,
+        )
+
+    @property
+    def keras_model(self):
+        return self._model
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self._fn(batch).numpy()
+
+
+class TFLiteModel:
+    """
+    TFLite interpreter wrapper. Handles dynamic batch sizes and full-INT8
+    models whose input/output tensors are quantized.
+    """
+
+    def __init__(self, path: str, num_threads: int | None = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.path = path
+        self._interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._lock = threading.Lock()   # interpreters are not thread-safe
+
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+
+        shape = self._input["shape"]
+        self.input_shape = (None, int(shape[1]), int(shape[2]), int(shape[3]))
+
+    def _resize(self, batch_size: int):
+        if batch_size == self._batch_size:
+            return
+        shape = [batch_size, *self.input_shape[1:]]
+        self._interpreter.resize_tensor_input(self._input["index"], shape)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input["quantization"]
+        info = np.iinfo(dtype)
+        q = np.round(batch / scale + zero_point)
+        return np.clip(q, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, out: np.ndarray) -> np.ndarray:
+        if out.dtype == np.float32:
+            return out
+        scale, zero_point = self._output["quantization"]
+        return (out.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        with self._lock:
+            self._resize(len(batch))
+            self._interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self._interpreter.invoke()
+            out = self._interpreter.get_tensor(self._output["index"])
+        return self._dequantize(out).copy()
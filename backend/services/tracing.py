@@ -0,0 +1,642 @@
+# backend/services/tracing.py
+"""
+Request tracing: where the time between an upload and REPORT_READY went.
+
+Spans follow the OpenTelemetry data model (128-bit trace ids, 64-bit span
+ids, parent links, kind, start/end in unix nanoseconds, attributes, events,
+status) and context crosses process boundaries as a W3C traceparent
+(00-<trace id>-<span id>-<flags>), so traces join up with OTel-instrumented
+clients and collectors:
+
+    HTTP      TracingMiddleware continues an incoming traceparent header
+              (or starts a trace) with one SERVER span per request; the
+              response carries X-Trace-Id
+    AI jobs   enqueue_analysis() stores the caller's traceparent on the
+              job row; the worker process that claims the job records its
+              queue wait, fetch + decode, the batched TensorFlow pass and
+              the commit under it
+    email     queue_email() stores it on the outbox row; sender threads
+              record the queue wait, the attachment fetch and the SMTP send
+    reports   the render pool returns the wall-clock times of its steps,
+              recorded in the API process as pool wait / weasyprint.render
+              / store spans
+    tasks     reports.submit() and derivatives.schedule() tasks, and calls
+              on the blocking executor, run in a copy of the caller's
+              context, so their spans land in the request's trace
+
+Finished spans are queued and written by a background thread every
+TRACE_FLUSH_SECONDS, one JSON object per line, to TRACE_EXPORT_PATH (the
+API and worker processes append to the same file) and, when
+TRACE_OTLP_ENDPOINT is set, POSTed as OTLP/HTTP JSON to a collector
+(e.g. http://localhost:4318/v1/traces). No collector is needed to look at
+them:
+
+    python -m backend.services.tracing summary [--path logs/traces.jsonl]
+    python -m backend.services.tracing show <trace id>
+
+TRACE_SAMPLE_RATIO keeps that fraction of new traces, decided from the
+trace id so every process agrees; a sampled flag from upstream is
+honoured. With TRACING_ENABLED=false every span is a shared no-op.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import socket
+import logging
+import argparse
+import threading
+import contextvars
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+from backend.services import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+TRACING_ENABLED     = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_SAMPLE_RATIO  = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_PATH   = os.getenv("TRACE_EXPORT_PATH", "logs/traces.jsonl")     # empty = no file
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "1"))
+TRACE_MAX_QUEUE     = int(os.getenv("TRACE_MAX_QUEUE", "10000"))
+TRACE_EXCLUDE_PATHS = {p.strip() for p in os.getenv("TRACE_EXCLUDE_PATHS", "/metrics").split(",") if p.strip()}
+SERVICE_NAME        = os.getenv("OTEL_SERVICE_NAME", "csss-backend")
+
+RESOURCE = {"service.name": SERVICE_NAME, "host.name": socket.gethostname(), "process.pid": os.getpid()}
+
+# OTLP enum values
+KINDS         = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+STATUS_CODES  = {"UNSET": 0, "OK": 1, "ERROR": 2}
+
+# ── Metrics ───────────────────────────────────────────
+exported = metrics.counter("trace_spans_exported_total", "Spans written by the trace exporter")
+dropped  = metrics.counter("trace_spans_dropped_total", "Spans dropped because the export queue was full")
+
+
+# ──────────────────────────────────────────────────────
+# Spans
+# ──────────────────────────────────────────────────────
+
+class SpanContext(NamedTuple):
+    """A remote parent, as carried by a traceparent."""
+
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def parse_traceparent(value: str | None) -> SpanContext | None:
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or parts[0] == "ff" or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    """One timed operation; exported when it ends (if its trace is sampled)."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id", "kind", "start_ns", "end_ns",
+        "attributes", "events", "status", "status_message", "sampled",
+    )
+
+    def __init__(self, name, trace_id, span_id, parent_span_id, kind, start_ns, attributes, sampled):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.attributes = attributes
+        self.events = []
+        self.status = "UNSET"
+        self.status_message = None
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        if self.sampled:
+            self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def set_error(self, message: str):
+        self.status = "ERROR"
+        self.status_message = message[:500]
+
+    def record_exception(self, error: BaseException):
+        self.set_error(f"{type(error).__name__}: {error}")
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+
+    def end(self, end_ns: int | None = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if self.sampled:
+            _enqueue(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": {"code": self.status, "message": self.status_message},
+            "attributes": self.attributes,
+            "events": self.events,
+            "resource": RESOURCE,
+        }
+
+
+class _NoopSpan:
+    """What every call returns while tracing is off."""
+
+    name = trace_id = span_id = parent_span_id = traceparent = start_ns = end_ns = None
+    sampled = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+    def end(self, end_ns=None):
+        pass
+
+
+NOOP = _NoopSpan()
+
+_CURRENT = object()         # parent=_CURRENT: the span current in this context
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("csss_current_span", default=None)
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def current_traceparent() -> str | None:
+    """Context to store with queued work, so its consumer continues this trace."""
+
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+def annotate(**attributes):
+    """Set attributes on the current span (e.g. ids learnt halfway through a request)."""
+
+    span = _current.get()
+    if span is not None:
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+
+
+def _sampled(trace_id: str) -> bool:
+    return TRACE_SAMPLE_RATIO >= 1.0 or int(trace_id[16:], 16) < TRACE_SAMPLE_RATIO * 2 ** 64
+
+
+def start_span(
+    name: str,
+    attributes: dict | None = None,
+    *,
+    parent=_CURRENT,
+    kind: str = "internal",
+    start_ns: int | None = None,
+    **extra,
+) -> Span:
+    """
+    A started span that is not made current; end() it. parent is a Span, a
+    SpanContext, a traceparent string, None for a new trace, or (default)
+    the current span.
+    """
+
+    if not TRACING_ENABLED:
+        return NOOP
+    if parent is _CURRENT:
+        parent = _current.get()
+    elif isinstance(parent, str):
+        parent = parse_traceparent(parent)
+    elif parent is NOOP:
+        parent = None
+
+    if parent is None:
+        trace_id = f"{random.getrandbits(128):032x}"
+        sampled = _sampled(trace_id)
+    else:
+        trace_id = parent.trace_id
+        sampled = parent.sampled
+
+    return Span(
+        name,
+        trace_id,
+        f"{random.getrandbits(64):016x}",
+        parent.span_id if parent is not None else None,
+        kind,
+        start_ns or time.time_ns(),
+        {**(attributes or {}), **extra} if sampled else {},
+        sampled,
+    )
+
+
+@contextmanager
+def span(name: str, attributes: dict | None = None, *, parent=_CURRENT, kind: str = "internal", **extra):
+    """Time the block as a span, current inside it; an exception marks it failed."""
+
+    if not TRACING_ENABLED:
+        yield NOOP
+        return
+
+    s = start_span(name, attributes, parent=parent, kind=kind, **extra)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+@contextmanager
+def activate(s):
+    """Make an already started span current inside the block, without ending it."""
+
+    if s is None or s is NOOP:
+        yield s
+        return
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        _current.reset(token)
+
+
+def record(name: str, start_ns: int | None, end_ns: int | None, attributes: dict | None = None, *, parent=_CURRENT, **extra):
+    """A finished span for an interval measured elsewhere (another process, DB timestamps)."""
+
+    if not TRACING_ENABLED or start_ns is None or end_ns is None:
+        return NOOP
+    s = start_span(name, attributes, parent=parent, start_ns=start_ns, **extra)
+    s.end(max(end_ns, start_ns))
+    return s
+
+
+def unix_ns(moment: datetime | None) -> int | None:
+    """A naive UTC datetime (the timestamps in our tables) in unix nanoseconds."""
+
+    if moment is None:
+        return None
+    return int(moment.replace(tzinfo=timezone.utc).timestamp() * 1e9)
+
+
+# ──────────────────────────────────────────────────────
+# Export
+# ──────────────────────────────────────────────────────
+
+_queue: queue.Queue = queue.Queue(maxsize=TRACE_MAX_QUEUE)
+_exporter: threading.Thread | None = None
+_exporter_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def _enqueue(s: Span):
+    if _exporter is None:
+        _start_exporter()
+    try:
+        _queue.put_nowait(s)
+    except queue.Full:
+        dropped.inc()
+
+
+def _start_exporter():
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _stop.clear()
+            _exporter = threading.Thread(target=_run_exporter, name="trace-exporter", daemon=True)
+            _exporter.start()
+            atexit.register(shutdown)
+
+
+def _run_exporter():
+    while not _stop.wait(TRACE_FLUSH_SECONDS):
+        flush()
+    flush()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(records: list[dict]) -> dict:
+    """An OTLP/HTTP JSON ExportTraceServiceRequest for exported span records of this process."""
+
+    spans = []
+    for r in records:
+        status = {"code": STATUS_CODES[r["status"]["code"]]}
+        if r["status"]["message"]:
+            status["message"] = r["status"]["message"]
+        otlp = {
+            "traceId": r["trace_id"],
+            "spanId": r["span_id"],
+            "name": r["name"],
+            "kind": KINDS.get(r["kind"], 1),
+            "startTimeUnixNano": str(r["start_time_unix_nano"]),
+            "endTimeUnixNano": str(r["end_time_unix_nano"]),
+            "attributes": _otlp_attributes(r["attributes"]),
+            "events": [
+                {"name": e["name"], "timeUnixNano": str(e["time_unix_nano"]), "attributes": _otlp_attributes(e["attributes"])}
+                for e in r["events"]
+            ],
+            "status": status,
+        }
+        if r["parent_span_id"]:
+            otlp["parentSpanId"] = r["parent_span_id"]
+        spans.append(otlp)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(RESOURCE)},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+def _write_jsonl(records: list[dict]):
+    os.makedirs(os.path.dirname(TRACE_EXPORT_PATH) or ".", exist_ok=True)
+    data = "".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in records).encode()
+    # one O_APPEND write per batch, so processes sharing the file never interleave lines
+    fd = os.open(TRACE_EXPORT_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _post_otlp(records: list[dict]):
+    request = urllib.request.Request(
+        TRACE_OTLP_ENDPOINT,
+        data=json.dumps(to_otlp(records)).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        response.read()
+
+
+def flush():
+    """Export every queued span now (the exporter thread does this every TRACE_FLUSH_SECONDS)."""
+
+    with _flush_lock:
+        batch = []
+        while True:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+
+        records = [s.to_dict() for s in batch]
+        if TRACE_EXPORT_PATH:
+            try:
+                _write_jsonl(records)
+            except OSError as e:
+                logger.warning(f"[trace] cannot write {TRACE_EXPORT_PATH}: {e}")
+        if TRACE_OTLP_ENDPOINT:
+            try:
+                _post_otlp(records)
+            except Exception as e:
+                logger.warning(f"[trace] OTLP export to {TRACE_OTLP_ENDPOINT} failed: {e}")
+        exported.inc(len(records))
+
+
+def shutdown(timeout: float = 5.0):
+    """Stop the exporter after a last flush (also registered with atexit)."""
+
+    global _exporter
+    _stop.set()
+    if _exporter is not None:
+        _exporter.join(timeout)
+        _exporter = None
+    flush()
+
+
+# ──────────────────────────────────────────────────────
+# HTTP
+# ──────────────────────────────────────────────────────
+
+class TracingMiddleware:
+    """One SERVER span per HTTP request, continuing an incoming traceparent header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not TRACING_ENABLED or scope["type"] != "http" or scope["path"] in TRACE_EXCLUDE_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        from backend.services.http_metrics import route_template
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        method = scope["method"]
+        attributes = {"http.method": method, "http.target": scope["path"]}
+        with span(method, attributes, parent=parent, kind="server") as s:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    s.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        s.set_error(f"HTTP {status}")
+                    message["headers"] = [*message.get("headers", []), (b"x-trace-id", s.trace_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                # the router has put the matched route into scope by now
+                route = route_template(scope)
+                s.name = f"{method} {route}"
+                s.set_attribute("http.route", route)
+
+
+# ──────────────────────────────────────────────────────
+# Offline analysis
+# ──────────────────────────────────────────────────────
+
+def load(path: str = TRACE_EXPORT_PATH) -> list[dict]:
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue            # a line cut short by a crash
+    return records
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def summarize(records: list[dict]) -> list[dict]:
+    """Per span name: count, errors and duration percentiles, most total time first."""
+
+    by_name = defaultdict(list)
+    errors = defaultdict(int)
+    for r in records:
+        by_name[r["name"]].append(r["duration_ms"])
+        if r["status"]["code"] == "ERROR":
+            errors[r["name"]] += 1
+
+    rows = [
+        {
+            "name": name,
+            "count": len(durations),
+            "errors": errors[name],
+            "total_ms": sum(durations),
+            "mean_ms": sum(durations) / len(durations),
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "max_ms": max(durations),
+        }
+        for name, durations in by_name.items()
+    ]
+    return sorted(rows, key=lambda row: -row["total_ms"])
+
+
+def slowest_traces(records: list[dict], limit: int = 10) -> list[dict]:
+    """Traces by their extent (first span start to last span end)."""
+
+    traces = defaultdict(list)
+    for r in records:
+        traces[r["trace_id"]].append(r)
+
+    rows = []
+    for trace_id, spans in traces.items():
+        start = min(r["start_time_unix_nano"] for r in spans)
+        end = max(r["end_time_unix_nano"] for r in spans)
+        ids = {r["span_id"] for r in spans}
+        roots = [r for r in spans if r["parent_span_id"] not in ids]     # a remote parent counts as none
+        rows.append({
+            "trace_id": trace_id,
+            "root": min(roots, key=lambda r: r["start_time_unix_nano"])["name"] if roots else None,
+            "spans": len(spans),
+            "duration_ms": (end - start) / 1e6,
+        })
+    return sorted(rows, key=lambda row: -row["duration_ms"])[:limit]
+
+
+def waterfall(records: list[dict], trace_id: str) -> list[str]:
+    """The spans of one trace (an id prefix is enough) as an indented timeline."""
+
+    spans = [r for r in records if r["trace_id"].startswith(trace_id)]
+    if not spans:
+        return []
+
+    ids = {r["span_id"] for r in spans}
+    children = defaultdict(list)
+    roots = []
+    for r in sorted(spans, key=lambda r: r["start_time_unix_nano"]):
+        if r["parent_span_id"] in ids:
+            children[r["parent_span_id"]].append(r)
+        else:
+            roots.append(r)             # the root, or spans whose parent was not exported
+
+    origin = min(r["start_time_unix_nano"] for r in spans)
+    lines = [f"{'start ms':>10s} {'took ms':>10s}  span"]
+
+    def walk(r, depth):
+        offset = (r["start_time_unix_nano"] - origin) / 1e6
+        error = f"  ERROR {r['status']['message']}" if r["status"]["code"] == "ERROR" else ""
+        lines.append(f"{offset:10.1f} {r['duration_ms']:10.1f}  {'  ' * depth}{r['name']}{error}")
+        for child in children[r["span_id"]]:
+            walk(child, depth + 1)
+
+    for r in roots:
+        walk(r, 0)
+    return lines
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CSSS trace files")
+    parser.add_argument("--path", default=TRACE_EXPORT_PATH, help="JSONL written by the exporter")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="time per span name, and the slowest traces")
+    summary.add_argument("--slowest", type=int, default=10)
+    show = sub.add_parser("show", help="one trace as a timeline")
+    show.add_argument("trace_id")
+    args = parser.parse_args()
+
+    records = load(args.path)
+
+    if args.command == "show":
+        lines = waterfall(records, args.trace_id)
+        print("\n".join(lines) if lines else f"no spans of trace {args.trace_id} in {args.path}")
+    else:
+        print(f"{len(records)} spans in {args.path}\n")
+        print(f"{'span':36s} {'count':>7s} {'errors':>6s} {'total s':>9s} {'mean ms':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'max ms':>9s}")
+        for row in summarize(records):
+            print(
+                f"{row['name'][:36]:36s} {row['count']:7d} {row['errors']:6d} {row['total_ms'] / 1000:9.2f} "
+                f"{row['mean_ms']:9.1f} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['max_ms']:9.1f}"
+            )
+        print("\nslowest traces (`show <trace id>` for the timeline):")
+        for row in slowest_traces(records, args.slowest):
+            print(f"  {row['trace_id']}  {row['duration_ms']:10.1f} ms  {row['spans']:3d} spans  {row['root']}")
@@ -0,0 +1,268 @@
+# backend/services/tta.py
+"""
+Test-time augmentation (TTA) and checkpoint ensembling for low-confidence
+scans.
+
+A single forward pass decides most scans comfortably. Those below
+AI_TTA_CONFIDENCE_BELOW (by default the "Uncertain" threshold) are scored
+again and their class probabilities averaged over
+
+    views   the augmentations the model was trained with: horizontal
+            flip and small shifts (edges replicated, like fill_mode=
+            'nearest' in train_lung_model.py)
+    models  the serving model plus AI_ENSEMBLE_MODELS, e.g. the
+            lung_model_best.h5 checkpoint saved during training
+
+Every view of every low-confidence scan in a batch goes through one
+forward pass per model; the serving model's original pass is reused as
+its un-augmented view. AI_TTA_LATENCY_BUDGET_MS bounds the extra time a
+batch may spend: a pass whose estimated cost (from the observed per-row
+time of that model) does not fit is skipped, and the average is taken
+over the passes that ran.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+from backend.services import metrics, model_registry, preprocessing
+
+logger = logging.getLogger(__name__)
+
+# ── Config ────────────────────────────────────────────
+AI_TTA_ENABLED           = os.getenv("AI_TTA_ENABLED", "false").lower() == "true"
+AI_TTA_CONFIDENCE_BELOW  = float(os.getenv("AI_TTA_CONFIDENCE_BELOW", os.getenv("CONFIDENCE_THRESHOLD", "0.75")))
+AI_TTA_AUGMENTATIONS     = [a.strip() for a in os.getenv("AI_TTA_AUGMENTATIONS", "hflip,shift").split(",") if a.strip()]
+AI_TTA_SHIFT_FRACTION    = float(os.getenv("AI_TTA_SHIFT_FRACTION", "0.05"))
+AI_ENSEMBLE_MODELS       = [p.strip() for p in os.getenv("AI_ENSEMBLE_MODELS", "").split(",") if p.strip()]
+AI_TTA_LATENCY_BUDGET_MS = float(os.getenv("AI_TTA_LATENCY_BUDGET_MS", "250"))
+
+# ── Metrics ───────────────────────────────────────────
+scans_refined  = metrics.counter("tta_scans_total", "Low-confidence scans re-scored with TTA / ensembling")
+label_changes  = metrics.counter("tta_label_changes_total", "Re-scored scans whose top class changed")
+passes         = metrics.counter("tta_passes_total", "Extra forward passes run")
+passes_skipped = metrics.counter("tta_passes_skipped_total", "Extra passes skipped to stay within the latency budget")
+extra_seconds  = metrics.histogram("tta_seconds", "Extra time spent per batch on TTA / ensembling")
+
+
+# ──────────────────────────────────────────────────────
+# Views
+# ──────────────────────────────────────────────────────
+
+def views() -> list[str]:
+    """Augmented views per scan, besides the original."""
+
+    names = []
+    if "hflip" in AI_TTA_AUGMENTATIONS:
+        names.append("hflip")
+    if "shift" in AI_TTA_AUGMENTATIONS and AI_TTA_SHIFT_FRACTION > 0:
+        names += ["shift+x", "shift-x", "shift+y", "shift-y"]
+    return names
+
+
+def _shift(img: np.ndarray, out: np.ndarray, dy: int, dx: int):
+    """Translate by (dy, dx) pixels, repeating the edge row/column into the gap."""
+
+    height, width = img.shape[:2]
+    ys = np.clip(np.arange(height) - dy, 0, height - 1)
+    xs = np.clip(np.arange(width) - dx, 0, width - 1)
+    out[...] = img[ys][:, xs]
+
+
+def augment_into(img: np.ndarray, view: str, out: np.ndarray):
+    if view == "original":
+        out[...] = img
+    elif view == "hflip":
+        out[...] = img[:, ::-1]
+    else:
+        height, width = img.shape[:2]
+        sign = 1 if view[5] == "+" else -1
+        if view.endswith("x"):
+            _shift(img, out, 0, sign * max(1, round(width * AI_TTA_SHIFT_FRACTION)))
+        else:
+            _shift(img, out, sign * max(1, round(height * AI_TTA_SHIFT_FRACTION)), 0)
+
+
+_local = threading.local()
+
+
+def _buffer(size: int, shape: tuple) -> preprocessing.BatchBuffer:
+    # separate from preprocessing.get_buffer(): the batch being refined lives there
+    buf = getattr(_local, "buffer", None)
+    if buf is None or buf.shape != shape:
+        buf = preprocessing.BatchBuffer(size, *shape)
+        _local.buffer = buf
+    buf.ensure(size)
+    return buf
+
+
+# ──────────────────────────────────────────────────────
+# Ensemble members
+# ──────────────────────────────────────────────────────
+
+_members: list[str] | None = None
+_members_lock = threading.Lock()
+
+
+def ensemble_names() -> list[str]:
+    """Registry names of the extra models, registered on first use (missing files are skipped)."""
+
+    global _members
+    if _members is not None:
+        return _members
+
+    with _members_lock:
+        if _members is None:
+            names = []
+            for i, path in enumerate(AI_ENSEMBLE_MODELS, start=1):
+                if not os.path.exists(path):
+                    logger.warning(f"[AI] ensemble model {path} not found, skipped")
+                    continue
+                name = f"ensemble-{i}"
+                model_registry.register_model(name, path)
+                names.append(name)
+            _members = names
+    return _members
+
+
+def config_tag() -> str | None:
+    """Identifies the TTA setup, for the prediction cache version; None when off."""
+
+    if not AI_TTA_ENABLED:
+        return None
+    parts = [f"{AI_TTA_CONFIDENCE_BELOW}", ",".join(views()), f"{AI_TTA_SHIFT_FRACTION}"]
+    parts += [model_registry.model_version(name) for name in ensemble_names()]
+    return hashlib.sha256(":".join(parts).encode()).hexdigest()[:12]
+
+
+# ──────────────────────────────────────────────────────
+# Refinement
+# ──────────────────────────────────────────────────────
+
+# model name → observed seconds per row of a TTA pass
+_row_seconds: dict[str, float] = {}
+
+
+def _run_pass(name: str, batch: np.ndarray) -> np.ndarray:
+    started = time.perf_counter()
+    out = model_registry.get_model(name).predict(batch)
+    per_row = (time.perf_counter() - started) / len(batch)
+    previous = _row_seconds.get(name)
+    _row_seconds[name] = per_row if previous is None else 0.8 * previous + 0.2 * per_row
+    passes.inc()
+    return np.asarray(out, dtype=np.float32)
+
+
+def refine(batch: np.ndarray, probabilities: np.ndarray) -> tuple[np.ndarray, dict[int, dict]]:
+    """
+    Re-score the rows of batch whose top probability is below the TTA
+    threshold. Returns the probabilities with those rows replaced by the
+    averages, and per refined row a summary of what went into it.
+    """
+
+    if not AI_TTA_ENABLED:
+        return probabilities, {}
+    low = [i for i, row in enumerate(probabilities) if float(np.max(row)) < AI_TTA_CONFIDENCE_BELOW]
+    if not low:
+        return probabilities, {}
+
+    started = time.perf_counter()
+    deadline = started + AI_TTA_LATENCY_BUDGET_MS / 1000.0
+    augmented = views()
+    primary = model_registry.get_model()
+
+    # pass plan: the serving model sees the augmented views (its original
+    # view is the pass already made), each ensemble member sees all of them
+    plan = [(primary.name, augmented)] if augmented else []
+    for name in ensemble_names():
+        plan.append((name, ["original", *augmented]))
+
+    sums = probabilities[low].astype(np.float64)
+    counts = np.ones(len(low))
+    used_models, used_views, skipped = [primary.name], {"original"}, 0
+
+    for name, pass_views in plan:
+        rows = len(low) * len(pass_views)
+        estimate = _row_seconds.get(name, 0.0) * rows
+        if time.perf_counter() + estimate > deadline:
+            skipped += 1
+            passes_skipped.inc()
+            continue
+
+        try:
+            loaded = model_registry.get_model(name)
+            if (loaded.height, loaded.width, loaded.channels) != batch.shape[1:]:
+                raise ValueError(f"input {loaded.input_size} does not match the serving model")
+            buf = _buffer(rows, batch.shape[1:])
+            for j, i in enumerate(low):
+                for v, view in enumerate(pass_views):
+                    augment_into(batch[i], view, buf.slot(j * len(pass_views) + v))
+            out = _run_pass(name, buf.view(rows))
+            if out.shape != (rows, probabilities.shape[1]):
+                raise ValueError(f"output shape {out.shape} does not match the serving model")
+        except Exception as e:
+            logger.warning(f"[AI] TTA pass on '{name}' failed: {e}")
+            continue
+
+        sums += out.reshape(len(low), len(pass_views), -1).sum(axis=1)
+        counts += len(pass_views)
+        if name not in used_models:
+            used_models.append(name)
+        used_views.update(pass_views)
+
+    refined = probabilities.copy()
+    averaged = (sums / counts[:, None]).astype(probabilities.dtype)
+    details = {}
+    for j, i in enumerate(low):
+        refined[i] = averaged[j]
+        if int(np.argmax(averaged[j])) != int(np.argmax(probabilities[i])):
+            label_changes.inc()
+        details[i] = {
+            "single_pass_confidence": float(np.max(probabilities[i])),
+            "predictions_averaged": int(counts[j]),
+            "models": used_models,
+            "views": sorted(used_views),
+            "passes_skipped": skipped,
+        }
+
+    scans_refined.inc(len(low))
+    extra_seconds.observe(time.perf_counter() - started)
+    return refined, details
+
+
+def warm_up() -> dict:
+    """
+    Load the ensemble members and time one full-size pass per model, so the
+    first low-confidence batch neither loads a model inside its budget nor
+    runs without a cost estimate.
+    """
+
+    if not AI_TTA_ENABLED:
+        return {}
+    primary = model_registry.get_model()
+    shape = (primary.height, primary.width, primary.channels)
+    timings = {}
+    for name, size in [(primary.name, len(views())), *[(n, len(views()) + 1) for n in ensemble_names()]]:
+        if size:
+            dummy = np.zeros((size, *shape), dtype="float32")
+            _run_pass(name, dummy)
+            _row_seconds.pop(name)          # the first call pays for tracing
+            _run_pass(name, dummy)
+            timings[name] = _row_seconds[name]
+    return timings
+
+
+def stats() -> dict:
+    return {
+        "enabled": AI_TTA_ENABLED,
+        "confidence_below": AI_TTA_CONFIDENCE_BELOW,
+        "views": ["original", *views()],
+        "ensemble_models": AI_ENSEMBLE_MODELS,
+        "latency_budget_ms": AI_TTA_LATENCY_BUDGET_MS,
+        "row_seconds": dict(_row_seconds),
+        **metrics.snapshot(prefix="tta_"),
+    }
@@ -0,0 +1,230 @@
+# backend/services/uploads.py
+"""
+Streaming multipart receiver for scan uploads.
+
+The request body is parsed chunk by chunk as it arrives: the file part is
+written straight to a .part file beside its destination (no spooled temp
+file), hashed with SHA-256 on the fly, checked against magic bytes as soon
+as the first bytes arrive, and aborted the moment it exceeds
+MAX_UPLOAD_BYTES. Opening, writing and fsyncing the file run in worker
+threads so the event loop never waits on the disk. Form fields sent before
+the file can be checked before a single file byte is stored.
+"""
+
+import os
+import uuid
+import hashlib
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+# ── Limits ────────────────────────────────────────────
+MAX_UPLOAD_MB    = float(os.getenv("MAX_UPLOAD_MB", "10"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+MAX_FIELD_BYTES  = 64 * 1024
+# multipart framing + small form fields on top of the file itself
+BODY_OVERHEAD    = 64 * 1024
+
+# ── Accepted formats (sniffed, not taken from the filename) ─
+MAGIC_BYTES = {
+    b"\x89PNG\r\n\x1a\n": ".png",
+    b"\xff\xd8\xff":      ".jpg",
+}
+SNIFF_BYTES = max(len(m) for m in MAGIC_BYTES)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(413, detail=f"File too large. Max size is {MAX_UPLOAD_MB:g} MB")
+
+
+def sniff(head: bytes) -> str | None:
+    for magic, ext in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return ext
+    return None
+
+
+class StoredUpload:
+
+    def __init__(self, path: Path, ext: str, size: int, sha256: str, filename: str | None):
+        self.path = path
+        self.ext = ext
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+
+class _FilePart:
+
+    def __init__(self, dest_dir: Path, filename: str | None):
+        self.filename = filename
+        self.tmp_path = dest_dir / f"{uuid.uuid4()}.part"
+        self.file = None
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.ext: str | None = None
+
+    async def open(self):
+        self.file = await run_in_threadpool(open, self.tmp_path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise _too_large()
+
+        if self.ext is None:
+            self.head += data[:SNIFF_BYTES]
+            if len(self.head) >= SNIFF_BYTES:
+                self.ext = sniff(self.head)
+                if self.ext is None:
+                    raise HTTPException(415, detail="Unsupported file type. Allowed: jpg, jpeg, png")
+
+        self.digest.update(data)
+        await run_in_threadpool(self.file.write, data)
+
+    def finish(self):
+        if self.ext is None:
+            # shorter than the longest signature: decide on what we have
+            self.ext = sniff(self.head)
+            if self.ext is None:
+                raise HTTPException(415, detail="Unsupported file type. Allowed: jpg, jpeg, png")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def discard(self):
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+async def receive_scan(
+    request: Request,
+    dest_dir: Path,
+    file_field: str = "file",
+    check_fields: Callable[[dict], Awaitable[None]] | None = None,
+) -> tuple[dict, StoredUpload]:
+    """
+    Stream a multipart/form-data upload. Returns the plain form fields and
+    the stored file, fsynced but still at its <uuid>.part temp path; the
+    caller moves it into content-addressed storage (cas.commit_file) or
+    deletes it.
+
+    check_fields, if given, is awaited with the fields received so far when
+    the file part starts, before anything is written; raise HTTPException
+    from it to refuse the upload without reading the file.
+    """
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(400, detail="Expected multipart/form-data upload")
+
+    # Reject declared oversize bodies before reading a single byte
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + BODY_OVERHEAD:
+        raise _too_large()
+
+    events: list = []
+    header_field, header_value = bytearray(), bytearray()
+    part_headers: dict = {}
+
+    def on_part_begin():
+        part_headers.clear()
+        events.append(("begin", None))
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part_headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        _, options = parse_options_header(part_headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        events.append(("headers", (name, filename.decode("latin-1") if filename is not None else None)))
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    fields: dict = {}
+    upload: _FilePart | None = None
+    current_name, current_value, current_file = None, bytearray(), None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+
+            for kind, payload in events:
+                if kind == "headers":
+                    current_name, filename = payload
+                    current_value.clear()
+                    if current_name == file_field and filename is not None:
+                        if upload is not None:
+                            raise HTTPException(400, detail="Only one file per upload")
+                        if check_fields is not None:
+                            await check_fields(fields)
+                        upload = current_file = _FilePart(dest_dir, filename)
+                        await upload.open()
+                    else:
+                        current_file = None
+
+                elif kind == "data":
+                    if current_file is not None:
+                        await current_file.write(payload)
+                    else:
+                        current_value.extend(payload)
+                        if len(current_value) > MAX_FIELD_BYTES:
+                            raise HTTPException(413, detail=f"Form field '{current_name}' too large")
+
+                elif kind == "end":
+                    if current_file is None and current_name:
+                        try:
+                            fields[current_name] = current_value.decode("utf-8")
+                        except UnicodeDecodeError:
+                            raise HTTPException(400, detail=f"Form field '{current_name}' is not valid UTF-8")
+                    current_file = None
+
+            events.clear()
+
+        parser.finalize()
+
+        if upload is None:
+            raise HTTPException(400, detail=f"Missing file field '{file_field}'")
+
+        await run_in_threadpool(upload.finish)
+
+    except BaseException:
+        if upload is not None:
+            upload.discard()
+        raise
+
+    return fields, StoredUpload(
+        path=upload.tmp_path,
+        ext=upload.ext,
+        size=upload.size,
+        sha256=upload.digest.hexdigest(),
+        filename=upload.filename,
+    )
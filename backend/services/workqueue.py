@@ -0,0 +1,162 @@
+# backend/services/workqueue.py
+"""
+Doctor workqueue queries: filtered, keyset-paginated scan listings.
+
+Pages are fetched with a cursor holding the sort value and id of the last
+row returned, so page N costs the same as page 1 (no OFFSET scan). Only
+the columns shown in the queue are selected; note fields are never loaded.
+The status/patient filters are served by the composite indexes declared
+on Scan (status, created_at, id) and (patient_id, created_at, id); the
+unfiltered date sorts by (created_at, id). Queue totals per status come
+from count_by_status(), since a loaded page says nothing about the rest.
+"""
+
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from backend.models.schema import Scan
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT     = 200
+
+# sort option → (column expression, descending)
+SORTS = {
+    "newest":          (Scan.created_at, True),
+    "oldest":          (Scan.created_at, False),
+    # unanalysed scans (NULL confidence) sort as -1 so the cursor stays total
+    "confidence_asc":  (func.coalesce(Scan.confidence, -1.0), False),
+    "confidence_desc": (func.coalesce(Scan.confidence, -1.0), True),
+}
+
+SUMMARY_COLUMNS = (
+    Scan.id,
+    Scan.patient_id,
+    Scan.status,
+    Scan.prediction,
+    Scan.confidence,
+    Scan.created_at,
+)
+
+
+# ──────────────────────────────────────────────────────
+# Cursor encoding (opaque to clients)
+# ──────────────────────────────────────────────────────
+
+def encode_cursor(sort: str, value, scan_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, scan_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, scan_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+
+    if cursor_sort != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+
+    # a tampered cursor must come back as a 400, not blow up in the query
+    try:
+        if sort in ("newest", "oldest"):
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError
+        return value, int(scan_id)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+
+
+# ──────────────────────────────────────────────────────
+def count_by_status(db: Session, patient_id: int | None = None) -> dict:
+    """Scans per status across the whole queue, plus a "total" key."""
+
+    query = db.query(Scan.status, func.count(Scan.id)).group_by(Scan.status)
+    if patient_id is not None:
+        query = query.filter(Scan.patient_id == patient_id)
+
+    counts = {status: n for status, n in query.all()}
+    counts["total"] = sum(counts.values())
+    return counts
+
+
+# ──────────────────────────────────────────────────────
+def fetch_page(
+    db: Session,
+    status: list[str] | None = None,
+    patient_id: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    prediction: str | None = None,
+    min_confidence: float | None = None,
+    max_confidence: float | None = None,
+    sort: str = "newest",
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
+) -> dict:
+    """
+    One page of the workqueue. Raises ValueError for an unknown sort or a
+    bad cursor.
+    """
+
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {sorted(SORTS)}")
+
+    key, descending = SORTS[sort]
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    query = db.query(*SUMMARY_COLUMNS, key.label("sort_key"))
+
+    if status:
+        query = query.filter(Scan.status.in_(status))
+    if patient_id is not None:
+        query = query.filter(Scan.patient_id == patient_id)
+    if date_from is not None:
+        query = query.filter(Scan.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Scan.created_at < date_to)
+    if prediction:
+        query = query.filter(Scan.prediction == prediction)
+    if min_confidence is not None:
+        query = query.filter(Scan.confidence >= min_confidence)
+    if max_confidence is not None:
+        query = query.filter(Scan.confidence <= max_confidence)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if descending:
+            query = query.filter(or_(key < value, and_(key == value, Scan.id < last_id)))
+        else:
+            query = query.filter(or_(key > value, and_(key == value, Scan.id > last_id)))
+
+    if descending:
+        query = query.order_by(key.desc(), Scan.id.desc())
+    else:
+        query = query.order_by(key.asc(), Scan.id.asc())
+
+    # one extra row tells us whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last.sort_key, last.id)
+
+    return {
+        "items": [
+            {column.key: getattr(row, column.key) for column in SUMMARY_COLUMNS}
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+        "limit": limit,
+        "sort": sort,
+    }
@@ -0,0 +1,235 @@
+# export_lung_model.py
+"""
+Inference Export Script for CSSS Project
+Converts the trained Keras model into optimized CPU runtimes:
+- TFLite FP32 (no quantization, baseline for the converter)
+- TFLite dynamic-range quantized (INT8 weights, float activations)
+- TFLite FP16 (half-precision weights)
+- TFLite full-INT8 (weights + activations, calibrated on the train split)
+and writes an accuracy-vs-latency comparison against the test split.
+Variants whose accuracy drops more than MAX_ACCURACY_DROP below the Keras
+model are flagged as not deployable.
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+import cv2
+
+# Suppress TensorFlow warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import tensorflow as tf
+
+from backend.services.runtimes import TFLiteModel
+
+# ============================================================
+# PROJECT PATHS
+# ============================================================
+PROJECT_ROOT = Path(__file__).resolve().parent
+DATASET_DIR = PROJECT_ROOT / "dataset" / "lung"
+ARTIFACTS_DIR = PROJECT_ROOT / "artifacts"
+MODEL_DIR = ARTIFACTS_DIR / "models"
+META_DIR = ARTIFACTS_DIR / "metadata"
+METRIC_DIR = ARTIFACTS_DIR / "metrics"
+
+TRAIN_DIR = DATASET_DIR / "train"
+TEST_DIR = DATASET_DIR / "test"
+
+KERAS_MODEL_PATH = MODEL_DIR / "lung_model_final.h5"
+REPORT_PATH = METRIC_DIR / "runtime_comparison.json"
+
+# ============================================================
+# SETTINGS
+# ============================================================
+CALIBRATION_SAMPLES = 200       # train images used for INT8 calibration
+MAX_ACCURACY_DROP = 0.01        # absolute accuracy drop allowed vs Keras
+LATENCY_RUNS = 50               # batch-1 timings per variant
+RANDOM_STATE = 42
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+
+
+# ============================================================
+# DATA
+# ============================================================
+def load_image(path: Path, size: tuple) -> np.ndarray:
+    """Same preprocessing as backend/services/ai_service.load_image"""
+    img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img = cv2.resize(img, (size[1], size[0]))
+    return img.astype("float32") / 255.0
+
+
+def list_split(split_dir: Path, class_names: list) -> list:
+    """Return (path, class_index) pairs for a split directory"""
+    samples = []
+    for idx, name in enumerate(class_names):
+        class_dir = split_dir / name
+        if not class_dir.is_dir():
+            continue
+        for p in sorted(class_dir.iterdir()):
+            if p.suffix.lower() in IMAGE_EXTS:
+                samples.append((p, idx))
+    return samples
+
+
+def representative_dataset(samples: list, size: tuple):
+    rng = np.random.default_rng(RANDOM_STATE)
+    picks = rng.choice(len(samples), size=min(CALIBRATION_SAMPLES, len(samples)), replace=False)
+
+    def generator():
+        for i in picks:
+            yield [load_image(samples[i][0], size)[np.newaxis, ...]]
+
+    return generator
+
+
+# ============================================================
+# CONVERSION
+# ============================================================
+def convert(model, variant: str, calibration=None) -> bytes:
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    elif variant == "fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+
+    elif variant == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = calibration
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+
+    return converter.convert()
+
+
+# ============================================================
+# EVALUATION
+# ============================================================
+def evaluate(predict, samples: list, size: tuple) -> dict:
+    correct = 0
+    for path, label in samples:
+        probs = predict(load_image(path, size)[np.newaxis, ...])
+        correct += int(np.argmax(probs[0]) == label)
+
+    dummy = load_image(samples[0][0], size)[np.newaxis, ...]
+    predict(dummy)                                    # warm-up
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        t = time.perf_counter()
+        predict(dummy)
+        timings.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "accuracy": correct / len(samples),
+        "latency_ms_mean": float(np.mean(timings)),
+        "latency_ms_p95": float(np.percentile(timings, 95)),
+    }
+
+
+# ============================================================
+# MAIN EXECUTION
+# ============================================================
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Export optimized CSSS inference runtimes")
+    parser.add_argument("--model", default=str(KERAS_MODEL_PATH), help="trained Keras model")
+    parser.add_argument("--output-dir", default=str(MODEL_DIR))
+    parser.add_argument("--max-accuracy-drop", type=float, default=MAX_ACCURACY_DROP)
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    METRIC_DIR.mkdir(parents=True, exist_ok=True)
+
+    print("\n" + "="*60)
+    print("CSSS INFERENCE EXPORT SCRIPT")
+    print("="*60)
+    print(f"Keras model: {args.model}")
+    print(f"Output dir: {output_dir}")
+    print(f"Max accuracy drop: {args.max_accuracy_drop:.3f}")
+    print("="*60 + "\n")
+
+    model = tf.keras.models.load_model(args.model)
+    size = model.input_shape[1:3]
+
+    with open(META_DIR / "class_labels.json") as f:
+        class_names = json.load(f)
+
+    train_samples = list_split(TRAIN_DIR, class_names)
+    test_samples = list_split(TEST_DIR, class_names)
+
+    if not train_samples or not test_samples:
+        print(f"❌ ERROR: train/test images not found under {DATASET_DIR}")
+        exit(1)
+
+    print(f"✓ Calibration pool: {len(train_samples)} train images")
+    print(f"✓ Evaluation set: {len(test_samples)} test images\n")
+
+    # ── Keras baseline ────────────────────────────────────────
+    print("🧪 Evaluating Keras baseline...")
+    results = {
+        "keras": {
+            "path": args.model,
+            "size_bytes": Path(args.model).stat().st_size,
+            **evaluate(lambda x: model.predict(x, verbose=0), test_samples, size),
+        }
+    }
+    baseline = results["keras"]["accuracy"]
+    print(f"   Accuracy: {baseline*100:.2f}%  Latency: {results['keras']['latency_ms_mean']:.1f} ms")
+
+    # ── TFLite variants ───────────────────────────────────────
+    calibration = representative_dataset(train_samples, size)
+
+    for variant in ["fp32", "dynamic", "fp16", "int8"]:
+        print(f"\n🔧 Converting {variant}...")
+        tflite_path = output_dir / f"lung_model_{variant}.tflite"
+        tflite_path.write_bytes(convert(model, variant, calibration))
+
+        runtime = TFLiteModel(str(tflite_path))
+        metrics = evaluate(runtime.predict, test_samples, size)
+        drop = baseline - metrics["accuracy"]
+
+        results[f"tflite_{variant}"] = {
+            "path": str(tflite_path),
+            "size_bytes": tflite_path.stat().st_size,
+            **metrics,
+            "accuracy_drop": drop,
+            "deployable": drop <= args.max_accuracy_drop,
+        }
+        print(f"   Accuracy: {metrics['accuracy']*100:.2f}% (drop {drop*100:+.2f}%)  "
+              f"Latency: {metrics['latency_ms_mean']:.1f} ms  "
+              f"Size: {tflite_path.stat().st_size / 1e6:.1f} MB")
+
+    report = {
+        "baseline_accuracy": baseline,
+        "max_accuracy_drop": args.max_accuracy_drop,
+        "test_samples": len(test_samples),
+        "calibration_samples": min(CALIBRATION_SAMPLES, len(train_samples)),
+        "variants": results,
+    }
+
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=4)
+
+    # ============================================================
+    # SUMMARY
+    # ============================================================
+    print("\n" + "="*60)
+    print("RUNTIME COMPARISON")
+    print("="*60)
+    print(f"{'variant':16s} {'accuracy':>9s} {'latency':>10s} {'size':>9s}  deploy")
+    for name, r in results.items():
+        deploy = "baseline" if name == "keras" else ("yes" if r["deployable"] else "NO")
+        print(f"{name:16s} {r['accuracy']*100:8.2f}% {r['latency_ms_mean']:8.1f}ms "
+              f"{r['size_bytes']/1e6:7.1f}MB  {deploy}")
+    print("="*60)
+    print(f"\n✓ Report saved to: {REPORT_PATH}")
+    print("  Deploy with AI_RUNTIME=tflite AI_TFLITE_PATH=<variant path>\n")
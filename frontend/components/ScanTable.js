@@ -50,7 +50,7 @@ export default function ScanTable({
           {showImage && (
             <td>
               <img
-                src={`${BASE_URL}/uploads/${scan.filename}`}
+                src={`${BASE_URL}/doctor/scan/${scan.id}/image/thumb`}
                 alt={`Scan #${scan.id} of patient ${scan.patient_id}`}
                 className="scan-thumb"
                 onError={e => {
@@ -3,7 +3,10 @@
 import { useState, useEffect } from 'react';
 import Navbar from '../../components/Navbar';
 import ProtectedRoute from '../../components/ProtectedRoute';
-import { doctorAPI, getUser, getStatusBadge } from '../../services/api';
+import { doctorAPI, eventsAPI, mergeScanEvent, getUser, getStatusBadge } from '../../services/api';
+
+// Scans per /doctor/pending page (server caps this at 200)
+const PAGE_SIZE = 100;
 
 // ─── Helpers ────────────────────────────────────────────────────────────────
 
@@ -123,12 +126,6 @@ function VerifyModal({ scan, onClose, onDone }) {
                   : <span className="text-muted">—</span>}
               </div>
             </div>
-            <div style={{ marginTop: 12 }}>
-              <div className="form-label" style={{ marginBottom: 4 }}>File Path</div>
-              <div className="font-mono text-sm text-muted" style={{ wordBreak: 'break-all' }}>
-                {scan.file_path || '—'}
-              </div>
-            </div>
           </div>
 
           <div className="form-group" style={{ marginBottom: 0 }}>
@@ -169,16 +166,32 @@ function DoctorContent() {
   const user = getUser();
 
   const [scans,     setScans]     = useState([]);
+  const [cursor,    setCursor]    = useState(null);
   const [loading,   setLoading]   = useState(true);
   const [selected,  setSelected]  = useState(null);
   const [analyzing, setAnalyzing] = useState(null);
   const [tab,       setTab]       = useState('pending');
+  const [counts,    setCounts]    = useState({});
+
+  // Tab and stat totals cover the whole queue, not just the loaded pages
+  const loadCounts = async () => {
+    try {
+      const res = await doctorAPI.getCounts();
+      setCounts(res.data);
+    } catch (e) {
+      console.error('Failed to load queue counts:', e);
+    }
+  };
 
   const load = async () => {
     setLoading(true);
     try {
-      const res = await doctorAPI.getPending();
-      setScans(res.data.reverse());
+      const [res] = await Promise.all([
+        doctorAPI.getPending({ limit: PAGE_SIZE }),
+        loadCounts(),
+      ]);
+      setScans(res.data.items);
+      setCursor(res.data.next_cursor);
     } catch (e) {
       console.error('Failed to load queue:', e);
     } finally {
@@ -186,12 +199,29 @@ function DoctorContent() {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const res = await doctorAPI.getPending({ limit: PAGE_SIZE, cursor });
+      setScans(prev => [...prev, ...res.data.items]);
+      setCursor(res.data.next_cursor);
+    } catch (e) {
+      console.error('Failed to load more scans:', e);
+    }
+  };
+
   useEffect(() => { load(); }, []);
 
+  // Live updates instead of re-polling /doctor/pending
+  useEffect(() => eventsAPI.subscribeScans((event) => {
+    setScans((prev) => mergeScanEvent(prev, event));
+    loadCounts();
+  }), []);
+
   const analyze = async (scanId) => {
     setAnalyzing(scanId);
     try {
-      await doctorAPI.analyzeScan(scanId);
+      const res = await doctorAPI.analyzeScan(scanId);
+      if (res.data.job_id) await doctorAPI.waitForJob(res.data.job_id);
       await load();
     } catch (e) {
       const detail = e.response?.data?.detail;
@@ -207,6 +237,14 @@ function DoctorContent() {
   const verified = scans.filter(s => mapStatus(s.status) === 'DOCTOR_VERIFIED');
   const all      = scans;
 
+  const countOf = (mapped) => Object.entries(counts)
+    .filter(([status]) => status !== 'total' && mapStatus(status) === mapped)
+    .reduce((sum, [, n]) => sum + n, 0);
+  const pendingCount  = countOf('PENDING_AI');
+  const analyzedCount = countOf('AI_ANALYZED');
+  const verifiedCount = countOf('DOCTOR_VERIFIED');
+  const totalCount    = counts.total || 0;
+
   const displayScans =
     tab === 'pending'  ? pending  :
     tab === 'analyzed' ? analyzed :
@@ -246,7 +284,7 @@ function DoctorContent() {
                   <circle cx="12" cy="12" r="10"/><polyline points="12 6 12 12 16 14"/>
                 </svg>
               </div>
-              <div className="stat-value">{pending.length}</div>
+              <div className="stat-value">{pendingCount}</div>
               <div className="stat-label">Pending Analysis</div>
             </div>
             <div className="stat-card blue">
@@ -255,7 +293,7 @@ function DoctorContent() {
                   <path d="M22 12h-4l-3 9L9 3l-3 9H2"/>
                 </svg>
               </div>
-              <div className="stat-value">{analyzed.length}</div>
+              <div className="stat-value">{analyzedCount}</div>
               <div className="stat-label">AI Analyzed</div>
             </div>
             <div className="stat-card cyan">
@@ -265,8 +303,8 @@ function DoctorContent() {
                   <path d="M21 12v7a2 2 0 01-2 2H5a2 2 0 01-2-2V5a2 2 0 012-2h11"/>
                 </svg>
               </div>
-              <div className="stat-value">{verified.length}</div>
-              <div className="stat-label">Verified by Me</div>
+              <div className="stat-value">{verifiedCount}</div>
+              <div className="stat-label">Verified</div>
             </div>
             <div className="stat-card green">
               <div className="stat-icon">
@@ -275,7 +313,7 @@ function DoctorContent() {
                   <line x1="2" y1="12" x2="22" y2="12"/>
                 </svg>
               </div>
-              <div className="stat-value">{all.length}</div>
+              <div className="stat-value">{totalCount}</div>
               <div className="stat-label">Total in Queue</div>
             </div>
           </div>
@@ -292,10 +330,10 @@ function DoctorContent() {
 
               <div className="tabs">
                 {[
-                  { key: 'pending',  label: 'Pending',  count: pending.length  },
-                  { key: 'analyzed', label: 'AI Done',  count: analyzed.length },
-                  { key: 'verified', label: 'Verified', count: verified.length },
-                  { key: 'all',      label: 'All',      count: all.length      },
+                  { key: 'pending',  label: 'Pending',  count: pendingCount  },
+                  { key: 'analyzed', label: 'AI Done',  count: analyzedCount },
+                  { key: 'verified', label: 'Verified', count: verifiedCount },
+                  { key: 'all',      label: 'All',      count: totalCount    },
                 ].map(t => (
                   <button
                     key={t.key}
@@ -430,6 +468,13 @@ function DoctorContent() {
                     </tbody>
                   </table>
                 )}
+                {!loading && cursor && (
+                  <div style={{ display: 'flex', justifyContent: 'center', padding: 12 }}>
+                    <button className="btn btn-secondary btn-sm" onClick={loadMore}>
+                      Load older scans
+                    </button>
+                  </div>
+                )}
               </div>
             </div>
           </div>
@@ -445,4 +490,4 @@ export default function DoctorDashboard() {
       <DoctorContent />
     </ProtectedRoute>
   );
-}
\ No newline at end of file
+}
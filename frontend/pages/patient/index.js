@@ -3,7 +3,7 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import Navbar from '../../components/Navbar';
 import ProtectedRoute from '../../components/ProtectedRoute';
-import { patientAPI, getUser } from '../../services/api';
+import { patientAPI, eventsAPI, mergeScanEvent, getUser } from '../../services/api';
 
 // ─── Helpers ──────────────────────────────────────────────────────────────────
 
@@ -271,8 +271,9 @@ function UploadModal({ user, onClose, onDone, toast }) {
     setError('');
     try {
       const fd = new FormData();
-      fd.append('file', file);
+      // patient_id first: the server checks it before reading the file
       fd.append('patient_id', user.id);
+      fd.append('file', file);
       await patientAPI.uploadScan(fd);
       setSuccess(true);
       onDone();
@@ -465,6 +466,9 @@ function PatientContent() {
 
   useEffect(() => { load(); }, []);
 
+  // Status changes of this patient's scans are pushed by the server
+  useEffect(() => eventsAPI.subscribeScans((event) => setScans((prev) => mergeScanEvent(prev, event))), []);
+
   const total     = scans.length;
   const ready     = scans.filter(s => mapStatus(s.status) === 'REPORT_READY').length;
   const pending   = scans.filter(s => mapStatus(s.status) === 'PENDING_AI').length;
@@ -3,7 +3,7 @@
 import { useState, useEffect } from 'react';
 import Navbar from '../../components/Navbar';
 import ProtectedRoute from '../../components/ProtectedRoute';
-import { pharmacistAPI, getUser } from '../../services/api';
+import { pharmacistAPI, eventsAPI, getUser } from '../../services/api';
 
 // ─── Helpers ────────────────────────────────────────────────────────────────
 
@@ -247,6 +247,9 @@ function PharmacistContent() {
 
   useEffect(() => { load(); }, []);
 
+  // Refresh only when a scan enters or leaves the pharmacist queue
+  useEffect(() => eventsAPI.subscribeScans(load, { status: ['DOCTOR_VERIFIED', 'PHARMACIST_COMPLETED'] }), []);
+
   const todayCount    = scans.filter(s => isToday(s.created_at)).length;
   const normalCount   = scans.filter(s => s.prediction === 'Normal').length;
   const abnormalCount = scans.filter(s => s.prediction && s.prediction !== 'Normal').length;
@@ -179,8 +179,24 @@ export const patientAPI = {
 };
 
 export const doctorAPI = {
-  getPending:  ()               => api.get(`/doctor/pending`),
+  // params: { status, date_from, date_to, prediction, min_confidence, max_confidence, sort, limit, cursor }
+  getPending:  (params = {})    => api.get(`/doctor/pending`, { params }),
+  getCounts:   (params = {})    => api.get(`/doctor/pending/counts`, { params }),
   analyzeScan: (scanId)         => api.post(`/doctor/analyze/${scanId}`),
+  analyzeAll:  ()               => api.post(`/doctor/analyze/pending`),
+  getJob:      (jobId)          => api.get(`/doctor/analyze/jobs/${jobId}`),
+
+  // Analysis runs in background workers — poll the job until it settles
+  waitForJob: async (jobId, { intervalMs = 1000, timeoutMs = 120_000 } = {}) => {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const { data } = await api.get(`/doctor/analyze/jobs/${jobId}`);
+      if (data.status === 'DONE')   return data;
+      if (data.status === 'FAILED') throw new Error(data.error || 'AI analysis failed');
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('AI analysis is still running. Refresh the queue later.');
+  },
   verify:      (scanId, formData) =>
     api.post(`/doctor/verify/${scanId}`, formData, {
       headers: { 'Content-Type': 'multipart/form-data' },
@@ -207,4 +223,41 @@ export const adminAPI = {
 export const chatbotAPI = {
   send: (message, session_id = 'default') =>
     api.post('/chatbot/', { message, session_id }),
-};
\ No newline at end of file
+};
+
+export const eventsAPI = {
+  // Push stream of scan status changes (SSE). Patients only receive their own
+  // scans. EventSource reconnects by itself; returns an unsubscribe function.
+  subscribeScans: (onEvent, params = {}) => {
+    if (typeof window === 'undefined' || !window.EventSource) return () => {};
+    const token = localStorage.getItem('token');
+    if (!token) return () => {};
+
+    const qs = new URLSearchParams({ token });
+    if (params.patient_id != null) qs.append('patient_id', params.patient_id);
+    (params.status || []).forEach((s) => qs.append('status', s));
+
+    const source = new EventSource(`${BASE_URL}/events/scans?${qs}`);
+    const handle = (e) => onEvent(JSON.parse(e.data));
+    source.addEventListener('scan.uploaded', handle);
+    source.addEventListener('scan.status', handle);
+    return () => source.close();
+  },
+};
+
+// Apply a scan event to a list of scans in place of re-fetching it
+export const mergeScanEvent = (scans, event) => {
+  const index = scans.findIndex((s) => s.id === event.scan_id);
+  const patch = {
+    status:     event.status,
+    prediction: event.prediction,
+    confidence: event.confidence,
+  };
+  if (index === -1) {
+    if (event.type !== 'scan.uploaded') return scans;
+    return [{ id: event.scan_id, patient_id: event.patient_id, created_at: event.at, ...patch }, ...scans];
+  }
+  const next = [...scans];
+  next[index] = { ...next[index], ...patch };
+  return next;
+};
\ No newline at end of file